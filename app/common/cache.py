@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Size-bounded LRU cache whose entries expire after a TTL.
+# Not thread-safe, it is meant to be used from the event loop.
+class TTLCache:
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+# Collapses concurrent calls with the same key into one execution of the coroutine
+class SingleFlight:
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+
+    async def do(self, key, func):
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        try:
+            # Shielded so a cancelled caller does not cancel the call for the others
+            return await asyncio.shield(task)
+        finally:
+            if self._calls.get(key) is task:
+                del self._calls[key]
@@ -1,12 +1,15 @@
 import os
-from fastapi import HTTPException, Depends, Security, Response
-from fastapi_jwt_auth import AuthJWT
+from fastapi import HTTPException, Depends, Header, Security, Response
 from fastapi.security import OAuth2PasswordBearer
-from configs.db import user_collection
 import logging
-from pydantic import BaseSettings
 from dotenv import load_dotenv
-from app.core.jwt_handler import decode_jwt_token
+from app.core.token_cache import token_cache
+from app.schemas.users import UserType
+from configs.logging_fitlers import trace_id_var
+from configs.metrics import http_request_duration, http_requests_in_flight
+from configs.tracing import TraceContext, span, trace_context_var
+import re
+import time
 import uuid
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
@@ -16,18 +19,12 @@ load_dotenv()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 
-class Settings(BaseSettings):
-    authjwt_secret_key: str = os.getenv('JWT_SECRET_KEY')
-
-@AuthJWT.load_config
-def get_config():
-    return Settings()
-
 # All endpoints using this function require authorization
-async def authorization_required(Authorize: AuthJWT = Depends(), token: str = Security(oauth2_scheme)):
+async def authorization_required(token: str = Security(oauth2_scheme)):
     try:
         logging.info('Getting user details using JWT Token')
-        decoded_token = decode_jwt_token(token)
+        with span('jwt'):
+            decoded_token = token_cache.verify(token)
         if not decoded_token:
             raise HTTPException(status_code=401, detail='Invalid or expired token')
         
@@ -39,12 +36,24 @@ async def authorization_required(Authorize: AuthJWT = Depends(), token: str = Se
         logging.error('Error in authorization_required.', extra={'log_data': e})
         raise HTTPException(status_code=401, detail='Invalid token')
 
+# Endpoints using this function require a token issued to an admin
+async def admin_required(decoded_token: dict = Depends(authorization_required)):
+    if decoded_token.get('user_type') != UserType.admin.value:
+        logging.error('Admin access denied.', extra={'log_data': {'userid': decoded_token.get('sub')}})
+        raise HTTPException(status_code=403, detail='Admin access required')
+    return decoded_token
+
+# Retried requests sent with the same key get the stored response of the first one
+async def idempotency_key(key: str = Header(None, alias='Idempotency-Key', description='A unique key, e.g. a UUID, to retry the request safely for 24 hours')):
+    return key
+
 # Endpoints using this function do not require authorization
-async def authorization_optional(Authorize: AuthJWT = Depends(), token: str = Security(oauth2_scheme)):
+async def authorization_optional(token: str = Security(oauth2_scheme)):
     try:
         if token:
             logging.info('Getting user details using JWT Token')
-            decoded_token = decode_jwt_token(token)
+            with span('jwt'):
+                decoded_token = token_cache.verify(token)
             if not decoded_token:
                 raise HTTPException(status_code=401, detail='Invalid or expired token')
             
@@ -59,10 +68,58 @@ async def authorization_optional(Authorize: AuthJWT = Depends(), token: str = Se
         logging.error('Error in authorization_optional', extra={'log_data': e})
         raise HTTPException(status_code=401, detail='Invalid token')
 
+# Incoming trace ids are reused only when they are short and header safe
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
 class TraceIDMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        trace_id = str(uuid.uuid4())
-        response.headers['X-Trace-Id'] = trace_id
-        logging.info('Generated Trace ID.', extra={'log_data': {'trace_id': trace_id}})
-        return response
\ No newline at end of file
+        # The trace context is set before dispatch so every log line and span of the request shares it
+        trace_id = request.headers.get('X-Trace-Id', '')
+        if not TRACE_ID_PATTERN.match(trace_id):
+            trace_id = str(uuid.uuid4())
+        trace_id_token = trace_id_var.set(trace_id)
+        trace_context = TraceContext(trace_id)
+        trace_context_token = trace_context_var.set(trace_context)
+        try:
+            response = await call_next(request)
+            response.headers['X-Trace-Id'] = trace_id
+            response.headers['Server-Timing'] = trace_context.server_timing()
+            logging.info('Request completed.', extra={'log_data': {
+                'method': request.method,
+                'path': request.url.path,
+                'status_code': response.status_code,
+                'duration_ms': round(trace_context.elapsed_ms(), 3),
+                'stages': trace_context.timings()
+            }})
+            return response
+        finally:
+            trace_context_var.reset(trace_context_token)
+            trace_id_var.reset(trace_id_token)
+
+# Plain ASGI middleware, it records the latency of every request by its matched route
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope, its first tag names the router
+            route = scope.get('route')
+            router = route.tags[0] if route is not None and getattr(route, 'tags', None) else 'none'
+            path = route.path if route is not None else 'unmatched'
+            http_request_duration.labels(router, scope['method'], path, status_code).observe(time.perf_counter() - started_at)
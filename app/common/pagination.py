@@ -0,0 +1,18 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from bson import ObjectId # type: ignore
+
+# Opaque keyset cursor over (updated_at, _id), the sort key of the wallet list
+
+def encode_cursor(updated_at: datetime, document_id: ObjectId) -> str:
+    payload = json.dumps([updated_at.isoformat(), str(document_id)], separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        updated_at, document_id = json.loads(urlsafe_b64decode(cursor + padding))
+        return datetime.fromisoformat(updated_at), ObjectId(document_id)
+    except Exception as e:
+        raise ValueError('Invalid cursor') from e
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import os
+from bson import ObjectId # type: ignore
+from dotenv import load_dotenv
+from starlette.responses import Response
+from app.schemas.users import UserDetailsResponse
+
+try:
+    import orjson
+except ImportError: # pragma: no cover
+    orjson = None
+
+load_dotenv()
+
+# fast: response bodies are encoded straight from the documents and returned pre-rendered,
+# FastAPI then skips validating them against response_model again (the OpenAPI schema is unchanged)
+# validated: bodies are parsed into their response models first
+RESPONSE_MODE = os.getenv('RESPONSE_MODE', 'fast')
+
+USER_DETAILS_FIELDS = tuple(UserDetailsResponse.__fields__)
+
+# Response bodies built outside the services so they can be benchmarked without a database
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, bytes):
+        # PyJWT 1.x returns tokens as bytes, jsonable_encoder decoded them the same way
+        return value.decode()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        # orjson encodes datetimes itself, in the same format as isoformat()
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class PrerenderedJSONResponse(Response):
+    media_type = 'application/json'
+
+def render_response(payload: dict, response_model):
+    if RESPONSE_MODE == 'fast':
+        return PrerenderedJSONResponse(dumps(payload))
+    return response_model.parse_obj(payload)
+
+WALLET_FIELDS = ('wallet_name', 'wallet_address', 'seed_phrase', 'created_at', 'updated_at')
+
+def wallet_response(wallet: dict) -> dict:
+    return {
+        'wallet_name': wallet.get('wallet_name'),
+        'wallet_address': wallet['wallet_address'],
+        'seed_phrase': wallet.get('seed_phrase'),
+        'created_at': wallet['created_at'].isoformat(),
+        'updated_at': wallet['updated_at'].isoformat()
+    }
+
+def wallets_ndjson(wallets: list) -> bytes:
+    return b''.join(dumps(wallet_response(wallet)) + b'\n' for wallet in wallets)
+
+def wallets_csv(wallets: list, header: bool = False) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if header:
+        writer.writerow(WALLET_FIELDS)
+    for wallet in wallets:
+        row = wallet_response(wallet)
+        writer.writerow([row[field] or '' for field in WALLET_FIELDS])
+    return output.getvalue().encode()
+
+def user_details_response(user: dict) -> dict:
+    # Only the fields of UserDetailsResponse, like response_model filtering would do
+    return {field: user.get(field) for field in USER_DETAILS_FIELDS}
+
+def serialize_wallet_page(wallets: list, total_count: int, next_cursor: str = None) -> dict:
+    return {
+        'total_count': total_count,
+        'wallets': [wallet_response(wallet) for wallet in wallets],
+        'next_cursor': next_cursor
+    }
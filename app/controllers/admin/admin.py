@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+import logging
+from app.common.header import admin_required
+from app.common.serializers import render_response
+from app.schemas.provisioning import ProvisioningResponse
+from app.services.provisioning_service import PROVISION_BATCH_SIZE, provision_users
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix='/admin',
+    tags=['admin']
+)
+
+@router.post(
+    '/users/provision',
+    response_model=ProvisioningResponse,
+    summary='Provision Users',
+    description='Create users from an NDJSON body with one sign-up record per line, read and written in batches. A run with the same job_id resumes after the last committed line.',
+    openapi_extra={'requestBody': {'required': True, 'content': {'application/x-ndjson': {'schema': {'type': 'string'}}}}}
+)
+async def provision(request: Request, job_id: str = Query(..., regex=r'^[A-Za-z0-9._-]{1,64}$'), batch_size: int = Query(PROVISION_BATCH_SIZE, ge=1, le=5000), current_user: dict = Depends(admin_required)):
+    try:
+        logging.info('Provisioning request received', extra={'log_data': {'job_id': job_id, 'userid': current_user['sub']}})
+        job = await provision_users(request.stream(), job_id, batch_size)
+        return render_response(job, ProvisioningResponse)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error('Error provisioning users', extra={'log_data': e})
+        raise HTTPException(status_code=500, detail=str(e))
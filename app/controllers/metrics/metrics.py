@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from configs.metrics import registry
+
+router = APIRouter(
+    tags=['metrics']
+)
+
+@router.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
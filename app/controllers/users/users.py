@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Security
 from app.core.jwt_handler import generate_jwt_token
-from app.schemas.wallet import WalletListResponse
 import logging
-from app.schemas.users import SeedImportSignUpRequest, SignUpRequest, SignUpTokenResponse, SocialSignUpRequest, UpdateUserRequest, UpdateUserResponse, UserDetailsResponse, WalletSignUpRequest
-from app.common.header import authorization_required
+from app.schemas.users import LogoutResponse, SeedImportSignUpRequest, SignUpRequest, SignUpTokenResponse, SocialSignUpRequest, UpdateUserRequest, UpdateUserResponse, UserDetailsResponse, WalletSignUpRequest
+from app.common.header import authorization_required, idempotency_key, oauth2_scheme
+from app.common.serializers import render_response, user_details_response, wallet_response
+from app.core.idempotency import idempotency_store
+from app.core.token_cache import token_cache
 from app.services.user_service import sign_up_user, get_user_by_userid, update_user_by_id
 
 logger = logging.getLogger(__name__)
@@ -14,32 +16,23 @@ router = APIRouter(
 )
 
 @router.put('/signup', response_model=SignUpTokenResponse, summary='Sign Up', description='Sign up using either Wallet or Social method.')
-async def sign_up(user: SignUpRequest, request: Request):
-    try:
-        logging.info('Sign up request received')
-        user = await sign_up_user(request)
-        
-        # Transform the wallets into the response format
-        wallet_list = [
-            WalletListResponse(
-                wallet_name=wallet['wallet_name'],
-                wallet_address=wallet['wallet_address'], 
-                seed_phrase=wallet['seed_phrase'],
-                created_at=wallet['created_at'].isoformat(), 
-                updated_at=wallet['updated_at'].isoformat()
-            )
-            for wallet in user['wallets']
-        ]
-
-        logging.info('User signed up successfully')
-        return SignUpTokenResponse(
-            access_token=user['access_token'],
-            token_type='bearer',
-            wallets=wallet_list
-        )
-    except Exception as e:
-        logging.error('Error signing up user', extra={'log_data': str(e)})
-        raise HTTPException(status_code=500, detail=str(e))
+async def sign_up(user: SignUpRequest, request: Request, key: str = Depends(idempotency_key)):
+    async def handler():
+        try:
+            logging.info('Sign up request received')
+            user = await sign_up_user(request)
+            
+            logging.info('User signed up successfully')
+            return render_response({
+                'access_token': user['access_token'],
+                'token_type': 'bearer',
+                'wallets': [wallet_response(wallet) for wallet in user['wallets']]
+            }, SignUpTokenResponse)
+        except Exception as e:
+            logging.error('Error signing up user', extra={'log_data': str(e)})
+            raise HTTPException(status_code=500, detail=str(e))
+    # Sign-ups have no user yet, their keys share one scope
+    return await idempotency_store.respond(request, key, 'signup', handler)
 
 @router.patch('', response_model=UpdateUserResponse)
 async def update(user: UpdateUserRequest, request: Request, current_user: dict = Depends(authorization_required)):
@@ -49,16 +42,11 @@ async def update(user: UpdateUserRequest, request: Request, current_user: dict =
         if not user_dict:
             raise HTTPException(status_code=400, detail='No fields to update')
 
-        result = await update_user_by_id(current_user['sub'], user_dict)
+        # The update returns the updated user, no follow-up read is needed
+        updated_user = await update_user_by_id(current_user['sub'], user_dict)
         
-        if result.modified_count == 1:
-            updated_user = await get_user_by_userid(current_user['sub'])
-            additional_claims = {
-                'first_name': updated_user['first_name'],
-                'last_name': updated_user['last_name'],
-                'user_type': updated_user['user_type']
-            }
-            accessToken = generate_jwt_token(updated_user['userid'], additional_claims)
+        if updated_user:
+            accessToken = generate_jwt_token(updated_user['userid'], updated_user['user_type'])
             logging.info('User updated successfully')
             return SignUpTokenResponse(
                 access_token=accessToken, 
@@ -78,9 +66,16 @@ async def get_user_details(current_user: dict = Depends(authorization_required))
         user = await get_user_by_userid(userid)
         if user:
             logging.info('User details fetched successfully')
-            return user
+            return render_response(user_details_response(user), UserDetailsResponse)
         else:
             raise HTTPException(status_code=404, detail='User not found')
     except Exception as e:
         logging.error('Error fetching user details', extra={'log_data': str(e)})
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post('/logout', response_model=LogoutResponse, summary='Log Out', description='Revoke the JWT token sent with the request.')
+async def logout(token: str = Security(oauth2_scheme), current_user: dict = Depends(authorization_required)):
+    # The token is rejected until its exp, later requests with it get 401
+    token_cache.revoke(token, current_user['exp'])
+    logging.info('User logged out', extra={'log_data': {'userid': current_user['sub']}})
+    return render_response({'message': 'Logged out successfully'}, LogoutResponse)
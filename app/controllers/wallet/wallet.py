@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Request
-from app.schemas.wallet import WalletCreateRequest, WalletImportRequest, WalletCreateResponse, WalletList, WalletListResponse
+from fastapi.responses import StreamingResponse
+from app.schemas.wallet import WalletAccountsRequest, WalletAccountsResponse, WalletCreateRequest, WalletImportBatchRequest, WalletImportBatchResponse, WalletImportRequest, WalletCreateResponse, WalletList
 import logging
-from app.common.header import authorization_required
-from app.services.wallet_service import create_wallet, get_wallet_addresses_by_userid, update_wallet, delete_user_wallet, import_wallet
+from app.common.header import authorization_required, idempotency_key
+from app.common.pagination import decode_cursor
+from app.common.serializers import render_response, wallet_response
+from app.core.idempotency import idempotency_store
+from app.services.wallet_service import WALLET_LIST_MAX_LIMIT, add_wallet_accounts, create_wallet, export_wallets, get_wallet_page, update_wallet, delete_user_wallet, import_wallet, import_wallets
 
 logger = logging.getLogger(__name__)
 
@@ -12,69 +16,93 @@ router = APIRouter(
 )
 
 @router.get('', response_model=WalletList, summary='Get Wallet List', description='Retrieves a list of wallets for the authenticated user.')
-async def get_wallet_list(current_user: dict = Depends(authorization_required), limit: int = Query(10, ge=1), offset: int = Query(0, ge=0)):
+async def get_wallet_list(current_user: dict = Depends(authorization_required), limit: int = Query(10, ge=1, le=WALLET_LIST_MAX_LIMIT), offset: int = Query(0, ge=0), cursor: str = Query(None, description='The next_cursor of the previous page, takes precedence over offset')):
     try:
-        # Fetch the wallets associated with the current user using the service function
-        wallets, total_count = await get_wallet_addresses_by_userid(current_user['sub'], limit, offset)
-        logging.info('Fetched wallets for user', extra={'log_data': {'userid': current_user['sub']}})
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
 
-        # Transform the wallets into the response format
-        wallet_list = [
-            WalletListResponse(
-                wallet_name=wallet['wallet_name'],
-                wallet_address=wallet['wallet_address'], 
-                seed_phrase=wallet['seed_phrase'], 
-                created_at=wallet['created_at'].isoformat(), 
-                updated_at=wallet['updated_at'].isoformat()
-            )
-            for wallet in wallets
-        ]
-
-        return WalletList(
-            total_count=total_count,
-            wallets=wallet_list
-        )
+    try:
+        # Fetch the serialized wallet page for the current user using the service function
+        page = await get_wallet_page(current_user['sub'], limit, offset, after)
+        return render_response(page, WalletList)
     except Exception as e:
         logging.error('Error fetching wallet list', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get('/export', summary='Export Wallets', description='Streams every wallet of the authenticated user as NDJSON or CSV, in the order of the wallet list.', responses={200: {'content': {'application/x-ndjson': {}, 'text/csv': {}}}})
+async def export_wallet_list(current_user: dict = Depends(authorization_required), export_format: str = Query('ndjson', alias='format', regex='^(ndjson|csv)$', description='ndjson or csv')):
+    media_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(
+        export_wallets(current_user['sub'], export_format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="wallets.{export_format}"'}
+    )
+
 @router.put('', response_model=WalletCreateResponse, summary='Create Wallet', description='Create a new wallet')
-async def generate_wallet(request: WalletCreateRequest, current_user: dict = Depends(authorization_required)):
+async def generate_wallet(request: WalletCreateRequest, http_request: Request, current_user: dict = Depends(authorization_required), key: str = Depends(idempotency_key)):
+    async def handler():
+        try:
+            wallet = await create_wallet(current_user['sub'], request)
+
+            return render_response({
+                'message': 'Wallet created successfully.',
+                'wallet': wallet_response(wallet)
+            }, WalletCreateResponse)
+        except Exception as e:
+            logging.error('Error generating wallet', extra={'log_data': e})
+            raise HTTPException(status_code=500, detail=str(e))
+    return await idempotency_store.respond(http_request, key, current_user['sub'], handler)
+
+@router.post('/import', response_model=WalletCreateResponse, summary='Import Wallet', description='Import a wallet using a seed phrase or private key')
+async def import_wallet_route(import_data: WalletImportRequest, request: Request, current_user: dict = Depends(authorization_required), key: str = Depends(idempotency_key)):
+    async def handler():
+        try:
+            userid = current_user['sub']
+            wallet_data = await import_wallet(userid, import_data)
+
+            return render_response({
+                'message': 'Wallet created successfully.',
+                'wallet': wallet_response(wallet_data)
+            }, WalletCreateResponse)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error('Error importing wallet: %s', str(e))
+            raise HTTPException(status_code=500, detail=str(e))
+    return await idempotency_store.respond(request, key, current_user['sub'], handler)
+
+@router.post('/import/batch', response_model=WalletImportBatchResponse, summary='Import Wallets', description='Import up to 100 wallets from seed phrases and private keys, with one result per item')
+async def import_wallets_route(request: WalletImportBatchRequest, current_user: dict = Depends(authorization_required)):
     try:
-        wallet = await create_wallet(current_user['sub'], request)
+        results = await import_wallets(current_user['sub'], request.wallets)
 
-        return WalletCreateResponse(
-            message='Wallet created successfully.',
-            wallet=WalletListResponse(
-                wallet_name=wallet['wallet_name'],
-                wallet_address=wallet['wallet_address'], 
-                seed_phrase=wallet['seed_phrase'], 
-                created_at=wallet['created_at'].isoformat(), 
-                updated_at=wallet['updated_at'].isoformat()
-            )
-        )
+        for result in results:
+            if 'wallet' in result:
+                result['wallet'] = wallet_response(result['wallet'])
+        return render_response({
+            'message': 'Wallets imported successfully.',
+            'results': results
+        }, WalletImportBatchResponse)
     except Exception as e:
-        logging.error('Error generating wallet', extra={'log_data': e})
+        logging.error('Error importing wallets', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post('/import', response_model=WalletCreateResponse, summary='Import Wallet', description='Import a wallet using a seed phrase or private key')
-async def import_wallet_route(import_data: WalletImportRequest, request: Request, current_user: dict = Depends(authorization_required)):
+@router.put("/{wallet_id}/accounts", response_model=WalletAccountsResponse, summary='Add Wallet Accounts', description='Derive accounts 0..count-1 from the seed phrase of a wallet')
+async def add_accounts(wallet_id: str, request: WalletAccountsRequest, current_user: dict = Depends(authorization_required)):
     try:
-        userid = current_user['sub']
-        wallet_data = await import_wallet(userid, import_data)
+        wallets = await add_wallet_accounts(current_user['sub'], wallet_id, request.count)
+        if wallets is None:
+            raise HTTPException(status_code=404, detail='Wallet not found')
 
-        return WalletCreateResponse(
-            message='Wallet created successfully.',
-            wallet=WalletListResponse(
-                wallet_name=wallet_data['wallet_name'] if wallet_data['wallet_name'] else None,
-                wallet_address=wallet_data['wallet_address'],
-                seed_phrase=wallet_data['seed_phrase'],
-                created_at=wallet_data['created_at'].isoformat(),
-                updated_at=wallet_data['updated_at'].isoformat()
-            )
-        )
+        return render_response({
+            'message': 'Wallet accounts added successfully.',
+            'wallets': [wallet_response(wallet) for wallet in wallets]
+        }, WalletAccountsResponse)
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error('Error importing wallet: %s', str(e))
+        logging.error('Error adding wallet accounts', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.patch("/{wallet_id}", response_model=WalletCreateResponse, summary='Patch Wallet', description='Patch wallet name based on wallet id')
@@ -85,16 +113,10 @@ async def patch_wallet(wallet_id: str, request: WalletCreateRequest, current_use
         if not wallet:
             raise HTTPException(status_code=404, detail='Wallet not found')
         
-        return WalletCreateResponse(
-            message='Wallet updated successfully',
-            wallet=WalletListResponse(
-                wallet_name=wallet['wallet_name'],
-                wallet_address=wallet['wallet_address'], 
-                seed_phrase=wallet['seed_phrase'], 
-                created_at=wallet['created_at'].isoformat(), 
-                updated_at=wallet['updated_at'].isoformat()
-            )
-        )
+        return render_response({
+            'message': 'Wallet updated successfully',
+            'wallet': wallet_response(wallet)
+        }, WalletCreateResponse)
     except Exception as e:
         logging.error('Error updating wallet', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,16 +129,10 @@ async def delete_wallet(wallet_id: str, current_user: dict = Depends(authorizati
         if not wallet:
             raise HTTPException(status_code=404, detail='Wallet not found')
         
-        return WalletCreateResponse(
-            message='Wallet deleted successfully',
-            wallet=WalletListResponse(
-                wallet_name=wallet['wallet_name'] if wallet['wallet_name'] else '',
-                wallet_address=wallet['wallet_address'],
-                seed_phrase=wallet['seed_phrase'],
-                created_at=wallet['created_at'].isoformat(),
-                updated_at=wallet['updated_at'].isoformat() 
-            )
-        )
+        return render_response({
+            'message': 'Wallet deleted successfully',
+            'wallet': wallet_response(wallet)
+        }, WalletCreateResponse)
     except Exception as e:
         logging.error('Error deleting wallet', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
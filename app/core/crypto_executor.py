@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging.handlers import QueueListener
+from dotenv import load_dotenv
+from app.core import generate_seed_wallet_address as core
+from configs.log_handlers import ForwardingHandler, ProcessQueueHandler
+from configs.metrics import crypto_operation_duration
+from configs.tracing import record_stage
+
+load_dotenv()
+
+CRYPTO_EXECUTOR = os.getenv('CRYPTO_EXECUTOR', 'process')
+CRYPTO_WORKERS = int(os.getenv('CRYPTO_WORKERS', str(os.cpu_count() or 1)))
+CRYPTO_MAX_PENDING = int(os.getenv('CRYPTO_MAX_PENDING', '64'))
+
+def init_worker_logging(log_queue, level: int):
+    # Spawned workers start without logging configured, their records go to the parent's log queue
+    root = logging.getLogger()
+    root.handlers[:] = [ProcessQueueHandler(log_queue)]
+    root.setLevel(level)
+
+# Async facade that runs key derivation and AES-GCM outside the event loop.
+# A process pool is used by default, a thread pool when CRYPTO_EXECUTOR=thread
+# or when worker processes cannot be started.
+class CryptoExecutor:
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        if kind not in ('process', 'thread'):
+            raise ValueError('CRYPTO_EXECUTOR must be either process or thread')
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.timings = {}
+        self._executor = None
+        self._semaphore = None
+        self._log_listener = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                try:
+                    # spawn avoids forking a process that already runs the event loop and driver threads
+                    mp_context = multiprocessing.get_context('spawn')
+                    log_queue = mp_context.Queue()
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=mp_context,
+                        initializer=init_worker_logging,
+                        initargs=(log_queue, logging.getLogger().getEffectiveLevel())
+                    )
+                    self._log_listener = QueueListener(log_queue, ForwardingHandler())
+                    self._log_listener.start()
+                except (OSError, NotImplementedError) as e:
+                    logging.warning('Process pool unavailable, falling back to thread pool.', extra={'log_data': str(e)})
+                    self.kind = 'thread'
+            if self.kind == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crypto')
+        return self._executor
+
+    def _fall_back_to_threads(self):
+        logging.error('Crypto process pool is broken, falling back to thread pool.')
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        self._stop_log_listener()
+        self.kind = 'thread'
+
+    def _stop_log_listener(self):
+        # Stopping the listener writes the records already received from the workers
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
+
+    async def run(self, func, *args, stage: str = 'derive'):
+        # stage names the call in the request's trace, derive or encrypt
+        # The semaphore bounds the number of calls queued on the executor
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            self.pending += 1
+            started_at = time.perf_counter()
+            try:
+                try:
+                    return await loop.run_in_executor(self._get_executor(), func, *args)
+                except BrokenProcessPool:
+                    self._fall_back_to_threads()
+                    return await loop.run_in_executor(self._get_executor(), func, *args)
+            finally:
+                self.pending -= 1
+                self._record(func.__name__, stage, time.perf_counter() - started_at)
+
+    def _record(self, name: str, stage: str, elapsed: float):
+        count, total = self.timings.get(name, (0, 0.0))
+        self.timings[name] = (count + 1, total + elapsed)
+        record_stage(stage, elapsed * 1000)
+        crypto_operation_duration.labels(name).observe(elapsed)
+        logging.debug('Crypto call completed.', extra={'log_data': {'function': name, 'duration_ms': round(elapsed * 1000, 3)}})
+
+    async def generate_seed_wallet_address(self):
+        return await self.run(core.generate_seed_wallet_address)
+
+    async def get_wallet_address_from_seed_phrase(self, seed_phrase: str):
+        return await self.run(core.get_wallet_address_from_seed_phrase, seed_phrase)
+
+    async def get_wallet_accounts_from_seed_phrase(self, seed_phrase: str, count: int, start: int = 0):
+        return await self.run(core.get_wallet_accounts_from_seed_phrase, seed_phrase, count, start)
+
+    async def get_wallet_address_from_private_key(self, private_key: str):
+        return await self.run(core.get_wallet_address_from_private_key, private_key)
+
+    async def encrypt_key(self, plaintext: str, key_id: int = core.KEY_ID_SECRET_KEY, data_key: bytes = None) -> str:
+        return await self.run(core.encrypt_key, plaintext, key_id, data_key, stage='encrypt')
+
+    async def decrypt_key(self, encrypted_string: str, data_key: bytes = None) -> str:
+        return await self.run(core.decrypt_key, encrypted_string, data_key, stage='encrypt')
+
+    async def reencrypt_key(self, encrypted_string: str, key_id: int = core.KEY_ID_SECRET_KEY, data_key: bytes = None) -> str:
+        return await self.run(core.reencrypt_key, encrypted_string, key_id, data_key, stage='encrypt')
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._stop_log_listener()
+
+crypto_executor = CryptoExecutor(CRYPTO_EXECUTOR, CRYPTO_WORKERS, CRYPTO_MAX_PENDING)
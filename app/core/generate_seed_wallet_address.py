@@ -1,40 +1,51 @@
 import logging
 from eth_account import Account
-from mnemonic import Mnemonic
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from eth_utils.exceptions import ValidationError
 from base64 import b64encode, b64decode
+from ast import literal_eval
 import os
 from dotenv import load_dotenv
+from app.core.hd_derivation import derive_account, derive_accounts, generate_mnemonic
 
 load_dotenv()
 
-def generate_seed_wallet_address():
-    # Enable mnemonic features
-    Account.enable_unaudited_hdwallet_features()
-    logging.info('HD wallet features enabled')
+# Envelope layout: version (1 byte) | key id (1 byte) | IV (12 bytes) | ciphertext and GCM tag
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER_SIZE = 2
+IV_SIZE = 12
+KEY_ID_SECRET_KEY = 0
+KEY_ID_DATA_KEY = 1
+
+# Raised for secrets that are not a valid envelope, do not decrypt, or hold no valid seed or key.
+# binascii.Error and UnicodeDecodeError are ValueErrors, malformed legacy envelopes raise
+# SyntaxError, LookupError or TypeError
+INVALID_SECRET_ERRORS = (ValueError, LookupError, TypeError, SyntaxError, InvalidTag, ValidationError)
+
+# Every legacy envelope is the base64 encoding of "{'ciphertext': ..."
+LEGACY_ENVELOPE_PREFIX = b64encode(b"{'c").decode()
 
+def generate_seed_wallet_address():
     # Generate a 12-word mnemonic phrase
-    mnemo = Mnemonic('english')
-    mnemonic_phrase = mnemo.generate(strength=128)  # 128 bits of entropy for 12 words
+    mnemonic_phrase = generate_mnemonic()
     logging.info('Generated mnemonic phrase')
     
     # Derive a wallet address from the mnemonic phrase
-    account = Account.from_mnemonic(mnemonic_phrase)
+    account = derive_account(mnemonic_phrase)
     logging.info('Derived account from mnemonic phrase')
     
     address = account.address
     logging.info('Derived address from account')
 
     # Derive the private key
-    seed = mnemo.to_seed(mnemonic_phrase)
     private_key = account.key.hex()
     logging.info('Derived private from seed_phrase')
     return address, encrypt_key(mnemonic_phrase), encrypt_key(private_key)
 
 def get_wallet_address_from_seed_phrase(seed_phrase: str) -> str:
-    Account.enable_unaudited_hdwallet_features()
     mnemonic_phrase = decrypt_key(seed_phrase)
-    account = Account.from_mnemonic(mnemonic_phrase)
+    account = derive_account(mnemonic_phrase)
     wallet_address = account.address
     logging.info('Derived wallet address from seed_phrase')
     
@@ -42,33 +53,57 @@ def get_wallet_address_from_seed_phrase(seed_phrase: str) -> str:
     logging.info('Derived private from seed_phrase')
     return wallet_address, encrypt_key(private_key)
 
+def get_wallet_accounts_from_seed_phrase(seed_phrase: str, count: int, start: int = 0) -> list:
+    # Derives account indexes start..start+count-1 from a single seed computation
+    mnemonic_phrase = decrypt_key(seed_phrase)
+    accounts = [
+        (index, account.address, encrypt_key(account.key.hex()))
+        for index, account in derive_accounts(mnemonic_phrase, count, start)
+    ]
+    logging.info('Derived wallet accounts from seed_phrase', extra={'log_data': {'count': count, 'start': start}})
+    return accounts
+
 def get_wallet_address_from_private_key(private_key: str) -> str:
     decrypted_private_key = decrypt_key(private_key)
-    Account.enable_unaudited_hdwallet_features()
     account = Account.from_key(decrypted_private_key)
     wallet_address = account.address
     logging.info('Derived wallet address from private_key.')
     return wallet_address, private_key
 
-def encrypt_key(seed_phrase: str) -> str:
-    SECRET_KEY = os.getenv('SECRET_KEY').encode()
-    aesgcm = AESGCM(SECRET_KEY)
-    iv = os.urandom(12)  # GCM recommended IV size is 12 bytes
-    ciphertext = aesgcm.encrypt(iv, seed_phrase.encode(), None)
-    encrypted_data = {
-        'ciphertext': b64encode(ciphertext).decode(),
-        'iv': b64encode(iv).decode(),
-    }
-    encrypted_string = b64encode(str(encrypted_data).encode()).decode()
+def _get_cipher(key_id: int, data_key: bytes = None) -> AESGCM:
+    if key_id == KEY_ID_SECRET_KEY:
+        return AESGCM(os.getenv('SECRET_KEY').encode())
+    if key_id == KEY_ID_DATA_KEY:
+        if data_key is None:
+            raise ValueError('A user data key is required for this envelope')
+        return AESGCM(data_key)
+    raise ValueError(f'Unknown encryption key id: {key_id}')
+
+def encrypt_key(seed_phrase: str, key_id: int = KEY_ID_SECRET_KEY, data_key: bytes = None) -> str:
+    iv = os.urandom(IV_SIZE)  # GCM recommended IV size is 12 bytes
+    ciphertext = _get_cipher(key_id, data_key).encrypt(iv, seed_phrase.encode(), None)
+    encrypted_string = b64encode(bytes((ENVELOPE_VERSION, key_id)) + iv + ciphertext).decode()
     logging.info('Encrypted key successfully.')
     return encrypted_string
 
-def decrypt_key(encrypted_string: str) -> str:
-    SECRET_KEY = os.getenv('SECRET_KEY').encode()
-    aesgcm = AESGCM(SECRET_KEY)
-    encrypted_data = eval(b64decode(encrypted_string).decode())
-    iv = b64decode(encrypted_data['iv'])
-    ciphertext = b64decode(encrypted_data['ciphertext'])
-    plaintext = aesgcm.decrypt(iv, ciphertext, None)
+def decrypt_key(encrypted_string: str, data_key: bytes = None) -> str:
+    envelope = b64decode(encrypted_string)
+    if envelope[0] == ENVELOPE_VERSION:
+        key_id = envelope[1]
+        iv = envelope[ENVELOPE_HEADER_SIZE:ENVELOPE_HEADER_SIZE + IV_SIZE]
+        ciphertext = envelope[ENVELOPE_HEADER_SIZE + IV_SIZE:]
+    else:
+        # Legacy format: base64(str(dict(base64 ciphertext, base64 iv)))
+        key_id = KEY_ID_SECRET_KEY
+        encrypted_data = literal_eval(envelope.decode())
+        iv = b64decode(encrypted_data['iv'])
+        ciphertext = b64decode(encrypted_data['ciphertext'])
+    plaintext = _get_cipher(key_id, data_key).decrypt(iv, ciphertext, None)
     logging.info('Decrypted key successfully.')
-    return plaintext.decode()
\ No newline at end of file
+    return plaintext.decode()
+
+def is_legacy_envelope(encrypted_string: str) -> bool:
+    return encrypted_string.startswith(LEGACY_ENVELOPE_PREFIX)
+
+def reencrypt_key(encrypted_string: str, key_id: int = KEY_ID_SECRET_KEY, data_key: bytes = None) -> str:
+    return encrypt_key(decrypt_key(encrypted_string, data_key), key_id, data_key)
@@ -0,0 +1,40 @@
+from eth_account import Account
+from eth_account.hdaccount import seed_from_mnemonic
+# Private eth_account internals: eth-account is pinned in requirements.txt and
+# tests/test_hd_derivation.py checks the output against Account.from_mnemonic
+from eth_account.hdaccount.deterministic import HardNode, SoftNode, derive_child_key, hmac_sha512
+from mnemonic import Mnemonic
+
+# Enable mnemonic features and load the wordlist once per process
+Account.enable_unaudited_hdwallet_features()
+MNEMONIC = Mnemonic('english')
+
+# m/44'/60'/0'/0, account indexes are derived as its children (m/44'/60'/0'/0/N)
+ACCOUNT_PARENT_PATH = (HardNode(44), HardNode(60), HardNode(0), SoftNode(0))
+
+def generate_mnemonic() -> str:
+    return MNEMONIC.generate(strength=128)  # 128 bits of entropy for 12 words
+
+def mnemonic_to_seed(mnemonic_phrase: str) -> bytes:
+    if MNEMONIC.check(mnemonic_phrase):
+        return Mnemonic.to_seed(mnemonic_phrase)
+    # Other languages and abbreviated words go through eth_account's validation
+    return seed_from_mnemonic(mnemonic_phrase, '')
+
+def derive_account_parent(mnemonic_phrase: str):
+    # PBKDF2 stretching and the hardened path are computed once per seed
+    master_node = hmac_sha512(b'Bitcoin seed', mnemonic_to_seed(mnemonic_phrase))
+    key, chain_code = master_node[:32], master_node[32:]
+    for node in ACCOUNT_PARENT_PATH:
+        key, chain_code = derive_child_key(key, chain_code, node)
+    return key, chain_code
+
+def derive_accounts(mnemonic_phrase: str, count: int = 1, start: int = 0):
+    parent_key, parent_chain_code = derive_account_parent(mnemonic_phrase)
+    for index in range(start, start + count):
+        child_key, _ = derive_child_key(parent_key, parent_chain_code, SoftNode(index))
+        yield index, Account.from_key(child_key)
+
+def derive_account(mnemonic_phrase: str):
+    _, account = next(derive_accounts(mnemonic_phrase))
+    return account
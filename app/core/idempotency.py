@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from dotenv import load_dotenv
+from fastapi import HTTPException # type: ignore
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+from app.common.cache import SingleFlight, TTLCache
+from app.common.serializers import PrerenderedJSONResponse, dumps
+from app.models.idempotency_keys import IdempotencyKeyModel
+
+load_dotenv()
+
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '30'))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '10'))
+
+# Sign-up keys are not scoped to a user, so keys must be long enough not to be guessed, e.g. a UUID
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{16,128}$')
+
+# Responses of requests sent with an Idempotency-Key header, stored for IDEMPOTENCY_KEY_TTL.
+# Completed responses are served from an in-process LRU in front of the idempotency_keys
+# collection. A retry that arrives while the first request runs in this process joins it,
+# one that arrives at another instance polls the collection until the response is stored.
+class IdempotencyStore:
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.replays = 0
+        self.singleflight = SingleFlight()
+
+    async def respond(self, request: Request, key: str, owner: str, handler) -> Response:
+        # handler is the endpoint body, called without arguments, run at most once per key
+        if key is None:
+            return await handler()
+        if not IDEMPOTENCY_KEY_PATTERN.match(key):
+            raise HTTPException(status_code=400, detail='Idempotency-Key must be 16 to 128 letters, digits or ._:- characters')
+
+        key_id = hashlib.sha256(f'{owner}\n{request.method} {request.url.path}\n{key}'.encode()).hexdigest()
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        # Requests that join a running call get its result, they are replays as well
+        caller = object()
+        stored_fingerprint, status_code, body, ran_by = await self.singleflight.do(key_id, lambda: self._run(key_id, fingerprint, handler, caller))
+        if stored_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail='Idempotency-Key was already used with a different request body')
+        response = PrerenderedJSONResponse(body, status_code=status_code)
+        if ran_by is not caller:
+            self.replays += 1
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    async def _run(self, key_id: str, fingerprint: str, handler, caller) -> tuple:
+        # Returns (fingerprint, status code, body, caller), caller is None for stored responses
+        cached = self.cache.get(key_id)
+        if cached is not None:
+            return cached + (None,)
+
+        waited = 0.0
+        while True:
+            record = await IdempotencyKeyModel.claim(key_id, fingerprint, IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_LOCK_TIMEOUT)
+            if record is None:
+                break
+            if record['status'] == 'completed':
+                stored = (record['fingerprint'], record['status_code'], record['body'])
+                self.cache.set(key_id, stored)
+                return stored + (None,)
+            if waited >= IDEMPOTENCY_WAIT_TIMEOUT:
+                raise HTTPException(status_code=409, detail='A request with this Idempotency-Key is still being processed')
+            # Another instance is running the request
+            await asyncio.sleep(0.1)
+            waited += 0.1
+
+        try:
+            result = await handler()
+        except BaseException:
+            # Failed requests are not stored, the next retry runs the endpoint again
+            await IdempotencyKeyModel.fail(key_id)
+            raise
+        if isinstance(result, Response):
+            status_code, body = result.status_code, result.body
+        else:
+            status_code, body = 200, dumps(jsonable_encoder(result))
+        await IdempotencyKeyModel.complete(key_id, status_code, body)
+        stored = (fingerprint, status_code, body)
+        self.cache.set(key_id, stored)
+        logging.info('Idempotent response stored.', extra={'log_data': {'status_code': status_code}})
+        return stored + (caller,)
+
+idempotency_store = IdempotencyStore(TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_KEY_TTL))
@@ -1,4 +1,5 @@
 import jwt # type: ignore
+import logging
 import os
 from datetime import datetime, timedelta
 from dotenv import load_dotenv # type: ignore
@@ -0,0 +1,118 @@
+import logging
+import os
+from base64 import b64encode, b64decode
+from datetime import datetime
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from dotenv import load_dotenv
+from app.common.cache import TTLCache
+from app.core.generate_seed_wallet_address import ENVELOPE_HEADER_SIZE, ENVELOPE_VERSION, IV_SIZE
+from app.models.data_keys import DataKeyModel, KeyRotationJobModel
+from app.models.unit_of_work import UnitOfWork
+
+load_dotenv()
+
+# The master key-encryption key wraps one data key per user. MASTER_KEY falls back
+# to SECRET_KEY so deployments without a dedicated master key keep working.
+MASTER_KEY = os.getenv('MASTER_KEY') or os.getenv('SECRET_KEY')
+MASTER_KEY_ID = int(os.getenv('MASTER_KEY_ID', '0'))
+# Comma separated id:key pairs of previous master keys, still needed to unwrap during a rotation
+RETIRED_MASTER_KEYS = os.getenv('RETIRED_MASTER_KEYS', '')
+DATA_KEY_CACHE_SIZE = int(os.getenv('DATA_KEY_CACHE_SIZE', '10000'))
+DATA_KEY_CACHE_TTL = int(os.getenv('DATA_KEY_CACHE_TTL', '300'))
+DATA_KEY_SIZE = 32
+
+_master_keys = None
+
+def get_master_keys() -> dict:
+    global _master_keys
+    if _master_keys is not None:
+        return _master_keys
+    master_keys = {}
+    for entry in filter(None, RETIRED_MASTER_KEYS.split(',')):
+        kek_id, key = entry.split(':', 1)
+        master_keys[int(kek_id)] = AESGCM(key.strip().encode())
+    if MASTER_KEY:
+        master_keys[MASTER_KEY_ID] = AESGCM(MASTER_KEY.encode())
+    _master_keys = master_keys
+    return master_keys
+
+def wrap_data_key(data_key: bytes, kek_id: int = None) -> str:
+    kek_id = MASTER_KEY_ID if kek_id is None else kek_id
+    iv = os.urandom(IV_SIZE)
+    ciphertext = get_master_keys()[kek_id].encrypt(iv, data_key, None)
+    return b64encode(bytes((ENVELOPE_VERSION, kek_id)) + iv + ciphertext).decode()
+
+def unwrap_data_key(wrapped_key: str) -> bytes:
+    envelope = b64decode(wrapped_key)
+    kek_id = envelope[1]
+    master_keys = get_master_keys()
+    if kek_id not in master_keys:
+        raise ValueError(f'Master key {kek_id} is not configured')
+    iv = envelope[ENVELOPE_HEADER_SIZE:ENVELOPE_HEADER_SIZE + IV_SIZE]
+    return master_keys[kek_id].decrypt(iv, envelope[ENVELOPE_HEADER_SIZE + IV_SIZE:], None)
+
+class KeyManager:
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+
+    async def get_data_key(self, userid: str) -> bytes:
+        data_key = self.cache.get(userid)
+        if data_key is not None:
+            return data_key
+
+        record = await DataKeyModel.get_by_userid(userid)
+        if not record:
+            logging.info('Creating data key for user.', extra={'log_data': {'userid': userid}})
+            record = await DataKeyModel.create_data_key(userid, wrap_data_key(os.urandom(DATA_KEY_SIZE)), MASTER_KEY_ID)
+        data_key = unwrap_data_key(record['wrapped_key'])
+        self.cache.set(userid, data_key)
+        return data_key
+
+    def add_data_key(self, uow: UnitOfWork, userid: str, cache: bool = True) -> bytes:
+        # New users get their data key in the same commit as the user document
+        data_key = os.urandom(DATA_KEY_SIZE)
+        DataKeyModel.add_data_key(uow, userid, wrap_data_key(data_key), MASTER_KEY_ID)
+        if cache:
+            self.cache.set(userid, data_key)
+        return data_key
+
+    @property
+    def rotation_pending(self) -> bool:
+        return any(kek_id != MASTER_KEY_ID for kek_id in get_master_keys())
+
+key_manager = KeyManager(TTLCache(DATA_KEY_CACHE_SIZE, DATA_KEY_CACHE_TTL))
+
+async def rotate_master_key(batch_size: int = 500, job_id: str = None):
+    # Re-wraps every data key that is not wrapped with the current master key.
+    # Progress is stored per job so an interrupted rotation resumes where it stopped.
+    job_id = job_id or f'rotate-master-key-{MASTER_KEY_ID}'
+    total = await DataKeyModel.count_not_wrapped_with(MASTER_KEY_ID)
+    job = await KeyRotationJobModel.get_or_create_job(job_id, MASTER_KEY_ID, total)
+    last_id = job['last_id']
+    rewrapped = job['rewrapped']
+    logging.info('Master key rotation started.', extra={'log_data': {'job_id': job_id, 'rewrapped': rewrapped, 'remaining': total}})
+
+    while True:
+        batch = await DataKeyModel.get_batch_not_wrapped_with(MASTER_KEY_ID, last_id, batch_size)
+        if not batch:
+            break
+        operations = [
+            (
+                {'_id': record['_id'], 'kek_id': record['kek_id']},
+                {'$set': {
+                    'wrapped_key': wrap_data_key(unwrap_data_key(record['wrapped_key'])),
+                    'kek_id': MASTER_KEY_ID,
+                    'updated_at': datetime.utcnow()
+                }}
+            )
+            for record in batch
+        ]
+        last_id = batch[-1]['_id']
+        rewrapped += await DataKeyModel.bulk_update(operations)
+        await KeyRotationJobModel.update_progress(job_id, {'last_id': last_id, 'rewrapped': rewrapped})
+        logging.info('Master key rotation progress.', extra={'log_data': {'job_id': job_id, 'rewrapped': rewrapped, 'total': job['total']}})
+
+    await KeyRotationJobModel.update_progress(job_id, {'status': 'completed'})
+    logging.info('Master key rotation completed.', extra={'log_data': {'job_id': job_id, 'rewrapped': rewrapped}})
+    return rewrapped
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import time
+from dotenv import load_dotenv
+from app.common.cache import TTLCache
+from app.core.jwt_handler import decode_jwt_token
+
+load_dotenv()
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '3600'))
+
+# Caches the claims of verified tokens so repeated requests skip the HMAC check.
+# Entries never outlive the token's exp, revoked tokens are rejected on every lookup.
+class TokenCache:
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.revoked = {}
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def verify(self, token: str):
+        key = self._digest(token)
+        if key in self.revoked:
+            return None
+        claims = self.cache.get(key)
+        if claims is None:
+            claims = decode_jwt_token(token)
+            if claims:
+                self.cache.set(key, claims, claims['exp'] - time.time())
+        return claims
+
+    def revoke(self, token: str, expires_at: float = None):
+        key = self._digest(token)
+        self.cache.pop(key)
+        now = time.time()
+        # Revocations are only needed until the token would have expired anyway
+        self.revoked = {digest: exp for digest, exp in self.revoked.items() if exp > now}
+        self.revoked[key] = expires_at or now + TOKEN_CACHE_TTL
+
+    def metrics(self) -> dict:
+        return dict(self.cache.metrics(), revoked=len(self.revoked))
+
+token_cache = TokenCache(TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL))
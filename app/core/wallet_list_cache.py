@@ -0,0 +1,63 @@
+import os
+import time
+from dotenv import load_dotenv
+from app.common.cache import SingleFlight, TTLCache
+
+load_dotenv()
+
+WALLET_LIST_CACHE_SIZE = int(os.getenv('WALLET_LIST_CACHE_SIZE', '10000'))
+WALLET_LIST_CACHE_TTL = int(os.getenv('WALLET_LIST_CACHE_TTL', '30'))
+WALLET_LIST_CACHE_PAGES = int(os.getenv('WALLET_LIST_CACHE_PAGES', '16'))
+
+# Serialized wallet list pages grouped per user, so a wallet mutation drops
+# every cached page of that user with a single pop.
+class WalletListCache:
+
+    def __init__(self, cache: TTLCache, pages_per_user: int):
+        self.cache = cache
+        self.pages_per_user = pages_per_user
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.singleflight = SingleFlight()
+
+    async def get_or_fetch(self, userid: str, page_key: tuple, fetch):
+        pages = self.cache.get(userid)
+        entry = pages.get(page_key) if pages else None
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        invalidations = self.invalidations
+        # Requests that arrive after an invalidation never join an older fetch
+        page = await self.singleflight.do((userid, page_key, invalidations), fetch)
+        if self.invalidations == invalidations:
+            self._store(userid, page_key, page)
+        return page
+
+    def _store(self, userid: str, page_key: tuple, page: dict):
+        pages = self.cache.get(userid)
+        if pages is None:
+            pages = {}
+            self.cache.set(userid, pages)
+        pages[page_key] = (page, time.monotonic() + self.cache.ttl)
+        if len(pages) > self.pages_per_user:
+            del pages[next(iter(pages))]
+
+    def invalidate(self, userid: str):
+        self.invalidations += 1
+        self.cache.pop(userid)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'users': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'singleflight_shared': self.singleflight.shared,
+            'invalidations': self.invalidations,
+        }
+
+wallet_list_cache = WalletListCache(TTLCache(WALLET_LIST_CACHE_SIZE, WALLET_LIST_CACHE_TTL), WALLET_LIST_CACHE_PAGES)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+from app.core.crypto_executor import crypto_executor
+
+load_dotenv()
+
+WALLET_POOL_HIGH_WATER = int(os.getenv('WALLET_POOL_HIGH_WATER', '50'))
+WALLET_POOL_LOW_WATER = int(os.getenv('WALLET_POOL_LOW_WATER', '10'))
+
+# Keeps pre-generated (address, encrypted seed, encrypted private key) triples
+# so signup and PUT /wallet do not pay for key generation inline.
+class WalletPool:
+
+    def __init__(self, high_water: int, low_water: int):
+        if low_water > high_water:
+            raise ValueError('WALLET_POOL_LOW_WATER must not exceed WALLET_POOL_HIGH_WATER')
+        self.high_water = high_water
+        self.low_water = low_water
+        self._wallets = deque()
+        self._refill_needed = asyncio.Event()
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.refill_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.high_water > 0
+
+    def start(self):
+        if not self.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._refill_loop())
+        self._refill_needed.set()
+        logging.info('Wallet pool started.', extra={'log_data': {'high_water': self.high_water, 'low_water': self.low_water}})
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def pop(self):
+        # Returns None when the pool is empty so callers can generate inline
+        try:
+            wallet = self._wallets.popleft()
+            self.hits += 1
+        except IndexError:
+            wallet = None
+            self.misses += 1
+        if len(self._wallets) < self.low_water:
+            self._refill_needed.set()
+        return wallet
+
+    async def _refill_loop(self):
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            started_at = time.perf_counter()
+            generated = 0
+            while len(self._wallets) < self.high_water:
+                try:
+                    wallet = await crypto_executor.generate_seed_wallet_address()
+                except Exception as e:
+                    logging.error('Error pre-generating wallet', extra={'log_data': str(e)})
+                    break
+                self._wallets.append(wallet)
+                generated += 1
+            self.generated += generated
+            self.refill_seconds += time.perf_counter() - started_at
+            if generated:
+                logging.info('Wallet pool refilled.', extra={'log_data': self.metrics()})
+
+    def metrics(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'depth': len(self._wallets),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'generated': self.generated,
+            'refill_rate': self.generated / self.refill_seconds if self.refill_seconds else 0.0,
+        }
+
+wallet_pool = WalletPool(WALLET_POOL_HIGH_WATER, WALLET_POOL_LOW_WATER)
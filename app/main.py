@@ -1,9 +1,23 @@
 from fastapi import FastAPI, Request # type: ignore
+import asyncio
 from datetime import datetime
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueListener
+import queue
 from app.router import router
-from configs.logging_fitlers import MaskingFilter, TraceIDFilter, JSONFormatter
+from app.common.header import MetricsMiddleware, TraceIDMiddleware
+from app.core.crypto_executor import crypto_executor
+from app.core.key_management import key_manager, rotate_master_key
+from app.core.idempotency import idempotency_store
+from app.core.token_cache import token_cache
+from app.core.wallet_list_cache import wallet_list_cache
+from app.core.wallet_pool import wallet_pool
+from app.models.users import user_cache
+from app.storage.repositories import database
+from configs.indexes import check_query_plans, ensure_indexes
+from configs.log_handlers import BoundedQueueHandler, CompressingTimedRotatingFileHandler
+from configs.metrics import Counter, Gauge, registry
+from configs.logging_fitlers import MaskingEngine, MaskingFilter, SamplingFilter, TraceIDFilter, JSONFormatter
 import os
 from dotenv import load_dotenv # type: ignore
 
@@ -12,6 +26,8 @@ load_dotenv()
 
 app = FastAPI()
 app.include_router(router)
+app.add_middleware(TraceIDMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 log_folder = os.getenv('LOG_FOLDER')
@@ -24,22 +40,97 @@ if not log_folder or not log_file_name:
 if not os.path.exists(log_folder):
     os.makedirs(log_folder)
 
+# One masking engine, compiled from LOGS_MASKING_PARAMS, shared by the filter and formatter
+masking_engine = MaskingEngine.from_env()
+
 # Define the custom JSON formatter
-json_formatter = JSONFormatter()
-log_handler = TimedRotatingFileHandler(os.path.join(log_folder, log_file_name), when='midnight', interval=1, backupCount=30)
+json_formatter = JSONFormatter(masking_engine)
+log_handler = CompressingTimedRotatingFileHandler(os.path.join(log_folder, log_file_name), when='midnight', interval=1, backupCount=30)
 log_handler.setFormatter(json_formatter)
 log_handler.setLevel(logging.INFO)
 
 # Rename the log file to include the date
 log_handler.namer = lambda name: name.replace(log_file_name, f"{log_file_name.split('.')[0]}-{datetime.now().strftime('%Y-%m-%d')}.log")
 
+# Masking runs with the file handler on the listener thread
+masking_filter = MaskingFilter(masking_engine)
+log_handler.addFilter(masking_filter)
+
+# Records are queued by the request path and written by a dedicated listener thread
+log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+queue_handler = BoundedQueueHandler(log_queue, os.getenv('LOG_QUEUE_POLICY', 'drop'), float(os.getenv('LOG_QUEUE_BLOCK_TIMEOUT', '1.0')))
+queue_handler.setLevel(log_handler.level)
+log_listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+
+# Sampled out records are dropped before they reach the queue
+sampling_filter = SamplingFilter.from_env()
+queue_handler.addFilter(sampling_filter)
+
+# The trace id is read from the request context, so it is attached before queuing
+trace_id_filter = TraceIDFilter()
+queue_handler.addFilter(trace_id_filter)
+
 app_logger = logging.getLogger()
 log_level = os.getenv('LOG_LEVEL').upper()
 app_logger.setLevel(getattr(logging, log_level))
-app_logger.addHandler(log_handler)
+app_logger.addHandler(queue_handler)
+log_listener.start()
 
-trace_id_filter = TraceIDFilter()
-app_logger.addFilter(trace_id_filter)
+# Component state is read when /metrics is scraped, so the hot paths keep their plain counters
+def cache_entries():
+    caches = {'user': user_cache, 'token': token_cache.cache, 'wallet_list': wallet_list_cache.cache, 'idempotency': idempotency_store.cache}
+    return {(name,): len(cache) for name, cache in caches.items()}
+
+def cache_lookups():
+    samples = {}
+    for name, cache in (('user', user_cache), ('token', token_cache.cache), ('wallet_list', wallet_list_cache), ('idempotency', idempotency_store.cache)):
+        samples[(name, 'hit')] = cache.hits
+        samples[(name, 'miss')] = cache.misses
+    return samples
+
+registry.register(Gauge('wallet_pool_depth', 'Pregenerated wallets ready to be handed out.',
+                        collect=lambda: {(): wallet_pool.metrics()['depth']}))
+registry.register(Counter('wallet_pool_requests_total', 'Wallet pool requests by result.', ('result',),
+                          collect=lambda: {('hit',): wallet_pool.hits, ('miss',): wallet_pool.misses}))
+registry.register(Counter('wallet_pool_generated_total', 'Wallets pregenerated by the pool refill.',
+                          collect=lambda: {(): wallet_pool.generated}))
+registry.register(Gauge('wallet_pool_refill_rate', 'Wallets pregenerated per second of refill work.',
+                        collect=lambda: {(): wallet_pool.metrics()['refill_rate']}))
+registry.register(Gauge('crypto_executor_pending', 'Crypto calls queued or running on the executor.',
+                        collect=lambda: {(): crypto_executor.pending}))
+registry.register(Gauge('cache_entries', 'Entries held by each in-process cache.', ('cache',), collect=cache_entries))
+registry.register(Counter('cache_lookups_total', 'In-process cache lookups by result.', ('cache', 'result'), collect=cache_lookups))
+registry.register(Counter('idempotent_replays_total', 'Requests answered with the stored response of an earlier request with the same Idempotency-Key.',
+                          collect=lambda: {(): idempotency_store.replays}))
+registry.register(Counter('log_records_dropped_total', 'Log records not written, by reason.', ('reason',),
+                          collect=lambda: {('queue_full',): queue_handler.dropped, ('sampled',): sampling_filter.dropped}))
+
+@app.on_event('startup')
+async def start_wallet_pool():
+    wallet_pool.start()
+
+@app.on_event('shutdown')
+async def stop_wallet_pool():
+    await wallet_pool.stop()
+    crypto_executor.shutdown()
+
+@app.on_event('startup')
+async def resume_master_key_rotation():
+    # Retired master keys are configured while a rotation is in progress
+    if key_manager.rotation_pending:
+        app.state.master_key_rotation = asyncio.create_task(rotate_master_key())
+
+@app.on_event('startup')
+async def bootstrap_indexes():
+    # The memory storage backend maintains its own indexes
+    if database is None:
+        return
+    await ensure_indexes(database)
+    # In test mode every model query must be backed by an index
+    if os.getenv('APP_ENV') == 'test':
+        await check_query_plans(database)
 
-masking_filter = MaskingFilter()
-app_logger.addFilter(masking_filter)
\ No newline at end of file
+@app.on_event('shutdown')
+async def stop_log_listener():
+    # Flushes the queued records before the process exits
+    log_listener.stop()
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import logging
+from pymongo import UpdateOne # type: ignore
+from app.core.generate_seed_wallet_address import LEGACY_ENVELOPE_PREFIX, KEY_ID_DATA_KEY, reencrypt_key
+from app.core.key_management import key_manager, rotate_master_key
+
+# Usage:
+#   python -m app.migrations.data_keys encrypt-private-keys [--batch-size 500]
+#   python -m app.migrations.data_keys rotate-master-key [--batch-size 500] [--job-id ID]
+
+# v1 envelopes with key id 0 (SECRET_KEY) start with base64 "AQ" followed by one of A-D
+SECRET_KEY_ENVELOPE_PATTERN = 'AQ[A-D]'
+
+async def encrypt_private_keys_with_data_keys(batch_size: int) -> int:
+    from configs.db import private_keys_collection
+
+    migrated = 0
+    operations = []
+    query = {'private_key': {'$regex': f'^({LEGACY_ENVELOPE_PREFIX}|{SECRET_KEY_ENVELOPE_PATTERN})'}}
+    cursor = private_keys_collection.find(query, {'userid': 1, 'private_key': 1}).batch_size(batch_size)
+    async for document in cursor:
+        data_key = await key_manager.get_data_key(document['userid'])
+        new_value = reencrypt_key(document['private_key'], KEY_ID_DATA_KEY, data_key)
+        operations.append(UpdateOne({'_id': document['_id'], 'private_key': document['private_key']}, {'$set': {'private_key': new_value}}))
+        if len(operations) >= batch_size:
+            result = await private_keys_collection.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+            operations = []
+            logging.info('Encrypted private key batch with data keys.', extra={'log_data': {'migrated': migrated}})
+    if operations:
+        result = await private_keys_collection.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+    return migrated
+
+async def main(args):
+    if args.command == 'encrypt-private-keys':
+        migrated = await encrypt_private_keys_with_data_keys(args.batch_size)
+        print(f'private_keys.private_key: {migrated} documents migrated')
+    else:
+        rewrapped = await rotate_master_key(args.batch_size, args.job_id)
+        print(f'data_keys: {rewrapped} data keys re-wrapped')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage per-user data keys.')
+    parser.add_argument('command', choices=['encrypt-private-keys', 'rotate-master-key'])
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--job-id', default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import logging
+from pymongo import UpdateOne # type: ignore
+from app.core.generate_seed_wallet_address import LEGACY_ENVELOPE_PREFIX, reencrypt_key
+
+# Rewrites legacy encrypted seeds and private keys into the v1 envelope format.
+# Usage: python -m app.migrations.envelope_v1 [--batch-size 500]
+
+MIGRATED_FIELDS = [
+    ('wallets', 'seed_phrase'),
+    ('private_keys', 'private_key'),
+]
+
+async def migrate_collection(collection, field: str, batch_size: int) -> int:
+    migrated = 0
+    operations = []
+    cursor = collection.find({field: {'$regex': f'^{LEGACY_ENVELOPE_PREFIX}'}}, {field: 1}).batch_size(batch_size)
+    async for document in cursor:
+        legacy_value = document[field]
+        try:
+            new_value = reencrypt_key(legacy_value)
+        except Exception as e:
+            logging.error('Skipping document that could not be re-encrypted.', extra={'log_data': {'collection': collection.name, '_id': str(document['_id']), 'error': str(e)}})
+            continue
+        # Only replace the value that was read, concurrent writes win
+        operations.append(UpdateOne({'_id': document['_id'], field: legacy_value}, {'$set': {field: new_value}}))
+        if len(operations) >= batch_size:
+            result = await collection.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+            operations = []
+            logging.info('Migrated envelope batch.', extra={'log_data': {'collection': collection.name, 'migrated': migrated}})
+    if operations:
+        result = await collection.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+    return migrated
+
+async def main(batch_size: int):
+    from configs.db import database
+
+    for collection_name, field in MIGRATED_FIELDS:
+        migrated = await migrate_collection(database.get_collection(collection_name), field, batch_size)
+        logging.info('Envelope migration completed.', extra={'log_data': {'collection': collection_name, 'migrated': migrated}})
+        print(f'{collection_name}.{field}: {migrated} documents migrated')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert legacy encrypted seeds and private keys to the v1 envelope format.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
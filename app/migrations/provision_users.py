@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import json
+import sys
+from app.core.crypto_executor import crypto_executor
+from app.services.provisioning_service import PROVISION_BATCH_SIZE, provision_users
+
+# Usage:
+#   python -m app.migrations.provision_users users.ndjson --job-id partner-2024-06 [--batch-size 500]
+# Rerunning with the same job id resumes after the last committed line.
+
+async def read_chunks(path: str, chunk_size: int = 1 << 16):
+    with open(path, 'rb') as ndjson_file:
+        while True:
+            chunk = ndjson_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+async def main(args):
+    try:
+        job = await provision_users(read_chunks(args.path), args.job_id, args.batch_size)
+    finally:
+        crypto_executor.shutdown()
+    print(json.dumps(job, indent=2))
+    if job['status'] != 'completed':
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create users from an NDJSON file of sign-up records.')
+    parser.add_argument('path')
+    parser.add_argument('--job-id', required=True)
+    parser.add_argument('--batch-size', type=int, default=PROVISION_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
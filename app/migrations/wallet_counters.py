@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import logging
+from pymongo import UpdateOne # type: ignore
+
+# Recomputes users.wallet_count from the wallets collection when the counters drift.
+# Usage: python -m app.migrations.wallet_counters [--batch-size 500]
+
+async def recompute_wallet_counters(batch_size: int) -> int:
+    from configs.db import user_collection, wallet_collection
+
+    repaired = 0
+    userids = []
+    async for user in user_collection.find({}, {'userid': 1, 'wallet_count': 1}).batch_size(batch_size):
+        userids.append((user['userid'], user.get('wallet_count')))
+        if len(userids) >= batch_size:
+            repaired += await _repair_batch(user_collection, wallet_collection, userids)
+            userids = []
+    if userids:
+        repaired += await _repair_batch(user_collection, wallet_collection, userids)
+    return repaired
+
+async def _repair_batch(user_collection, wallet_collection, userids: list) -> int:
+    pipeline = [
+        {'$match': {'userid': {'$in': [userid for userid, _ in userids]}, 'isDeleted': False}},
+        {'$group': {'_id': '$userid', 'wallet_count': {'$sum': 1}}}
+    ]
+    counts = {row['_id']: row['wallet_count'] async for row in wallet_collection.aggregate(pipeline)}
+    operations = [
+        UpdateOne({'userid': userid}, {'$set': {'wallet_count': counts.get(userid, 0)}})
+        for userid, wallet_count in userids
+        if wallet_count != counts.get(userid, 0)
+    ]
+    if not operations:
+        return 0
+    result = await user_collection.bulk_write(operations, ordered=False)
+    logging.info('Repaired wallet counters.', extra={'log_data': {'repaired': result.modified_count}})
+    return result.modified_count
+
+async def main(batch_size: int):
+    repaired = await recompute_wallet_counters(batch_size)
+    print(f'users.wallet_count: {repaired} counters repaired')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute the per-user wallet counters.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,81 @@
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError # type: ignore
+from app.models.unit_of_work import UnitOfWork
+from app.storage.repositories import data_keys_repository, key_rotation_jobs_repository
+
+class DataKeyModel:
+
+    @staticmethod
+    async def get_by_userid(userid: str):
+        data_key = await data_keys_repository.find_one({'userid': userid})
+        return data_key
+
+    @staticmethod
+    async def get_by_userids(userids: list):
+        data_keys = await data_keys_repository.find({'userid': {'$in': userids}})
+        return data_keys
+
+    @staticmethod
+    def add_data_key(uow: UnitOfWork, userid: str, wrapped_key: str, kek_id: int):
+        uow.insert_one(data_keys_repository, {
+            'userid': userid,
+            'wrapped_key': wrapped_key,
+            'kek_id': kek_id,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        })
+
+    @staticmethod
+    async def create_data_key(userid: str, wrapped_key: str, kek_id: int):
+        data_key = {
+            'userid': userid,
+            'wrapped_key': wrapped_key,
+            'kek_id': kek_id,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }
+        try:
+            await data_keys_repository.insert_one(data_key)
+        except DuplicateKeyError:
+            # Another request created the user's data key first, use that one
+            return await DataKeyModel.get_by_userid(userid)
+        return data_key
+
+    @staticmethod
+    async def count_not_wrapped_with(kek_id: int):
+        return await data_keys_repository.count({'kek_id': {'$ne': kek_id}})
+
+    @staticmethod
+    async def get_batch_not_wrapped_with(kek_id: int, after_id=None, limit: int = 500):
+        query = {'kek_id': {'$ne': kek_id}}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        return await data_keys_repository.find(query, sort=[('_id', 1)], limit=limit)
+
+    @staticmethod
+    async def bulk_update(operations: list):
+        return await data_keys_repository.bulk_write([('update', operation) for operation in operations], ordered=False)
+
+class KeyRotationJobModel:
+
+    @staticmethod
+    async def get_or_create_job(job_id: str, kek_id: int, total: int):
+        job = await key_rotation_jobs_repository.find_one_and_update(
+            {'_id': job_id},
+            {'$setOnInsert': {
+                'kek_id': kek_id,
+                'last_id': None,
+                'rewrapped': 0,
+                'total': total,
+                'status': 'running',
+                'created_at': datetime.utcnow()
+            }},
+            upsert=True
+        )
+        return job
+
+    @staticmethod
+    async def update_progress(job_id: str, update_data: dict):
+        update_data['updated_at'] = datetime.utcnow()
+        result = await key_rotation_jobs_repository.update_one({'_id': job_id}, {'$set': update_data})
+        return result
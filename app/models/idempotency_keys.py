@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError # type: ignore
+from app.storage.repositories import idempotency_keys_repository
+
+class IdempotencyKeyModel:
+
+    @staticmethod
+    async def claim(key_id: str, fingerprint: str, ttl: int, lock_timeout: int):
+        # Returns None when the caller now owns the key, otherwise the record of the request that does.
+        # Failed, expired and abandoned (lock timed out) records can be claimed again
+        now = datetime.utcnow()
+        pending = {
+            'status': 'pending',
+            'fingerprint': fingerprint,
+            'locked_until': now + timedelta(seconds=lock_timeout),
+            'expires_at': now + timedelta(seconds=ttl)
+        }
+        try:
+            await idempotency_keys_repository.insert_one(dict(pending, _id=key_id))
+            return None
+        except DuplicateKeyError:
+            pass
+        claimed = await idempotency_keys_repository.find_one_and_update(
+            {'_id': key_id, '$or': [
+                {'status': 'failed'},
+                {'status': 'pending', 'locked_until': {'$lt': now}},
+                {'expires_at': {'$lt': now}}
+            ]},
+            {'$set': pending},
+            projection={'_id': 1}
+        )
+        if claimed:
+            return None
+        return await idempotency_keys_repository.find_one({'_id': key_id})
+
+    @staticmethod
+    async def complete(key_id: str, status_code: int, body: bytes):
+        result = await idempotency_keys_repository.update_one(
+            {'_id': key_id},
+            {'$set': {'status': 'completed', 'status_code': status_code, 'body': body}, '$unset': {'locked_until': ''}}
+        )
+        return result
+
+    @staticmethod
+    async def fail(key_id: str):
+        result = await idempotency_keys_repository.update_one({'_id': key_id}, {'$set': {'status': 'failed'}})
+        return result
@@ -1,6 +1,10 @@
 from datetime import datetime
-from configs.db import private_keys_collection
 from bson import ObjectId
+from app.core.crypto_executor import crypto_executor
+from app.core.generate_seed_wallet_address import KEY_ID_DATA_KEY
+from app.core.key_management import key_manager
+from app.models.unit_of_work import UnitOfWork
+from app.storage.repositories import private_keys_repository
 from app.schemas.wallet import WalletNetwork
 
 class PrivateKeysModel:
@@ -12,11 +16,16 @@ class PrivateKeysModel:
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
 
-    def save(self):
+    async def add_to(self, uow: UnitOfWork, data_key: bytes = None):
+        # data_key is passed when the user's data key is written in the same commit
         if not self.private_key:
             self.network = WalletNetwork.SUPRA
+        else:
+            # Private keys are stored encrypted with the user's data key
+            data_key = data_key or await key_manager.get_data_key(self.userid)
+            self.private_key = await crypto_executor.reencrypt_key(self.private_key, KEY_ID_DATA_KEY, data_key)
         
-        private_keys_collection.insert_one({
+        uow.insert_one(private_keys_repository, {
             'userid': self.userid,
             'private_key': self.private_key,
             'network': self.network.value,  # Save the enum value
@@ -24,12 +33,29 @@ class PrivateKeysModel:
             'updated_at': self.updated_at
         })
 
-    def save_private_key(userid, private_key, network=WalletNetwork.SUPRA):
+    async def save(self):
+        uow = UnitOfWork()
+        await self.add_to(uow)
+        await uow.commit()
+
+    @staticmethod
+    async def add_private_key(uow: UnitOfWork, userid, private_key, network=WalletNetwork.SUPRA, data_key: bytes = None):
+        private_key_model = PrivateKeysModel(userid, private_key, network)
+        await private_key_model.add_to(uow, data_key)
+
+    @staticmethod
+    async def save_private_key(userid, private_key, network=WalletNetwork.SUPRA):
         private_key_model = PrivateKeysModel(userid, private_key, network)
-        return private_key_model.save()
+        return await private_key_model.save()
+
+    @staticmethod
+    async def get_userids_with_keys(userids: list):
+        private_keys = await private_keys_repository.find({'userid': {'$in': userids}}, {'userid': 1})
+        return {private_key['userid'] for private_key in private_keys}
 
-    def get_by_userid(userid):
-        data = private_keys_collection.find_one({'userid': userid})
+    @staticmethod
+    async def get_by_userid(userid):
+        data = await private_keys_repository.find_one({'userid': userid})
         if data:
-            data['network'] = Network(data['network'])  # Convert back to enum
-        return data
\ No newline at end of file
+            data['network'] = WalletNetwork(data['network'])  # Convert back to enum
+        return data
@@ -0,0 +1,37 @@
+from datetime import datetime
+from app.models.unit_of_work import UnitOfWork
+from app.storage.repositories import provisioning_jobs_repository
+
+class ProvisioningJobModel:
+
+    @staticmethod
+    async def get_or_create_job(job_id: str):
+        job = await provisioning_jobs_repository.find_one_and_update(
+            {'_id': job_id},
+            {
+                '$set': {'status': 'running', 'updated_at': datetime.utcnow()},
+                '$setOnInsert': {
+                    'line': 0,
+                    'created': 0,
+                    'existing': 0,
+                    'duplicate': 0,
+                    'invalid': 0,
+                    'created_at': datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+        return job
+
+    @staticmethod
+    def add_progress(uow: UnitOfWork, job_id: str, line: int, counts: dict):
+        # Written last in the batch's commit, the checkpoint only moves once the batch is stored
+        uow.update_one(provisioning_jobs_repository, {'_id': job_id}, {
+            '$set': {'line': line, 'updated_at': datetime.utcnow()},
+            '$inc': counts
+        })
+
+    @staticmethod
+    async def update_status(job_id: str, status: str):
+        result = await provisioning_jobs_repository.update_one({'_id': job_id}, {'$set': {'status': status, 'updated_at': datetime.utcnow()}})
+        return result
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from pymongo.errors import ClientBulkWriteException, InvalidOperation, PyMongoError # type: ignore
+from app.storage.mongo import raise_duplicate_key, write_request
+from app.storage.repositories import STORAGE_BACKEND, client
+
+load_dotenv()
+
+# bulk: one ordered client-level bulkWrite (MongoDB 8.0+), one round trip
+# transaction: one multi-document transaction (replica set or sharded cluster)
+# sequential: ordered, awaited writes batched per collection
+# The memory storage backend always writes sequentially
+MONGO_WRITE_MODE = os.getenv('MONGO_WRITE_MODE', 'bulk') if STORAGE_BACKEND == 'mongo' else 'sequential'
+UOW_MAX_RETRIES = int(os.getenv('UOW_MAX_RETRIES', '3'))
+
+# Collects the writes of one logical operation and applies them in a single commit
+class UnitOfWork:
+
+    write_mode = MONGO_WRITE_MODE
+
+    def __init__(self):
+        self.operations = []
+        self.callbacks = []
+
+    def insert_one(self, repository, document: dict):
+        self.operations.append((repository, 'insert', (document,)))
+
+    def update_one(self, repository, query: dict, update: dict):
+        self.operations.append((repository, 'update', (query, update)))
+
+    def on_commit(self, callback):
+        # Runs after every operation has been written, e.g. to refresh caches
+        self.callbacks.append(callback)
+
+    async def commit(self):
+        if not self.operations:
+            return
+        started_at = time.perf_counter()
+        if UnitOfWork.write_mode == 'bulk':
+            try:
+                await self._commit_bulk()
+            except InvalidOperation as e:
+                # Raised before anything is sent when the server predates client bulkWrite
+                logging.warning('Client bulk write unsupported, using sequential writes.', extra={'log_data': str(e)})
+                UnitOfWork.write_mode = 'sequential'
+                await self._commit_sequential()
+        elif UnitOfWork.write_mode == 'transaction':
+            await self._commit_transaction()
+        else:
+            await self._commit_sequential()
+        logging.info('Unit of work committed.', extra={'log_data': {
+            'mode': UnitOfWork.write_mode,
+            'operations': len(self.operations),
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 3)
+        }})
+        for callback in self.callbacks:
+            callback()
+
+    async def _commit_bulk(self):
+        # Retryable writes let the driver retry this command once on transient errors
+        requests = [write_request(kind, args, repository.namespace) for repository, kind, args in self.operations]
+        try:
+            await client.bulk_write(requests, ordered=True)
+        except ClientBulkWriteException as e:
+            raise_duplicate_key(e)
+
+    async def _commit_sequential(self, session=None):
+        # Consecutive operations on the same collection share one bulk_write
+        batch_repository, batch = None, []
+        for repository, kind, args in self.operations:
+            if batch and repository is not batch_repository:
+                await batch_repository.bulk_write(batch, ordered=True, session=session)
+                batch = []
+            batch_repository = repository
+            batch.append((kind, args))
+        if batch:
+            await batch_repository.bulk_write(batch, ordered=True, session=session)
+
+    async def _commit_transaction(self):
+        async with await client.start_session() as session:
+            for attempt in range(1, UOW_MAX_RETRIES + 1):
+                session.start_transaction()
+                try:
+                    await self._commit_sequential(session)
+                except PyMongoError as e:
+                    await session.abort_transaction()
+                    if not self._retry_transaction(e, attempt):
+                        raise
+                    await asyncio.sleep(0.05 * attempt)
+                    continue
+                try:
+                    await self._commit_with_retry(session)
+                    return
+                except PyMongoError as e:
+                    if not self._retry_transaction(e, attempt):
+                        raise
+                    await asyncio.sleep(0.05 * attempt)
+
+    @staticmethod
+    def _retry_transaction(e: PyMongoError, attempt: int) -> bool:
+        # The server aborted the transaction and discarded its writes, so it can run again
+        if not e.has_error_label('TransientTransactionError') or attempt == UOW_MAX_RETRIES:
+            return False
+        logging.warning('Retrying transaction after transient error.', extra={'log_data': {'attempt': attempt, 'error': str(e)}})
+        return True
+
+    @staticmethod
+    async def _commit_with_retry(session):
+        # The first commit may have been applied when its result is unknown. Only the commit
+        # is retried, which the server acknowledges again, running the writes again could
+        # apply increments such as wallet_count twice
+        for attempt in range(1, UOW_MAX_RETRIES + 1):
+            try:
+                await session.commit_transaction()
+                return
+            except PyMongoError as e:
+                if not e.has_error_label('UnknownTransactionCommitResult') or attempt == UOW_MAX_RETRIES:
+                    raise
+                logging.warning('Retrying transaction commit after unknown result.', extra={'log_data': {'attempt': attempt, 'error': str(e)}})
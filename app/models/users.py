@@ -1,8 +1,21 @@
 from datetime import datetime
 import enum
 from bson import ObjectId # type: ignore
-from configs.db import user_collection
+import os
+from dotenv import load_dotenv # type: ignore
+from app.storage.repositories import user_repository
+from app.common.cache import TTLCache
+from app.models.unit_of_work import UnitOfWork
+from configs.metrics import instrument_model
 
+load_dotenv()
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+@instrument_model
 class UserModel:
 
     def __init__(
@@ -37,30 +50,99 @@ class UserModel:
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
 
+    @staticmethod
+    def _cache_user(user: dict):
+        # wallet_count changes with every wallet write and is never served from the cache
+        user_cache.set(user['userid'], {k: v for k, v in user.items() if k != 'wallet_count'})
+
     @staticmethod
     async def create_user(user_data: dict):
         user_data['created_at'] = datetime.utcnow()
         user_data['updated_at'] = datetime.utcnow()
-        result = await user_collection.insert_one(user_data)
+        result = await user_repository.insert_one(user_data)
+        UserModel._cache_user(user_data)
         return result
 
+    @staticmethod
+    def add_user(uow: UnitOfWork, user_data: dict, cache: bool = True):
+        # Bulk provisioning skips the cache, those users are not about to be read
+        user_data['created_at'] = datetime.utcnow()
+        user_data['updated_at'] = datetime.utcnow()
+        uow.insert_one(user_repository, user_data)
+        if cache:
+            uow.on_commit(lambda: UserModel._cache_user(user_data))
+
+    @staticmethod
+    def add_user_update(uow: UnitOfWork, userid: str, update_data: dict):
+        update_data = {k: v for k, v in update_data.items() if k != '_id'}
+        update_data['updated_at'] = datetime.utcnow()
+        uow.update_one(user_repository, {'userid': userid}, {'$set': update_data})
+        uow.on_commit(lambda: user_cache.pop(userid))
+
     @staticmethod
     async def update_user(userid: str, update_data: dict):
+        # Returns the updated user, which also refreshes the cache without a second read
         update_data['updated_at'] = datetime.utcnow()
-        result = await user_collection.update_one({'userid': userid}, {'$set': update_data})
-        return result
+        user = await user_repository.find_one_and_update(
+            {'userid': userid},
+            {'$set': update_data},
+            projection={'wallet_count': 0}
+        )
+        if user:
+            UserModel._cache_user(user)
+        else:
+            user_cache.pop(userid)
+        return user
 
     @staticmethod
     async def find_user_by_id(userid: str):
-        user = await user_collection.find_one({'_id': ObjectId(userid)})
+        user = await user_repository.find_one({'_id': ObjectId(userid)})
         return user
     
     @staticmethod
     async def get_user_by_userid(userid: str):
-        user = await user_collection.find_one({'userid': userid})
-        return user
+        user = user_cache.get(userid)
+        if user is None:
+            user = await user_repository.find_one({'userid': userid}, {'wallet_count': 0})
+            if not user:
+                return None
+            UserModel._cache_user(user)
+        # Callers modify the returned document, keep the cached one intact
+        return dict(user)
     
+    @staticmethod
+    async def get_existing_userids(userids: list):
+        users = await user_repository.find({'userid': {'$in': userids}}, {'userid': 1})
+        return {user['userid'] for user in users}
+
+    @staticmethod
+    async def get_existing_social_ids(social_ids: list):
+        users = await user_repository.find({'social_id': {'$in': social_ids}}, {'social_id': 1})
+        return {user['social_id'] for user in users}
+
     @staticmethod
     async def get_user_by_social_id(social_id: str):
-        user = await user_collection.find_one({'social_id': social_id})
-        return user
\ No newline at end of file
+        user = await user_repository.find_one({'social_id': social_id}, {'wallet_count': 0})
+        return user
+    
+    @staticmethod
+    async def get_wallet_count(userid: str):
+        user = await user_repository.find_one({'userid': userid}, {'wallet_count': 1})
+        return user.get('wallet_count') if user else None
+    
+    @staticmethod
+    async def set_wallet_count(userid: str, wallet_count: int):
+        # Only initialises the counter, a concurrent first read may have set it already
+        result = await user_repository.update_one({'userid': userid, 'wallet_count': {'$exists': False}}, {'$set': {'wallet_count': wallet_count}})
+        return result
+    
+    # Increments skip users created before the counter existed, $inc would otherwise create it
+    # from 0 and the lazy initialisation in WalletModel.get_wallet_count would never count them
+    @staticmethod
+    def add_wallet_count_increment(uow: UnitOfWork, userid: str, amount: int = 1):
+        uow.update_one(user_repository, {'userid': userid, 'wallet_count': {'$exists': True}}, {'$inc': {'wallet_count': amount}})
+    
+    @staticmethod
+    async def increment_wallet_count(userid: str, amount: int = 1):
+        result = await user_repository.update_one({'userid': userid, 'wallet_count': {'$exists': True}}, {'$inc': {'wallet_count': amount}})
+        return result
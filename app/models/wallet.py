@@ -1,48 +1,147 @@
+import asyncio
+from collections import Counter
 from datetime import datetime
-from configs.db import wallet_collection
 from bson import ObjectId
+from app.core.key_management import key_manager
 from app.models.private_keys import PrivateKeysModel
+from app.models.unit_of_work import UnitOfWork
+from app.storage.repositories import user_repository, wallet_repository
+from configs.metrics import instrument_model
+from app.models.users import UserModel
 
+# Fields read by the wallet list, covered by the wallet_list_covering index
+WALLET_LIST_PROJECTION = {'_id': 1, 'wallet_name': 1, 'wallet_address': 1, 'seed_phrase': 1, 'created_at': 1, 'updated_at': 1}
+WALLET_LIST_SORT = [('updated_at', -1), ('_id', -1)]
+
+@instrument_model
 class WalletModel:
     
     @staticmethod
-    async def create_wallet(wallet_data: dict):
+    async def add_wallet(uow: UnitOfWork, wallet_data: dict, data_key: bytes = None):
+        # data_key is passed when the user's data key is written in the same commit
         wallet_data['isDeleted'] = False
-        
-        if 'private_key' in wallet_data:
-            private_key = wallet_data.pop('private_key')
-            
+        has_private_key = 'private_key' in wallet_data
+        private_key = wallet_data.pop('private_key', None)
+
+        # The wallet is written first, the ordered commit stops before the private key
+        # when wallet_address_unique rejects it
+        uow.insert_one(wallet_repository, wallet_data)
+        if has_private_key:
             # Save the private key using PrivateKeysModel
-            PrivateKeysModel.save_private_key(wallet_data['userid'], private_key)
+            await PrivateKeysModel.add_private_key(uow, wallet_data['userid'], private_key, data_key=data_key)
+        UserModel.add_wallet_count_increment(uow, wallet_data['userid'])
 
-        result = await wallet_collection.insert_one(wallet_data)
-        return result
+    @staticmethod
+    async def add_wallets(uow: UnitOfWork, wallets: list, data_keys: dict = None, increment_count: bool = True):
+        # Batched form of add_wallet for wallets carrying their userid: the wallets, then the private keys,
+        # then the counter increments, so sequential commits write each collection with a single bulk_write.
+        # The ordered commit stops before any private key when wallet_address_unique rejects a wallet.
+        # data_keys maps userids to data keys written in the same commit
+        data_keys = data_keys or {}
+        userids = {wallet_data['userid'] for wallet_data in wallets}
+        for userid in userids - set(data_keys):
+            await key_manager.get_data_key(userid)
+        private_keys = [(wallet_data['userid'], wallet_data.pop('private_key')) for wallet_data in wallets if 'private_key' in wallet_data]
+        for wallet_data in wallets:
+            wallet_data['isDeleted'] = False
+            uow.insert_one(wallet_repository, wallet_data)
+        await asyncio.gather(*(
+            PrivateKeysModel.add_private_key(uow, userid, private_key, data_key=data_keys.get(userid))
+            for userid, private_key in private_keys
+        ))
+        if increment_count:
+            for userid, count in Counter(wallet_data['userid'] for wallet_data in wallets).items():
+                UserModel.add_wallet_count_increment(uow, userid, count)
+
+    @staticmethod
+    async def create_wallet(wallet_data: dict):
+        # The private key, the wallet and the counter increment are written in one commit
+        uow = UnitOfWork()
+        await WalletModel.add_wallet(uow, wallet_data)
+        await uow.commit()
+        return wallet_data
     
     @staticmethod
-    async def get_wallet_addresses_by_userid_nocount(userid: str, limit: int = 10, offset: int = 0):
-        total_count = await wallet_collection.count_documents({'userid': userid, 'isDeleted': False})
-        wallets = await wallet_collection.find({'userid': userid, 'isDeleted': False}).sort('updated_at', -1).skip(offset).limit(limit).to_list(length=None)
+    async def get_wallet_addresses_by_userid(userid: str, limit: int = 10, offset: int = 0, after: tuple = None):
+        query = {'userid': userid, 'isDeleted': False}
+        if after:
+            # Keyset pagination: continue strictly after the (updated_at, _id) of the previous page
+            updated_at, last_id = after
+            page_query = dict(query, **{'$or': [
+                {'updated_at': {'$lt': updated_at}},
+                {'updated_at': updated_at, '_id': {'$lt': last_id}}
+            ]})
+            wallets_page = wallet_repository.find(page_query, WALLET_LIST_PROJECTION, WALLET_LIST_SORT, limit=limit)
+        else:
+            wallets_page = wallet_repository.find(query, WALLET_LIST_PROJECTION, WALLET_LIST_SORT, offset, limit)
+        # The counter read and the page query run concurrently
+        total_count, wallets = await asyncio.gather(
+            WalletModel.get_wallet_count(userid),
+            wallets_page
+        )
         return wallets, total_count
     
-    async def get_wallet_addresses_by_userid(userid: str, limit: int = 10, offset: int = 0):
-        total_count = await wallet_collection.count_documents({'userid': userid, 'isDeleted': False})
-        wallets = await wallet_collection.find({'userid': userid, 'isDeleted': False}).sort('updated_at', -1).skip(offset).limit(limit).to_list(length=None)
-        return wallets, total_count
+    @staticmethod
+    def iterate_wallets_by_userid(userid: str, batch_size: int):
+        # Same order and covered projection as the wallet list, streamed from the cursor
+        return wallet_repository.iterate({'userid': userid, 'isDeleted': False}, WALLET_LIST_PROJECTION, WALLET_LIST_SORT, batch_size)
+
+    @staticmethod
+    async def get_wallet_count(userid: str):
+        wallet_count = await UserModel.get_wallet_count(userid)
+        if wallet_count is None:
+            # Users created before the counter existed are initialised on first read
+            wallet_count = await wallet_repository.count({'userid': userid, 'isDeleted': False})
+            await UserModel.set_wallet_count(userid, wallet_count)
+        return wallet_count
     
     @staticmethod
     async def get_wallet_by_address(wallet_address: str):
-        wallet = await wallet_collection.find_one({'wallet_address': wallet_address, 'isDeleted': False})
+        wallet = await wallet_repository.find_one({'wallet_address': wallet_address, 'isDeleted': False})
         return wallet
     
+    @staticmethod
+    async def get_wallets_by_address_list(wallet_addresses: list):
+        wallets = await wallet_repository.find({'wallet_address': {'$in': wallet_addresses}, 'isDeleted': False})
+        return wallets
+
+    @staticmethod
+    async def get_wallets_by_userids(userids: list):
+        wallets = await wallet_repository.find({'userid': {'$in': userids}, 'isDeleted': False})
+        return wallets
+
+    @staticmethod
+    async def get_wallet_with_owner(wallet_address: str):
+        # The wallet and the user owning it in one aggregation, (None, None) when the address is unknown
+        wallet = await wallet_repository.lookup_one(
+            {'wallet_address': wallet_address, 'isDeleted': False},
+            user_repository, 'userid', 'userid', 'owner', {'wallet_count': 0}
+        )
+        if wallet is None:
+            return None, None
+        owners = wallet.pop('owner')
+        return wallet, owners[0] if owners else None
+
     @staticmethod
     async def get_wallet_by_address_and_userid(wallet_address: str, userid: str):
-        wallet = await wallet_collection.find_one({'wallet_address': wallet_address, 'userid': userid, 'isDeleted': False})
+        wallet = await wallet_repository.find_one({'wallet_address': wallet_address, 'userid': userid, 'isDeleted': False})
         return wallet
     
     @staticmethod
     async def update_wallet(wallet_id: str, update_data: dict):
-        result = await wallet_collection.update_one(
+        modified = await wallet_repository.update_one(
             {'_id': ObjectId(wallet_id)},
             {'$set': update_data}
         )
-        return result
\ No newline at end of file
+        return modified
+    
+    @staticmethod
+    def add_wallet_update(uow: UnitOfWork, wallet_id, update_data: dict):
+        uow.update_one(wallet_repository, {'_id': ObjectId(wallet_id)}, {'$set': update_data})
+
+    @staticmethod
+    async def soft_delete_wallet(wallet_id, userid: str):
+        modified = await wallet_repository.soft_delete({'_id': ObjectId(wallet_id)})
+        if modified:
+            await UserModel.increment_wallet_count(userid, -1)
+        return modified
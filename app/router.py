@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 from app.controllers.users import users
 from app.controllers.wallet import wallet
+from app.controllers.metrics import metrics
+from app.controllers.admin import admin
 
 router = APIRouter()
 router.include_router(users.router)
-router.include_router(wallet.router)
\ No newline at end of file
+router.include_router(wallet.router)
+router.include_router(metrics.router)
+router.include_router(admin.router)
@@ -0,0 +1,30 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+class ProvisioningError(BaseModel):
+    line: int = Field(..., title='Line', description='The line number of the record in the NDJSON body, starting at 1')
+    detail: str = Field(..., title='Detail', description='Why the record was rejected')
+
+class ProvisioningResponse(BaseModel):
+    job_id: str = Field(..., title='Job ID', description='The checkpoint the run resumed from and advanced')
+    status: str = Field(..., title='Status', description='completed, or failed when a batch could not be written')
+    line: int = Field(..., title='Line', description='Number of lines committed, a new run with the same job_id resumes after it')
+    created: int = Field(..., title='Created', description='Users created by the job')
+    existing: int = Field(..., title='Existing', description='Records whose user, social ID or imported wallet already existed')
+    duplicate: int = Field(..., title='Duplicate', description='Records repeating a social ID or wallet of an earlier record in the same batch')
+    invalid: int = Field(..., title='Invalid', description='Records that could not be parsed, validated or decrypted')
+    errors: List[ProvisioningError] = Field(..., title='Errors', description='The first rejected records of this run')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'job_id': 'partner-2024-06',
+                'status': 'completed',
+                'line': 120000,
+                'created': 119950,
+                'existing': 40,
+                'duplicate': 2,
+                'invalid': 8,
+                'errors': [{'line': 17, 'detail': 'seed_phrase is required when signup_method is seed_import'}]
+            }
+        }
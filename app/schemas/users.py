@@ -189,4 +189,13 @@ class UserDetailsResponse(BaseModel):
     signup_method: SignUpMethod = Field(None, title='Signup Method', description='The method used for signing up')
     user_type: UserType = Field(None, title='User Type', description='The type of user')
     created_at: datetime = Field(None, title='Created At', description='The date and time the user was created')
-    updated_at: datetime = Field(None, title='Updated At', description='The date and time the user was last updated')
\ No newline at end of file
+    updated_at: datetime = Field(None, title='Updated At', description='The date and time the user was last updated')
+class LogoutResponse(BaseModel):
+    message: str = Field(..., title='Message', description='Response message')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'message': 'Logged out successfully'
+            }
+        }
@@ -26,11 +26,13 @@ class WalletListResponse(BaseModel):
 class WalletList(BaseModel):
     total_count: int = Field(..., title='Total Count', description='The total number of wallets associated with the user')
     wallets: List[WalletListResponse] = Field(..., title='Wallets', description='List of wallets associated with the user')
+    next_cursor: str = Field(None, title='Next Cursor', description='Cursor for the next page, absent on the last page')
 
     class Config:
         schema_extra = {
             'example': {
                 'total_count': 100,
+                'next_cursor': 'WyIyMDIzLTEwLTAyVDEyOjAwOjAwIiwiNjUxYTJiM2M0ZDVlNmY3YThiOWMwZDFlIl0',
                 'wallets': [
                     {
                         'wallet_name': 'My Wallet',
@@ -74,6 +76,36 @@ class WalletImportPrivateKeyRequest(BaseModel):
 
 WalletImportRequest = Union[WalletImportSeedPhraseRequest, WalletImportPrivateKeyRequest]
 
+class WalletImportBatchRequest(BaseModel):
+    wallets: List[WalletImportRequest] = Field(..., min_items=1, max_items=100, title='Wallets', description='The seed phrases and private keys to import')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'wallets': [
+                    {'seed_phrase': 'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about'},
+                    {'private_key': '0x1234567890abcdef1234567890abcdef1234567890abcdef1234567890abcdef1', 'network': 'supra'}
+                ]
+            }
+        }
+
+class WalletImportStatus(Enum):
+    IMPORTED = 'imported'
+    EXISTING = 'existing'
+    DUPLICATE = 'duplicate'
+    CONFLICT = 'conflict'
+    INVALID = 'invalid'
+
+class WalletImportResult(BaseModel):
+    index: int = Field(..., title='Index', description='Position of the item in the request')
+    status: WalletImportStatus = Field(..., title='Status', description='imported, existing (already owned, its updated_at is refreshed), duplicate (same address earlier in the request), conflict (owned by another account) or invalid')
+    wallet: WalletListResponse = Field(None, title='Wallet', description='The wallet, absent when the item is a conflict or invalid')
+    detail: str = Field(None, title='Detail', description='Why the item could not be imported')
+
+class WalletImportBatchResponse(BaseModel):
+    message: str = Field(..., title='Message', description='Response message')
+    results: List[WalletImportResult] = Field(..., title='Results', description='One result per item, in request order')
+
 class WalletCreateRequest(BaseModel):
     wallet_name: str = Field(None, title='Wallet Name', description='The name of the wallet')
     
@@ -100,4 +132,18 @@ class WalletCreateResponse(BaseModel):
                     'updated_at': '2023-10-01T12:00:00Z'
                 }
             }
-        }
\ No newline at end of file
+        }
+
+class WalletAccountsRequest(BaseModel):
+    count: int = Field(..., ge=1, le=20, title='Count', description='The number of accounts to derive from the wallet seed, starting at account index 0')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'count': 5
+            }
+        }
+
+class WalletAccountsResponse(BaseModel):
+    message: str = Field(..., title='Message', description='Response message')
+    wallets: List[WalletListResponse] = Field(..., title='Wallets', description='The wallets derived from the seed, ordered by account index')
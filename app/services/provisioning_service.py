@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from dotenv import load_dotenv
+from fastapi import HTTPException # type: ignore
+from app.common.serializers import loads
+from app.core.crypto_executor import crypto_executor
+from app.core.generate_seed_wallet_address import INVALID_SECRET_ERRORS
+from app.core.key_management import key_manager, unwrap_data_key
+from app.models.data_keys import DataKeyModel
+from app.models.private_keys import PrivateKeysModel
+from app.models.provisioning_jobs import ProvisioningJobModel
+from app.models.unit_of_work import UnitOfWork
+from app.models.users import UserModel
+from app.models.wallet import WalletModel
+from app.services.user_service import COMMON_PARAMS
+from app.schemas.users import PrivateKeyImportSignUpRequest, SeedImportSignUpRequest, SignUpMethod, SocialSignUpRequest, UserType, WalletSignUpRequest
+
+load_dotenv()
+
+PROVISION_BATCH_SIZE = int(os.getenv('PROVISION_BATCH_SIZE', '500'))
+PROVISION_MAX_ERRORS = 100
+
+# userids are derived from the job and the line number, so a batch replayed after a
+# failed commit finds the users it already wrote instead of creating them again
+PROVISION_NAMESPACE = uuid.UUID('a3d1d01f-9841-4edc-ba91-6d2830a0d8ac')
+
+SIGNUP_REQUESTS = {
+    SignUpMethod.social.value: SocialSignUpRequest,
+    SignUpMethod.wallet.value: WalletSignUpRequest,
+    SignUpMethod.seed_import.value: SeedImportSignUpRequest,
+    SignUpMethod.private_key_import.value: PrivateKeyImportSignUpRequest,
+}
+
+# Job ids being provisioned by this process
+running_jobs = set()
+
+async def iter_lines(chunks):
+    # Splits a byte stream into lines, holding at most one partial line
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+def parse_record(line: bytes):
+    # Returns the validated sign-up request and the user fields taken from the record, like sign_up_user
+    record = loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('A record must be a JSON object')
+    request_model = SIGNUP_REQUESTS.get(record.get('signup_method'))
+    if request_model is None:
+        raise ValueError('Invalid sign-up method')
+    record = {k: v.strip() if isinstance(v, str) else v for k, v in record.items()}
+    return request_model.parse_obj(record), {param: record[param] for param in COMMON_PARAMS if param in record}
+
+async def derive_wallet(record):
+    # Returns (wallet_address, seed_phrase, private_key), or None when the import cannot be decrypted
+    try:
+        if record.signup_method == SignUpMethod.seed_import:
+            wallet_address, private_key = await crypto_executor.get_wallet_address_from_seed_phrase(record.seed_phrase)
+            return wallet_address, record.seed_phrase, private_key
+        if record.signup_method == SignUpMethod.private_key_import:
+            wallet_address, private_key = await crypto_executor.get_wallet_address_from_private_key(record.private_key)
+            return wallet_address, '', private_key
+    except INVALID_SECRET_ERRORS:
+        return None
+    # Generated directly, the wallet pool is kept for interactive sign-ups
+    return await crypto_executor.generate_seed_wallet_address()
+
+def wallet_name(record) -> str:
+    if record.signup_method == SignUpMethod.social:
+        return f'{record.social_platform.value} Wallet'
+    if record.signup_method == SignUpMethod.wallet:
+        return record.wallet_name or ''
+    return 'Imported Wallet'
+
+async def provision_users(chunks, job_id: str, batch_size: int = PROVISION_BATCH_SIZE) -> dict:
+    # Reads NDJSON sign-up records from an async byte stream and commits them batch by batch.
+    # The next batch is only read once the previous one is written, which bounds memory and
+    # holds back the sender. Lines up to the job's checkpoint are skipped.
+    if job_id in running_jobs:
+        raise HTTPException(status_code=409, detail='The provisioning job is already running')
+    running_jobs.add(job_id)
+    try:
+        job = await ProvisioningJobModel.get_or_create_job(job_id)
+        logging.info('Provisioning started.', extra={'log_data': {'job_id': job_id, 'line': job['line']}})
+        errors = []
+        status = 'completed'
+        batch = []
+        line_number = 0
+        try:
+            async for line in iter_lines(chunks):
+                line_number += 1
+                if line_number <= job['line']:
+                    continue
+                batch.append((line_number, line))
+                if len(batch) >= batch_size:
+                    await provision_batch(job, batch, errors)
+                    batch = []
+            if batch:
+                await provision_batch(job, batch, errors)
+        except Exception as e:
+            logging.error('Provisioning batch failed.', extra={'log_data': {'job_id': job_id, 'line': job['line'], 'error': str(e)}})
+            status = 'failed'
+
+        await ProvisioningJobModel.update_status(job_id, status)
+        logging.info('Provisioning finished.', extra={'log_data': {'job_id': job_id, 'status': status, 'line': job['line']}})
+        return {
+            'job_id': job_id,
+            'status': status,
+            'line': job['line'],
+            'created': job['created'],
+            'existing': job['existing'],
+            'duplicate': job['duplicate'],
+            'invalid': job['invalid'],
+            'errors': errors
+        }
+    finally:
+        running_jobs.discard(job_id)
+
+async def provision_batch(job: dict, batch: list, errors: list):
+    counts = {'created': 0, 'existing': 0, 'duplicate': 0, 'invalid': 0}
+
+    def reject(line_number: int, detail: str):
+        counts['invalid'] += 1
+        if len(errors) < PROVISION_MAX_ERRORS:
+            errors.append({'line': line_number, 'detail': detail})
+
+    records = []
+    for line_number, line in batch:
+        if not line.strip():
+            continue
+        try:
+            record, user_data = parse_record(line)
+        except ValueError as e:
+            reject(line_number, str(e))
+            continue
+        userid = str(uuid.uuid5(PROVISION_NAMESPACE, f"{job['_id']}:{line_number}"))
+        records.append((line_number, userid, record, user_data))
+
+    # One $in query per lookup for the whole batch
+    social_ids = [record.social_id for _, _, record, _ in records if record.signup_method == SignUpMethod.social]
+    existing_userids = await UserModel.get_existing_userids([userid for _, userid, _, _ in records])
+    existing_social_ids = await UserModel.get_existing_social_ids(social_ids) if social_ids else set()
+    pending, seen_social_ids = [], set()
+    for line_number, userid, record, user_data in records:
+        if userid in existing_userids or (record.signup_method == SignUpMethod.social and record.social_id in existing_social_ids):
+            counts['existing'] += 1
+        elif record.signup_method == SignUpMethod.social and record.social_id in seen_social_ids:
+            counts['duplicate'] += 1
+        else:
+            if record.signup_method == SignUpMethod.social:
+                seen_social_ids.add(record.social_id)
+            pending.append((line_number, userid, record, user_data))
+
+    # Wallets and data keys left behind by an earlier, partially written attempt of this batch are reused
+    pending_userids = [userid for _, userid, _, _ in pending]
+    derivations, stored_wallets, stored_data_keys, keyed_userids = await asyncio.gather(
+        asyncio.gather(*(derive_wallet(record) for _, _, record, _ in pending)),
+        WalletModel.get_wallets_by_userids(pending_userids),
+        DataKeyModel.get_by_userids(pending_userids),
+        PrivateKeysModel.get_userids_with_keys(pending_userids)
+    )
+    stored_wallets = {wallet['userid']: wallet for wallet in stored_wallets}
+    data_keys = {record['userid']: unwrap_data_key(record['wrapped_key']) for record in stored_data_keys}
+
+    # Private keys are written after the wallets, an attempt that stopped in between left wallets
+    # without one. Generated and seed wallets derive it again from their stored seed phrase
+    keyless_wallets = [wallet for userid, wallet in stored_wallets.items() if userid not in keyed_userids and wallet.get('seed_phrase')]
+    stored_derivations = dict(zip(
+        [wallet['userid'] for wallet in keyless_wallets],
+        await asyncio.gather(*(crypto_executor.get_wallet_address_from_seed_phrase(wallet['seed_phrase']) for wallet in keyless_wallets))
+    ))
+
+    addresses = [derivation[0] for derivation in derivations if derivation is not None]
+    existing_wallets = {
+        wallet['wallet_address']: wallet['userid']
+        for wallet in await WalletModel.get_wallets_by_address_list(addresses)
+    } if addresses else {}
+
+    uow = UnitOfWork()
+    users, wallets, restored_keys, seen_addresses = [], [], [], set()
+    now = datetime.utcnow()
+    for (line_number, userid, record, user_data), derivation in zip(pending, derivations):
+        if derivation is None:
+            reject(line_number, 'The seed phrase or private key could not be decrypted')
+            continue
+        wallet_address, seed_phrase, private_key = derivation
+        owner = existing_wallets.get(wallet_address)
+        if owner is not None and owner != userid:
+            counts['existing'] += 1
+            continue
+        if wallet_address in seen_addresses:
+            counts['duplicate'] += 1
+            continue
+        seen_addresses.add(wallet_address)
+
+        user_data.update({
+            'userid': userid,
+            'signup_method': record.signup_method.value,
+            'user_type': UserType.user.value,
+            'wallet_count': 1,
+        })
+        if record.signup_method == SignUpMethod.social:
+            user_data.update({'social_platform': record.social_platform.value, 'social_id': record.social_id})
+        users.append(user_data)
+
+        if userid not in data_keys:
+            data_keys[userid] = key_manager.add_data_key(uow, userid, cache=False)
+        if userid in stored_wallets and userid not in keyed_userids:
+            # Private key imports derive the same wallet from the record
+            restored_keys.append((userid, stored_derivations.get(userid, (None, private_key))[1]))
+        if userid not in stored_wallets:
+            wallets.append({
+                'wallet_name': wallet_name(record),
+                'wallet_address': wallet_address,
+                'private_key': private_key,
+                'seed_phrase': seed_phrase,
+                'userid': userid,
+                'created_at': now,
+                'updated_at': now
+            })
+        counts['created'] += 1
+
+    # Grouped per collection: data keys, wallets, private keys, users, then the checkpoint
+    await WalletModel.add_wallets(uow, wallets, data_keys, increment_count=False)
+    await asyncio.gather(*(
+        PrivateKeysModel.add_private_key(uow, userid, private_key, data_key=data_keys[userid])
+        for userid, private_key in restored_keys
+    ))
+    for user_data in users:
+        UserModel.add_user(uow, user_data, cache=False)
+    ProvisioningJobModel.add_progress(uow, job['_id'], batch[-1][0], counts)
+    await uow.commit()
+
+    job['line'] = batch[-1][0]
+    for name, count in counts.items():
+        job[name] += count
+    logging.info('Provisioning batch committed.', extra={'log_data': dict(counts, job_id=job['_id'], line=job['line'])})
@@ -1,16 +1,28 @@
 from fastapi import HTTPException, Request # type: ignore
 from datetime import datetime
 import logging
-from app.core.generate_seed_wallet_address import generate_seed_wallet_address, get_wallet_address_from_seed_phrase, get_wallet_address_from_private_key
+from app.core.crypto_executor import crypto_executor
+from app.core.key_management import key_manager
 from app.schemas.users import SignUpMethod, SignUpRequest, UserType
 from app.models.users import UserModel
+from app.models.unit_of_work import UnitOfWork
 from app.models.wallet import WalletModel
 from app.core.jwt_handler import generate_jwt_token
+from configs.logging_fitlers import LazyLogData
 import uuid
 from app.services.wallet_service import generate_new_wallet
 
 logger = logging.getLogger(__name__)
 
+# Profile fields taken from any sign-up request
+COMMON_PARAMS = ('email_address', 'first_name', 'last_name', 'phone_login_enabled', 'phone_unique_id')
+
+# User fields that may be logged, profile fields and social ids are personal data
+USER_LOG_FIELDS = ('userid', 'user_type', 'signup_method', 'social_platform')
+
+def user_log_data(user: dict) -> dict:
+    return {field: user[field] for field in USER_LOG_FIELDS if field in user}
+
 async def sign_up_user(user: Request):
     try:
         logging.info('Received user sign-up request.')
@@ -18,6 +30,7 @@ async def sign_up_user(user: Request):
         
         # Sanitize the request data
         user_dict = {k: v.strip() if isinstance(v, str) else v for k, v in request_data.items()}
+        profile = {param: request_data[param] for param in COMMON_PARAMS if param in request_data}
         is_new_user = True
         wallet_list = None
         wallet_data = {}
@@ -33,53 +46,52 @@ async def sign_up_user(user: Request):
 
         elif user_dict['signup_method'] == SignUpMethod.seed_import:
             logging.info('Processing seed import sign-up')
-            user_data, wallet_data, is_new_user = await signup_by_seed(user_dict['seed_phrase'])
+            user_data, wallet_data, is_new_user = await signup_by_seed(user_dict['seed_phrase'], profile)
 
         elif user_dict['signup_method'] == SignUpMethod.private_key_import:
             logging.info('Processing private key import sign-up')
-            user_data, wallet_data, is_new_user = await signup_by_private_key(user_dict['private_key'])
+            user_data, wallet_data, is_new_user = await signup_by_private_key(user_dict['private_key'], profile)
             
         else:
             raise HTTPException(status_code=400, detail='Invalid sign-up method')
         
         # Add common parameters if available in request_data
-        common_params = ['email_address', 'first_name', 'last_name', 'phone_login_enabled', 'phone_unique_id']
-        for param in common_params:
-            if param in request_data:
-                user_data[param] = request_data[param]
+        user_data.update(profile)
 
+        # The user, data key, wallet and private key writes are committed together
+        uow = UnitOfWork()
+        data_key = None
         if is_new_user:
             user_data.update({
                 'userid': str(uuid.uuid4()),  # Use UUID version 4
                 'user_type': UserType.user.value,  # Ensure user_type is a string
+                'wallet_count': 0,
             })
-            logging.info('Prepared user details for sign up.', extra={'log_data':  str(user_data)})
+            logging.info('Prepared user details for sign up.', extra={'log_data': LazyLogData(user_log_data, user_data)})
 
             # Insert user information into user collection
-            userResult = await UserModel.create_user(user_data)
-            logging.info('User creation result:', extra={'log_data': str(userResult)})
-
-            if not userResult.inserted_id:
-                raise HTTPException(status_code=500, detail='User could not be created')
-        if not is_new_user:
-            logging.info('User already exists, updating user details.', extra={'log_data': str(user_data)})
-            await update_user_by_id(user_data['userid'], user_data)
+            UserModel.add_user(uow, user_data)
+            # The data key is not committed yet, it is passed on to encrypt the private key
+            data_key = key_manager.add_data_key(uow, user_data['userid'])
+        if not is_new_user and user_dict['signup_method'] == SignUpMethod.social:
+            # Returning import sign-ups are updated by resolve_import_signup. Only the fields sent
+            # by the client are set, the stored document holds server owned fields like wallet_count
+            logging.info('User already exists, updating user details.', extra={'log_data': LazyLogData(user_log_data, user_data)})
+            UserModel.add_user_update(uow, user_data['userid'], dict(profile))
     
         # Check if wallet data exists and add userid
         if wallet_data and 'userid' not in wallet_data:
             wallet_data['userid'] = user_data['userid']
             
             # add wallet in db
-            result = await WalletModel.create_wallet(wallet_data)
-            logging.info('Wallet creation result.', extra={'log_data':  str(result)})
-        
-            if not result.inserted_id:
-                raise HTTPException(status_code=500, detail='Wallet could not be created')
-            
+            await WalletModel.add_wallet(uow, wallet_data, data_key=data_key)
             wallet_list = [wallet_data]
         
         elif wallet_data: 
             wallet_list = [wallet_data]
+
+        await uow.commit()
+        logging.info('User sign-up committed.', extra={'log_data': {'userid': user_data['userid'], 'is_new_user': is_new_user}})
         
         access_token = generate_jwt_token(user_data['userid'], user_data['user_type'])
         return {
@@ -97,9 +109,9 @@ async def signup_by_social(social_platform, social_id):
 
     # Check if social ID already exists
     existing_user = await UserModel.get_user_by_social_id(social_id)
-    logging.info('Existing user found.', extra={'log_data': str(existing_user)})
+    logging.info('Existing user found.', extra={'log_data': LazyLogData(user_log_data, existing_user or {})})
     if existing_user:
-        logging.info('User with social ID already exists, assigning existing user details.', extra={'log_data': {'social_id': social_id}})
+        logging.info('User with social ID already exists, assigning existing user details.', extra={'log_data': {'userid': existing_user['userid']}})
         wallets, total_counts = await WalletModel.get_wallet_addresses_by_userid(existing_user['userid'])
         return existing_user, {}, False, wallets
     else:
@@ -110,23 +122,29 @@ async def signup_by_social(social_platform, social_id):
             'social_id': social_id,
         }, wallet_data, True, []
 
-async def signup_by_seed(seed_phrase):
+async def resolve_import_signup(wallet_address: str, profile: dict):
+    # Returns (existing_user, existing_wallet). The wallet and its owner come from one $lookup
+    # aggregation and the owner's profile is updated with one find_one_and_update
+    existing_wallet, existing_user = await WalletModel.get_wallet_with_owner(wallet_address)
+    if not existing_wallet:
+        return None, None
+
+    logging.info('Wallet with address already exists.', extra={'log_data': {'wallet_address': wallet_address}})
+    if existing_user:
+        logging.info('User with userid already exists, assigning existing user details.', extra={'log_data': {'userid': existing_wallet['userid']}})
+        existing_user = await UserModel.update_user(existing_user['userid'], dict(profile)) or existing_user
+    logging.info('Existing user found.', extra={'log_data': LazyLogData(user_log_data, existing_user or {})})
+    return existing_user, existing_wallet
+
+async def signup_by_seed(seed_phrase, profile: dict):
     if not seed_phrase:
         raise HTTPException(status_code=400, detail='Seed phrase is required for seed import sign-up')
     
-    wallet_address, private_key = get_wallet_address_from_seed_phrase(seed_phrase)
+    wallet_address, private_key = await crypto_executor.get_wallet_address_from_seed_phrase(seed_phrase)
     logging.info('Wallet address imported:', extra={'log_data': {'wallet_address': wallet_address}})
-    existing_wallet = await WalletModel.get_wallet_by_address(wallet_address)
+    existing_user, existing_wallet = await resolve_import_signup(wallet_address, profile)
     if existing_wallet:
-        logging.info('Wallet with address already exists.', extra={'log_data': {'wallet_address': wallet_address}})
-        existing_user = await UserModel.get_user_by_userid(existing_wallet['userid'])
-        logging.info('Existing user found: %s', existing_user)
-
-        if existing_user:
-            logging.info('User with userid already exists, assigning existing user details.', extra={'log_data': {'userid': existing_wallet['userid']}})
-            return existing_user, existing_wallet, False
-        else:
-            return existing_user, existing_wallet, False
+        return existing_user, existing_wallet, False
     else:
         wallet_data = {
             'wallet_name': 'Imported Wallet',
@@ -140,23 +158,15 @@ async def signup_by_seed(seed_phrase):
             'signup_method': SignUpMethod.seed_import
         }, wallet_data, True
 
-async def signup_by_private_key(private_key):
+async def signup_by_private_key(private_key, profile: dict):
     if not private_key:
         raise HTTPException(status_code=400, detail='Private key is required for private key import sign-up')
 
-    wallet_address, private_key = get_wallet_address_from_private_key(private_key)
+    wallet_address, private_key = await crypto_executor.get_wallet_address_from_private_key(private_key)
     logging.info('Wallet address imported:', extra={'log_data': {'wallet_address': wallet_address}})
-    existing_wallet = await WalletModel.get_wallet_by_address(wallet_address)
+    existing_user, existing_wallet = await resolve_import_signup(wallet_address, profile)
     if existing_wallet:
-        logging.info('Wallet with address already exists.', extra={'log_data': {'wallet_address': wallet_address}})
-        existing_user = await UserModel.get_user_by_userid(existing_wallet['userid'])
-        logging.info('Existing user found.',   extra={'log_data':str(existing_user)})
-
-        if existing_user:
-            logging.info('User with userid already exists, assigning existing user details.', extra={'log_data': {'userid': existing_wallet['userid']}})
-            return existing_user, existing_wallet, False
-        else:
-            return existing_user, existing_wallet, False
+        return existing_user, existing_wallet, False
     else:
         wallet_data = {
             'wallet_name': 'Imported Wallet',
@@ -172,10 +182,10 @@ async def signup_by_private_key(private_key):
 
 async def update_user_by_id(userid: str, update_data: dict):
     try:
-        result = await UserModel.update_user(userid, update_data)
-        if result.modified_count == 0:
-            raise HTTPException(status_code=404, detail='User not found or no changes made')
-        return result
+        user = await UserModel.update_user(userid, update_data)
+        if not user:
+            raise HTTPException(status_code=404, detail='User not found')
+        return user
     except Exception as e:
         logging.error('Error updating user by id', extra={'log_data': e})
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,29 +1,85 @@
+import asyncio
+import os
 from datetime import datetime
-from app.core.generate_seed_wallet_address import generate_seed_wallet_address, get_wallet_address_from_seed_phrase, get_wallet_address_from_private_key
+from fastapi import HTTPException # type: ignore
+from pymongo.errors import DuplicateKeyError # type: ignore
+from app.core.crypto_executor import crypto_executor
+from app.core.generate_seed_wallet_address import INVALID_SECRET_ERRORS
 from app.core.jwt_handler import generate_jwt_token
+from app.common.pagination import encode_cursor
+from app.common.serializers import serialize_wallet_page, wallets_csv, wallets_ndjson
+from app.core.wallet_list_cache import wallet_list_cache
+from app.core.wallet_pool import wallet_pool
+from app.models.private_keys import PrivateKeysModel
+from app.models.unit_of_work import UnitOfWork
+from app.models.users import UserModel
 from app.models.wallet import WalletModel
+from app.schemas.wallet import WalletImportSeedPhraseRequest, WalletImportStatus
+from dotenv import load_dotenv
 from eth_account import Account # type: ignore
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_wallet_addresses_by_userid(userid: str, limit: int = 10, offset: int = 0):
+load_dotenv()
+
+# Largest page of GET /wallet, GET /wallet/export returns every wallet
+WALLET_LIST_MAX_LIMIT = int(os.getenv('WALLET_LIST_MAX_LIMIT', '100'))
+WALLET_EXPORT_BATCH_SIZE = int(os.getenv('WALLET_EXPORT_BATCH_SIZE', '500'))
+
+async def export_wallets(userid: str, export_format: str):
+    # Streams the user's wallets as NDJSON or CSV. Documents are read from the cursor one
+    # batch at a time and sent as one chunk per batch, so memory does not grow with the count
+    batch, exported = [], 0
     try:
-        wallets, total_count = await WalletModel.get_wallet_addresses_by_userid(userid, limit, offset)
-        return wallets, total_count
+        async for wallet in WalletModel.iterate_wallets_by_userid(userid, WALLET_EXPORT_BATCH_SIZE):
+            batch.append(wallet)
+            if len(batch) >= WALLET_EXPORT_BATCH_SIZE:
+                yield encode_wallets(batch, export_format, exported == 0)
+                exported += len(batch)
+                batch = []
+        if batch or exported == 0:
+            yield encode_wallets(batch, export_format, exported == 0)
+            exported += len(batch)
     except Exception as e:
-        logging.error('An error occurred', extra={'log_data': e})
-        return None
+        # The status line has been sent, the client sees a truncated body
+        logging.error('Wallet export failed.', extra={'log_data': {'userid': userid, 'exported': exported, 'error': str(e)}})
+        raise
+    logging.info('Wallets exported.', extra={'log_data': {'userid': userid, 'format': export_format, 'exported': exported}})
+
+def encode_wallets(wallets: list, export_format: str, first: bool) -> bytes:
+    if export_format == 'csv':
+        return wallets_csv(wallets, header=first)
+    return wallets_ndjson(wallets)
+
+async def get_wallet_page(userid: str, limit: int = 10, offset: int = 0, after: tuple = None):
+    # Serialized pages are cached per user, identical concurrent requests share one fetch
+    return await wallet_list_cache.get_or_fetch(
+        userid,
+        (limit, offset, after),
+        lambda: fetch_wallet_page(userid, limit, offset, after)
+    )
+
+async def fetch_wallet_page(userid: str, limit: int, offset: int, after: tuple):
+    wallets, total_count = await WalletModel.get_wallet_addresses_by_userid(userid, limit, offset, after)
+    logging.info('Fetched wallets for user', extra={'log_data': {'userid': userid}})
+
+    next_cursor = None
+    if len(wallets) == limit:
+        next_cursor = encode_cursor(wallets[-1]['updated_at'], wallets[-1]['_id'])
+
+    # Transform the wallets into the response format
+    return serialize_wallet_page(wallets, total_count, next_cursor)
 
 async def create_wallet(userid: str, wallet: str):
     try:
         wallet_dict = wallet.dict()
         
         # create a wallet address and seed phrase
-        wallet_address, seed_phrase, private_key = generate_seed_wallet_address()
-        wallet_data = generate_new_wallet(wallet_dict['wallet_name'])
+        wallet_data = await generate_new_wallet(wallet_dict['wallet_name'])
         wallet_data['userid'] = userid
         await WalletModel.create_wallet(wallet_data)
+        wallet_list_cache.invalidate(userid)
         return wallet_data
     except Exception as e:
         logging.error('An error occurred while creating the wallet', extra={'log_data': e})
@@ -34,17 +90,21 @@ async def import_wallet(userid: str, import_data: str):
     wallet_name = import_data.get('wallet_name', 'Imported Wallet')
     private_key = None
     if 'seed_phrase' in import_data and import_data['seed_phrase']:
-        wallet_address, private_key = get_wallet_address_from_seed_phrase(import_data['seed_phrase'])
+        wallet_address, private_key = await crypto_executor.get_wallet_address_from_seed_phrase(import_data['seed_phrase'])
     elif 'private_key' in import_data and import_data['private_key']:
-        wallet_address, private_key = get_wallet_address_from_private_key(import_data['private_key'])
+        wallet_address, private_key = await crypto_executor.get_wallet_address_from_private_key(import_data['private_key'])
     else:
         raise HTTPException(status_code=400, detail='Either seed phrase or private key must be provided')
 
-    existing_wallet = await WalletModel.get_wallet_by_address_and_userid(wallet_address, userid)
+    # Live wallet addresses are unique across users (wallet_address_unique)
+    existing_wallet = await WalletModel.get_wallet_by_address(wallet_address)
+    if existing_wallet and existing_wallet['userid'] != userid:
+        raise HTTPException(status_code=409, detail='The wallet is owned by another account')
     if existing_wallet:
         logger.info('Wallet address already exists for the user')
         existing_wallet['updated_at'] = datetime.utcnow()
         await WalletModel.update_wallet(existing_wallet['_id'], existing_wallet)
+        wallet_list_cache.invalidate(userid)
         logger.info('Existing wallet updated successfully')
         return existing_wallet
     else: 
@@ -59,14 +119,142 @@ async def import_wallet(userid: str, import_data: str):
         }
 
         # Save the wallet data
-        result = await WalletModel.create_wallet(wallet_data)
+        try:
+            await WalletModel.create_wallet(wallet_data)
+        except DuplicateKeyError:
+            # Imported concurrently, the private key is not written when the wallet is rejected
+            raise HTTPException(status_code=409, detail='The wallet is owned by another account')
+        wallet_list_cache.invalidate(userid)
         logger.info('Wallet imported successfully', extra={'wallet_address': wallet_address})
 
         return wallet_data
 
+async def import_wallets(userid: str, items: list):
+    # Derives every item in parallel on the crypto executor, then deduplicates against all live
+    # wallets with one query and writes all new wallets in one unit of work
+    # Items that cannot be decrypted are None, executor failures fail the whole request
+    derivations = await asyncio.gather(*(derive_import_item(item) for item in items))
+
+    # Live wallet addresses are unique across users (wallet_address_unique)
+    addresses = {derivation[0] for derivation in derivations if derivation is not None}
+    existing_wallets = {
+        wallet['wallet_address']: wallet
+        for wallet in await WalletModel.get_wallets_by_address_list(list(addresses))
+    } if addresses else {}
+
+    now = datetime.utcnow()
+    uow = UnitOfWork()
+    results, new_wallets, handled = [], [], {}
+    for index, (item, derivation) in enumerate(zip(items, derivations)):
+        if derivation is None:
+            results.append({'index': index, 'status': WalletImportStatus.INVALID.value, 'detail': 'The seed phrase or private key could not be decrypted'})
+            continue
+        wallet_address, private_key = derivation
+        if wallet_address in handled:
+            results.append({'index': index, 'status': WalletImportStatus.DUPLICATE.value, 'wallet': handled[wallet_address]})
+            continue
+
+        wallet = existing_wallets.get(wallet_address)
+        if wallet and wallet['userid'] != userid:
+            results.append({'index': index, 'status': WalletImportStatus.CONFLICT.value, 'detail': 'The wallet is owned by another account'})
+            continue
+        if wallet:
+            wallet['updated_at'] = now
+            WalletModel.add_wallet_update(uow, wallet['_id'], {'updated_at': now})
+            status = WalletImportStatus.EXISTING
+        else:
+            wallet = {
+                'wallet_name': 'Imported Wallet',
+                'userid': userid,
+                'wallet_address': wallet_address,
+                'seed_phrase': getattr(item, 'seed_phrase', None),
+                'private_key': private_key,
+                'created_at': now,
+                'updated_at': now
+            }
+            new_wallets.append(wallet)
+            status = WalletImportStatus.IMPORTED
+        handled[wallet_address] = wallet
+        results.append({'index': index, 'status': status.value, 'wallet': wallet})
+
+    private_keys = [wallet['private_key'] for wallet in new_wallets]
+    if new_wallets:
+        await WalletModel.add_wallets(uow, new_wallets)
+    try:
+        await uow.commit()
+    except DuplicateKeyError:
+        # Another request imported one of the addresses after the check. The commit stopped at that
+        # wallet, the remaining ones are written one at a time so the other items still succeed
+        logger.warning('Wallet import batch conflicted, importing wallets one at a time', extra={'log_data': {'userid': userid}})
+        updated_wallets = [result['wallet'] for result in results if result['status'] == WalletImportStatus.EXISTING.value]
+        conflicts = await import_wallets_one_by_one(userid, new_wallets, private_keys, updated_wallets)
+        for result in results:
+            if result.get('wallet') is not None and result['wallet']['wallet_address'] in conflicts:
+                conflict = conflicts[result['wallet']['wallet_address']]
+                if conflict is None:
+                    result.update({'status': WalletImportStatus.CONFLICT.value, 'detail': 'The wallet is owned by another account'})
+                    del result['wallet']
+                else:
+                    result.update({'status': WalletImportStatus.EXISTING.value, 'wallet': conflict})
+    wallet_list_cache.invalidate(userid)
+
+    logger.info('Wallets imported', extra={'log_data': {
+        'userid': userid,
+        'items': len(items),
+        'imported': sum(result['status'] == WalletImportStatus.IMPORTED.value for result in results),
+        'conflicts': sum(result['status'] == WalletImportStatus.CONFLICT.value for result in results),
+        'invalid': sum(derivation is None for derivation in derivations)
+    }})
+    return results
+
+async def derive_import_item(item):
+    try:
+        if isinstance(item, WalletImportSeedPhraseRequest):
+            return await crypto_executor.get_wallet_address_from_seed_phrase(item.seed_phrase)
+        return await crypto_executor.get_wallet_address_from_private_key(item.private_key)
+    except INVALID_SECRET_ERRORS:
+        return None
+
+async def import_wallets_one_by_one(userid: str, wallets: list, private_keys: list, existing_wallets: list):
+    # Writes each wallet of a conflicted batch in its own unit of work. Returns the addresses that
+    # could not be written, mapped to the user's own wallet or None when another account owns it
+    rejected = []
+    for wallet, private_key in zip(wallets, private_keys):
+        uow = UnitOfWork()
+        await WalletModel.add_wallet(uow, dict(wallet, private_key=private_key))
+        try:
+            await uow.commit()
+        except DuplicateKeyError:
+            rejected.append((wallet, private_key))
+
+    stored_wallets = {
+        stored['wallet_address']: stored
+        for stored in await WalletModel.get_wallets_by_address_list([wallet['wallet_address'] for wallet, _ in rejected])
+    } if rejected else {}
+    # A transaction commit rolled back the updated_at refresh of the existing wallets as well
+    uow, conflicts = UnitOfWork(), {}
+    for wallet in existing_wallets:
+        WalletModel.add_wallet_update(uow, wallet['_id'], {'updated_at': wallet['updated_at']})
+    for wallet, private_key in rejected:
+        stored = stored_wallets.get(wallet['wallet_address'])
+        if stored is not None and stored['_id'] == wallet.get('_id'):
+            # Written by the conflicted batch commit, which stopped before its private key and counter
+            await PrivateKeysModel.add_private_key(uow, userid, private_key)
+            UserModel.add_wallet_count_increment(uow, userid)
+        elif stored is not None and stored['userid'] == userid:
+            conflicts[wallet['wallet_address']] = stored
+        else:
+            conflicts[wallet['wallet_address']] = None
+    await uow.commit()
+    return conflicts
+
 async def generate_new_wallet(wallet_name: str):
-    # Generate wallet address and seed phrase
-    wallet_address, seed_phrase, private_key = generate_seed_wallet_address()
+    # Take a pre-generated wallet from the pool, generate inline when it is empty
+    wallet = wallet_pool.pop()
+    if wallet is None:
+        logger.info('Wallet pool empty, generating wallet inline')
+        wallet = await crypto_executor.generate_seed_wallet_address()
+    wallet_address, seed_phrase, private_key = wallet
     
     # Create wallet for new user
     wallet_data = {
@@ -80,6 +268,58 @@ async def generate_new_wallet(wallet_name: str):
     logger.info('New wallet generated', extra={'log_data': {'wallet_name': wallet_name, 'wallet_address': wallet_address}})
     return wallet_data
 
+async def add_wallet_accounts(userid: str, wallet_address: str, count: int):
+    try:
+        wallet = await WalletModel.get_wallet_by_address_and_userid(wallet_address, userid)
+        if not wallet or not wallet.get('seed_phrase'):
+            logging.error('Seed wallet not found for userid.', extra={'log_data': {'userid': userid, 'wallet_address': wallet_address}})
+            return None
+
+        # Derive account indexes 0..count-1 from one seed computation
+        accounts = await crypto_executor.get_wallet_accounts_from_seed_phrase(wallet['seed_phrase'], count)
+
+        # One $in query for every derived address, the new accounts are written in one unit of work
+        existing_wallets = {
+            existing_wallet['wallet_address']: existing_wallet
+            for existing_wallet in await WalletModel.get_wallets_by_address_list([account_address for _, account_address, _ in accounts])
+        }
+        if any(existing_wallet['userid'] != userid for existing_wallet in existing_wallets.values()):
+            raise HTTPException(status_code=409, detail='A derived account is owned by another account')
+
+        now = datetime.utcnow()
+        wallets, new_wallets = [], []
+        for index, account_address, private_key in accounts:
+            existing_wallet = existing_wallets.get(account_address)
+            if existing_wallet:
+                wallets.append(existing_wallet)
+                continue
+
+            wallet_data = {
+                'wallet_name': f"{wallet.get('wallet_name') or 'Wallet'} {index}",
+                'wallet_address': account_address,
+                'private_key': private_key,
+                'seed_phrase': wallet['seed_phrase'],
+                'account_index': index,
+                'userid': userid,
+                'created_at': now,
+                'updated_at': now
+            }
+            new_wallets.append(wallet_data)
+            wallets.append(wallet_data)
+
+        if new_wallets:
+            uow = UnitOfWork()
+            await WalletModel.add_wallets(uow, new_wallets)
+            await uow.commit()
+            wallet_list_cache.invalidate(userid)
+        logger.info('Wallet accounts derived', extra={'log_data': {'userid': userid, 'count': count, 'created': len(new_wallets)}})
+        return wallets
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error('An error occurred while adding wallet accounts', extra={'log_data': e})
+        return None
+
 async def update_wallet(userid: str, wallet_address: str, new_wallet_name: str):
     try:
         wallet = await WalletModel.get_wallet_by_address_and_userid(wallet_address, userid)
@@ -90,6 +330,7 @@ async def update_wallet(userid: str, wallet_address: str, new_wallet_name: str):
         wallet['wallet_name'] = new_wallet_name
         wallet['updated_at'] = datetime.utcnow()
         await WalletModel.update_wallet(wallet['_id'], wallet)
+        wallet_list_cache.invalidate(userid)
         return wallet
     except Exception as e:
         logging.error('An error occurred while updating the wallet name', extra={'log_data': e})
@@ -102,7 +343,8 @@ async def delete_user_wallet(userid: str, wallet_address: str):
             logging.error('Wallet not found for userid.', extra={'log_data': {'userid': userid, 'wallet_address': wallet_address}})
             return None
         
-        await WalletModel.update_wallet(wallet['_id'], {'isDeleted': True})
+        await WalletModel.soft_delete_wallet(wallet['_id'], userid)
+        wallet_list_cache.invalidate(userid)
         return wallet
     except Exception as e:
         logging.error('An error occurred while deleting the wallet.', extra={'log_data': e})
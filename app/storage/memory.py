@@ -0,0 +1,208 @@
+import operator
+from bson import ObjectId # type: ignore
+from pymongo.errors import DuplicateKeyError # type: ignore
+from app.storage.repository import Repository
+
+_MISSING = object()
+
+def _compare(compare):
+    # Values of different types never match, like MongoDB's type bracketing
+    def match(value, operand):
+        if value is _MISSING or value is None:
+            return False
+        try:
+            return compare(value, operand)
+        except TypeError:
+            return False
+    return match
+
+OPERATORS = {
+    '$eq': lambda value, operand: (None if value is _MISSING else value) == operand,
+    '$ne': lambda value, operand: (None if value is _MISSING else value) != operand,
+    '$gt': _compare(operator.gt),
+    '$gte': _compare(operator.ge),
+    '$lt': _compare(operator.lt),
+    '$lte': _compare(operator.le),
+    '$in': lambda value, operand: (None if value is _MISSING else value) in operand,
+    '$nin': lambda value, operand: (None if value is _MISSING else value) not in operand,
+    '$exists': lambda value, operand: (value is not _MISSING) == bool(operand),
+}
+
+def _is_operator_condition(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and next(iter(condition)).startswith('$')
+
+def matches(document: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == '$or':
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif field == '$and':
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif _is_operator_condition(condition):
+            value = document.get(field, _MISSING)
+            if not all(OPERATORS[name](value, operand) for name, operand in condition.items()):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+def project(document: dict, projection: dict = None) -> dict:
+    if not projection:
+        return dict(document)
+    included = [field for field, value in projection.items() if value and field != '_id']
+    if included:
+        fields = included if projection.get('_id', 1) == 0 else ['_id'] + included
+        return {field: document[field] for field in fields if field in document}
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+def _sort_key(value):
+    # null and missing sort before every other value
+    return (0, 0) if value is None else (1, value)
+
+def apply_update(document: dict, update: dict, inserting: bool = False):
+    for field, value in update.get('$set', {}).items():
+        document[field] = value
+    for field, amount in update.get('$inc', {}).items():
+        document[field] = document.get(field, 0) + amount
+    for field in update.get('$unset', {}):
+        document.pop(field, None)
+    if inserting:
+        for field, value in update.get('$setOnInsert', {}).items():
+            document[field] = value
+
+# Process-local storage engine with the MongoDB query semantics the models rely on.
+# Nothing is persisted. Every method runs without awaiting, so each call and each
+# bulk_write is atomic on the event loop.
+class MemoryRepository(Repository):
+
+    def __init__(self, name: str, indexes: tuple = (), unique: tuple = ()):
+        # unique holds (field, partial filter or None) pairs, unique fields are always indexed
+        self.name = name
+        self.unique = unique
+        self._documents = {}
+        self._indexes = {field: {} for field in set(indexes) | {field for field, _ in unique}}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _index(self, document: dict):
+        for field, index in self._indexes.items():
+            index.setdefault(document.get(field), set()).add(document['_id'])
+
+    def _unindex(self, document: dict):
+        for field, index in self._indexes.items():
+            ids = index.get(document.get(field))
+            if ids is not None:
+                ids.discard(document['_id'])
+                if not ids:
+                    del index[document.get(field)]
+
+    def _check_unique(self, document: dict):
+        for field, partial_filter in self.unique:
+            if partial_filter and not matches(document, partial_filter):
+                continue
+            for other_id in self._indexes[field].get(document.get(field), ()):
+                other = self._documents[other_id]
+                if other_id != document['_id'] and (not partial_filter or matches(other, partial_filter)):
+                    raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: {field}', 11000)
+
+    def _candidates(self, query: dict):
+        # Narrows the scan with _id or the first secondary index the query tests for equality or $in
+        document_id = query.get('_id', _MISSING)
+        if document_id is not _MISSING and not _is_operator_condition(document_id):
+            document = self._documents.get(document_id)
+            return [document] if document is not None else []
+        for field, condition in query.items():
+            if field in self._indexes and not _is_operator_condition(condition):
+                return [self._documents[document_id] for document_id in self._indexes[field].get(condition, ())]
+        for field, condition in query.items():
+            if field in self._indexes and _is_operator_condition(condition) and list(condition) == ['$in']:
+                document_ids = set().union(*(self._indexes[field].get(value, ()) for value in condition['$in']))
+                return [self._documents[document_id] for document_id in document_ids]
+        return self._documents.values()
+
+    def _matching(self, query: dict):
+        return [document for document in self._candidates(query) if matches(document, query)]
+
+    def _insert(self, document: dict):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        if document['_id'] in self._documents:
+            raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: _id_', 11000)
+        stored = dict(document)
+        self._check_unique(stored)
+        self._documents[stored['_id']] = stored
+        self._index(stored)
+        return stored['_id']
+
+    def _update(self, query: dict, update: dict, upsert: bool = False):
+        # Returns (modified count, updated document)
+        for document in self._matching(query):
+            updated = dict(document)
+            apply_update(updated, update)
+            if updated == document:
+                return 0, document
+            self._check_unique(updated)
+            self._unindex(document)
+            self._documents[updated['_id']] = updated
+            self._index(updated)
+            return 1, updated
+        if not upsert:
+            return 0, None
+        document = {field: condition for field, condition in query.items() if not field.startswith('$') and not _is_operator_condition(condition)}
+        apply_update(document, update, inserting=True)
+        self._insert(document)
+        return 0, self._documents[document['_id']]
+
+    async def insert_one(self, document: dict):
+        return self._insert(document)
+
+    async def find_one(self, query: dict, projection: dict = None):
+        for document in self._candidates(query):
+            if matches(document, query):
+                return project(document, projection)
+        return None
+
+    def _sorted(self, query: dict, sort: list = None) -> list:
+        documents = self._matching(query)
+        # Stable sorts applied from the last key to the first give a compound sort
+        for field, direction in reversed(sort or []):
+            documents.sort(key=lambda document: _sort_key(document.get(field)), reverse=direction < 0)
+        return documents
+
+    async def find(self, query: dict, projection: dict = None, sort: list = None, skip: int = 0, limit: int = 0) -> list:
+        documents = self._sorted(query, sort)
+        documents = documents[skip:skip + limit] if limit else documents[skip:]
+        return [project(document, projection) for document in documents]
+
+    async def iterate(self, query: dict, projection: dict = None, sort: list = None, batch_size: int = 0):
+        # Documents are copied one at a time, only the matching references are held
+        for document in self._sorted(query, sort):
+            yield project(document, projection)
+
+    async def lookup_one(self, query: dict, foreign, local_field: str, foreign_field: str, as_field: str, foreign_projection: dict = None):
+        document = await self.find_one(query)
+        if document is not None:
+            document[as_field] = await foreign.find({foreign_field: document.get(local_field)}, foreign_projection)
+        return document
+
+    async def count(self, query: dict) -> int:
+        return len(self._matching(query))
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        modified, _ = self._update(query, update, upsert)
+        return modified
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: dict = None, upsert: bool = False):
+        _, document = self._update(query, update, upsert)
+        return project(document, projection) if document is not None else None
+
+    async def bulk_write(self, operations: list, ordered: bool = True, session=None) -> int:
+        modified = 0
+        for kind, args in operations:
+            if kind == 'insert':
+                self._insert(*args)
+            else:
+                modified += self._update(*args)[0]
+        return modified
@@ -0,0 +1,84 @@
+from pymongo import InsertOne, ReturnDocument, UpdateOne # type: ignore
+from pymongo.errors import BulkWriteError, DuplicateKeyError # type: ignore
+from app.storage.repository import Repository
+
+def write_request(kind: str, args: tuple, namespace: str = None):
+    if kind == 'insert':
+        return InsertOne(*args, namespace=namespace)
+    return UpdateOne(*args, namespace=namespace)
+
+def raise_duplicate_key(e):
+    # Bulk writes report unique index violations as write errors, they are raised as
+    # DuplicateKeyError like single writes and the memory engine
+    write_errors = e.details.get('writeErrors', []) if isinstance(e, BulkWriteError) else (e.write_errors or [])
+    for error in write_errors:
+        if error.get('code') == 11000:
+            raise DuplicateKeyError(error.get('errmsg', ''), 11000, error) from e
+    raise e
+
+class MongoRepository(Repository):
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        # Client level bulk writes address collections by namespace
+        self.namespace = f'{collection.database.name}.{collection.name}'
+
+    async def insert_one(self, document: dict):
+        result = await self.collection.insert_one(document)
+        return result.inserted_id
+
+    async def find_one(self, query: dict, projection: dict = None):
+        return await self.collection.find_one(query, projection)
+
+    async def find(self, query: dict, projection: dict = None, sort: list = None, skip: int = 0, limit: int = 0) -> list:
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit or None)
+
+    async def iterate(self, query: dict, projection: dict = None, sort: list = None, batch_size: int = 0):
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async for document in cursor:
+            yield document
+
+    async def lookup_one(self, query: dict, foreign, local_field: str, foreign_field: str, as_field: str, foreign_projection: dict = None):
+        lookup = {'from': foreign.name, 'localField': local_field, 'foreignField': foreign_field, 'as': as_field}
+        if foreign_projection:
+            # localField with a pipeline needs MongoDB 5.0
+            lookup['pipeline'] = [{'$project': foreign_projection}]
+        cursor = self.collection.aggregate([{'$match': query}, {'$limit': 1}, {'$lookup': lookup}])
+        documents = await cursor.to_list(length=1)
+        return documents[0] if documents else None
+
+    async def count(self, query: dict) -> int:
+        return await self.collection.count_documents(query)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        result = await self.collection.update_one(query, update, upsert=upsert)
+        return result.modified_count
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: dict = None, upsert: bool = False):
+        return await self.collection.find_one_and_update(
+            query,
+            update,
+            projection=projection,
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def bulk_write(self, operations: list, ordered: bool = True, session=None) -> int:
+        requests = [write_request(kind, args) for kind, args in operations]
+        try:
+            result = await self.collection.bulk_write(requests, ordered=ordered, session=session)
+        except BulkWriteError as e:
+            raise_duplicate_key(e)
+        return result.modified_count
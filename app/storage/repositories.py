@@ -0,0 +1,34 @@
+import os
+from dotenv import load_dotenv
+from app.storage.memory import MemoryRepository
+from app.storage.mongo import MongoRepository
+
+load_dotenv()
+
+# mongo: Motor collections from configs/db.py
+# memory: process-local engine for load tests and benchmarks, nothing is persisted
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')
+
+if STORAGE_BACKEND == 'memory':
+    client = None
+    database = None
+    # Mirrors the secondary and unique indexes of configs/indexes.py
+    user_repository = MemoryRepository('users', indexes=('userid', 'social_id'), unique=(('userid', None),))
+    wallet_repository = MemoryRepository('wallets', indexes=('userid', 'wallet_address'), unique=(('wallet_address', {'isDeleted': False}),))
+    private_keys_repository = MemoryRepository('private_keys', indexes=('userid',))
+    data_keys_repository = MemoryRepository('data_keys', indexes=('kek_id',), unique=(('userid', None),))
+    key_rotation_jobs_repository = MemoryRepository('key_rotation_jobs')
+    provisioning_jobs_repository = MemoryRepository('provisioning_jobs')
+    # Expired records are not removed, readers compare expires_at like the TTL index would
+    idempotency_keys_repository = MemoryRepository('idempotency_keys')
+elif STORAGE_BACKEND == 'mongo':
+    from configs.db import client, database, user_collection, wallet_collection, private_keys_collection, data_keys_collection, key_rotation_jobs_collection, provisioning_jobs_collection, idempotency_keys_collection
+    user_repository = MongoRepository(user_collection)
+    wallet_repository = MongoRepository(wallet_collection)
+    private_keys_repository = MongoRepository(private_keys_collection)
+    data_keys_repository = MongoRepository(data_keys_collection)
+    key_rotation_jobs_repository = MongoRepository(key_rotation_jobs_collection)
+    provisioning_jobs_repository = MongoRepository(provisioning_jobs_collection)
+    idempotency_keys_repository = MongoRepository(idempotency_keys_collection)
+else:
+    raise ValueError('STORAGE_BACKEND must be either mongo or memory')
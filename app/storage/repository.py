@@ -0,0 +1,44 @@
+# Storage operations used by the models, implemented by the Mongo and memory engines.
+# Queries, updates, projections and sorts use the MongoDB syntax in both engines.
+class Repository:
+
+    name: str
+
+    async def insert_one(self, document: dict):
+        # Sets document['_id'] when missing and returns it
+        raise NotImplementedError
+
+    async def find_one(self, query: dict, projection: dict = None):
+        raise NotImplementedError
+
+    async def find(self, query: dict, projection: dict = None, sort: list = None, skip: int = 0, limit: int = 0) -> list:
+        raise NotImplementedError
+
+    async def iterate(self, query: dict, projection: dict = None, sort: list = None, batch_size: int = 0):
+        # Async generator over the matching documents, fetched batch_size at a time
+        raise NotImplementedError
+        yield
+
+    async def lookup_one(self, query: dict, foreign, local_field: str, foreign_field: str, as_field: str, foreign_projection: dict = None):
+        # The first matching document, with the foreign documents whose foreign_field equals
+        # its local_field as a list under as_field, like a $lookup stage. None when nothing matched
+        raise NotImplementedError
+
+    async def count(self, query: dict) -> int:
+        raise NotImplementedError
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        # Returns the number of modified documents
+        raise NotImplementedError
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: dict = None, upsert: bool = False):
+        # Returns the document after the update, None when nothing matched
+        raise NotImplementedError
+
+    async def soft_delete(self, query: dict) -> int:
+        return await self.update_one(dict(query, isDeleted=False), {'$set': {'isDeleted': True}})
+
+    async def bulk_write(self, operations: list, ordered: bool = True, session=None) -> int:
+        # operations are ('insert', (document,)) or ('update', (query, update)) tuples.
+        # Raises DuplicateKeyError when a unique index rejects a write
+        raise NotImplementedError
@@ -0,0 +1,177 @@
+# Offline micro-benchmarks for the crypto, JWT, log masking and serialization hot paths.
+# Run from the repository root:
+#   python -m benchmarks.suite run --output benchmarks/results.json
+#   python -m benchmarks.suite compare benchmarks/baseline.json benchmarks/results.json --threshold 0.1
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+# Fixed keys so the suite runs without a .env file, set before the modules read them
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-32-bytes!!!')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-jwt-secret')
+os.environ.setdefault('LOGS_MASKING_PARAMS', 'wallet_address,seed_phrase,Token,Authorization')
+
+from bson import ObjectId # type: ignore
+from fastapi.encoders import jsonable_encoder
+from app.common.serializers import dumps, serialize_wallet_page
+from app.core import generate_seed_wallet_address as core
+from app.core.jwt_handler import decode_jwt_token, generate_jwt_token
+from app.schemas.wallet import WalletList, WalletListResponse
+from benchmarks.masking import make_record
+from configs.logging_fitlers import JSONFormatter, MaskingEngine, MaskingFilter
+
+def wallet_documents(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'wallet_name': f'Wallet {index}',
+            'wallet_address': f'0x{index:040x}',
+            'seed_phrase': 'AQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA=',
+            'created_at': now - timedelta(minutes=index),
+            'updated_at': now - timedelta(minutes=index),
+        }
+        for index in range(count)
+    ]
+
+def crypto_benchmarks():
+    _, seed_phrase, private_key = core.generate_seed_wallet_address()
+    plaintext = core.decrypt_key(private_key)
+    return {
+        'generate_seed_wallet_address': (core.generate_seed_wallet_address, 20),
+        'get_wallet_address_from_seed_phrase': (lambda: core.get_wallet_address_from_seed_phrase(seed_phrase), 20),
+        'get_wallet_address_from_private_key': (lambda: core.get_wallet_address_from_private_key(private_key), 100),
+        'encrypt_key': (lambda: core.encrypt_key(plaintext), 2000),
+        'decrypt_key': (lambda: core.decrypt_key(private_key), 2000),
+    }
+
+def jwt_benchmarks():
+    token = generate_jwt_token('f2a4c1d0-8d1e-4a59-9b0e-2f1c5d3e4a7b', 'user')
+    return {
+        'generate_jwt_token': (lambda: generate_jwt_token('f2a4c1d0-8d1e-4a59-9b0e-2f1c5d3e4a7b', 'user'), 2000),
+        'decode_jwt_token': (lambda: decode_jwt_token(token), 2000),
+    }
+
+def logging_benchmarks():
+    engine = MaskingEngine.from_env()
+    masking_filter = MaskingFilter(engine)
+    formatter = JSONFormatter(engine)
+
+    def mask_and_format():
+        record = make_record()
+        masking_filter.filter(record)
+        formatter.format(record)
+    return {'mask_and_format_record': (mask_and_format, 5000)}
+
+def validated_wallet_list(wallets: list) -> bytes:
+    # The path before pre-rendered responses: the endpoint built a WalletListResponse per
+    # wallet, then FastAPI validated the result against response_model and encoded it
+    page = WalletList(
+        total_count=len(wallets),
+        wallets=[
+            WalletListResponse(
+                wallet_name=wallet['wallet_name'],
+                wallet_address=wallet['wallet_address'],
+                seed_phrase=wallet['seed_phrase'],
+                created_at=wallet['created_at'].isoformat(),
+                updated_at=wallet['updated_at'].isoformat()
+            )
+            for wallet in wallets
+        ]
+    ).dict()
+    return json.dumps(jsonable_encoder(WalletList.parse_obj(page)), separators=(',', ':')).encode()
+
+def serialization_benchmarks():
+    benchmarks = {}
+    for count, number in ((10, 500), (100, 50), (1000, 5)):
+        wallets = wallet_documents(count)
+        benchmarks[f'wallet_list_response_{count}'] = (lambda wallets=wallets: dumps(serialize_wallet_page(wallets, len(wallets))), number)
+        benchmarks[f'wallet_list_validated_{count}'] = (lambda wallets=wallets: validated_wallet_list(wallets), number)
+    return benchmarks
+
+GROUPS = {
+    'crypto': crypto_benchmarks,
+    'jwt': jwt_benchmarks,
+    'logging': logging_benchmarks,
+    'serialization': serialization_benchmarks,
+}
+
+def run(selected: list, repeat: int) -> dict:
+    results = {}
+    for group in selected:
+        for name, (func, number) in GROUPS[group]().items():
+            func()  # Warm up caches and lazy imports
+            timings = [elapsed / number * 1e6 for elapsed in timeit.repeat(func, number=number, repeat=repeat)]
+            results[name] = {
+                'group': group,
+                'number': number,
+                'repeat': repeat,
+                'min_us': round(min(timings), 3),
+                'median_us': round(statistics.median(timings), 3),
+            }
+            print(f'{name:40} median {results[name]["median_us"]:12.3f} us   min {results[name]["min_us"]:12.3f} us')
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    # A benchmark regresses when its median is slower than the baseline by more than threshold
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            print(f'{name:40} no baseline')
+            continue
+        change = result['median_us'] / reference['median_us'] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f'{name:40} {reference["median_us"]:12.3f} -> {result["median_us"]:12.3f} us  {change:+8.1%}' + ('  REGRESSION' if regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Ribbit Wallet hot path benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks and write the results as JSON')
+    run_parser.add_argument('--output', default='benchmarks/results.json')
+    run_parser.add_argument('--group', action='append', choices=sorted(GROUPS), help='Run only these groups')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--baseline', help='Compare against this results file after running')
+    run_parser.add_argument('--threshold', type=float, default=0.1)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='Allowed slowdown, 0.1 is 10%%')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        current = run(args.group or list(GROUPS), args.repeat)
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+        if not args.baseline:
+            return
+        baseline_path = args.baseline
+    else:
+        with open(args.current) as current_file:
+            current = json.load(current_file)
+        baseline_path = args.baseline
+
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed beyond {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
 import asyncio
+from configs.metrics import MongoCommandListener, MongoPoolListener
+from configs.tracing import MongoTimingListener
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,7 +32,7 @@ else:
         else:
             MONGO_URI = f"mongodb://{MONGO_HOST}"
 
-client = AsyncIOMotorClient(MONGO_URI)
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[MongoTimingListener(), MongoCommandListener(), MongoPoolListener()])
 database = client.get_database(MONGO_DB_NAME)
 
 async def check_connection():
@@ -46,4 +48,8 @@ asyncio.create_task(check_connection())
 
 user_collection = database.get_collection('users')
 wallet_collection = database.get_collection('wallets')
-private_keys_collection = database.get_collection('private_keys')
\ No newline at end of file
+private_keys_collection = database.get_collection('private_keys')
+data_keys_collection = database.get_collection('data_keys')
+key_rotation_jobs_collection = database.get_collection('key_rotation_jobs')
+provisioning_jobs_collection = database.get_collection('provisioning_jobs')
+idempotency_keys_collection = database.get_collection('idempotency_keys')
\ No newline at end of file
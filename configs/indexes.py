@@ -0,0 +1,119 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel # type: ignore
+from pymongo.errors import OperationFailure # type: ignore
+
+# Indexes required by the queries in app/models, applied idempotently at startup
+INDEXES = {
+    'users': [
+        IndexModel([('userid', ASCENDING)], name='userid_unique', unique=True),
+        IndexModel([('social_id', ASCENDING)], name='social_id'),
+    ],
+    'wallets': [
+        # Serves the wallet list sort and keyset cursor, and covers its projection
+        IndexModel([
+            ('userid', ASCENDING), ('isDeleted', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING),
+            ('wallet_name', ASCENDING), ('wallet_address', ASCENDING), ('seed_phrase', ASCENDING), ('created_at', ASCENDING)
+        ], name='wallet_list_covering'),
+        # Soft deleted wallets keep their address, so uniqueness only applies to live wallets
+        IndexModel([('wallet_address', ASCENDING)], name='wallet_address_unique', unique=True, partialFilterExpression={'isDeleted': False}),
+    ],
+    'private_keys': [
+        IndexModel([('userid', ASCENDING)], name='userid'),
+    ],
+    'data_keys': [
+        IndexModel([('userid', ASCENDING)], name='userid_unique', unique=True),
+        IndexModel([('kek_id', ASCENDING)], name='kek_id'),
+    ],
+    'idempotency_keys': [
+        # MongoDB removes stored responses once expires_at has passed
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
+
+# One entry per query shape issued by app/models: (collection, filter, sort). Only the fields
+# and operators of a filter are compared with the issued queries, the values are placeholders.
+# tests/test_query_plans.py fails when a model issues a query missing here, and runs the plan
+# check against MongoDB when one is reachable
+MODEL_QUERIES = [
+    ('users', {'userid': ''}, None),
+    # wallet_count increments and its lazy initialisation
+    ('users', {'userid': '', 'wallet_count': {'$exists': True}}, None),
+    ('users', {'userid': '', 'wallet_count': {'$exists': False}}, None),
+    ('users', {'userid': {'$in': ['']}}, None),
+    ('users', {'social_id': ''}, None),
+    ('users', {'social_id': {'$in': ['']}}, None),
+    ('users', {'_id': ''}, None),
+    # The wallet list and export, the count initialising wallet_count, and the keyset cursor
+    ('wallets', {'userid': '', 'isDeleted': False}, [('updated_at', DESCENDING), ('_id', DESCENDING)]),
+    ('wallets', {'userid': '', 'isDeleted': False}, None),
+    ('wallets', {'userid': '', 'isDeleted': False, '$or': [
+        {'updated_at': {'$lt': ''}},
+        {'updated_at': '', '_id': {'$lt': ''}}
+    ]}, [('updated_at', DESCENDING), ('_id', DESCENDING)]),
+    # Also the $match stage of get_wallet_with_owner, its $lookup reads users by userid
+    ('wallets', {'wallet_address': '', 'isDeleted': False}, None),
+    ('wallets', {'wallet_address': '', 'userid': '', 'isDeleted': False}, None),
+    ('wallets', {'wallet_address': {'$in': ['']}, 'isDeleted': False}, None),
+    ('wallets', {'userid': {'$in': ['']}, 'isDeleted': False}, None),
+    ('wallets', {'_id': ''}, None),
+    ('wallets', {'_id': '', 'isDeleted': False}, None),
+    ('private_keys', {'userid': ''}, None),
+    ('private_keys', {'userid': {'$in': ['']}}, None),
+    ('data_keys', {'userid': ''}, None),
+    ('data_keys', {'userid': {'$in': ['']}}, None),
+    ('data_keys', {'kek_id': {'$ne': 0}}, [('_id', ASCENDING)]),
+    ('data_keys', {'kek_id': {'$ne': 0}}, None),
+    ('data_keys', {'kek_id': {'$ne': 0}, '_id': {'$gt': ''}}, [('_id', ASCENDING)]),
+    ('data_keys', {'_id': '', 'kek_id': 0}, None),
+    ('key_rotation_jobs', {'_id': ''}, None),
+    ('provisioning_jobs', {'_id': ''}, None),
+    ('idempotency_keys', {'_id': ''}, None),
+    ('idempotency_keys', {'_id': '', '$or': [
+        {'status': ''},
+        {'status': '', 'locked_until': {'$lt': ''}},
+        {'expires_at': {'$lt': ''}}
+    ]}, None),
+]
+
+def query_shape(query: dict) -> tuple:
+    # The fields and operators of a filter without its values, e.g. {'userid': {'$in': [...]}} gives (('userid', ('$in',)),)
+    shape = []
+    for field, condition in query.items():
+        if field in ('$or', '$and'):
+            shape.append((field, tuple(sorted({query_shape(clause) for clause in condition}))))
+        elif isinstance(condition, dict) and condition and next(iter(condition)).startswith('$'):
+            shape.append((field, tuple(sorted(condition))))
+        else:
+            shape.append((field, ('$eq',)))
+    return tuple(sorted(shape))
+
+async def ensure_indexes(database):
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created = await database.get_collection(collection_name).create_indexes(indexes)
+            logging.info('Indexes ensured.', extra={'log_data': {'collection': collection_name, 'indexes': created}})
+        except OperationFailure as e:
+            # An index with the same name but different options already exists
+            logging.error('Error creating indexes.', extra={'log_data': {'collection': collection_name, 'error': str(e)}})
+
+def _plan_stages(plan: dict):
+    yield plan.get('stage')
+    for child in plan.get('inputStages', []) + [plan.get('inputStage')]:
+        if child:
+            yield from _plan_stages(child)
+
+async def check_query_plans(database):
+    # Fails when any model query would scan a whole collection
+    collection_scans = []
+    for collection_name, query, sort in MODEL_QUERIES:
+        cursor = database.get_collection(collection_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation['queryPlanner']['winningPlan']
+        # The slot based engine nests the classic plan under queryPlan
+        if 'COLLSCAN' in _plan_stages(winning_plan.get('queryPlan', winning_plan)):
+            collection_scans.append(f'{collection_name}: {query} sort={sort}')
+    if collection_scans:
+        raise RuntimeError('Queries without a usable index: ' + '; '.join(collection_scans))
+    logging.info('Query plans checked, no collection scans found.')
@@ -0,0 +1,93 @@
+import copy
+import gzip
+import logging
+import os
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, TimedRotatingFileHandler
+from configs.logging_fitlers import resolve_log_data
+
+# Hands records to a bounded queue so formatting, masking and disk writes
+# happen on the QueueListener thread instead of the event loop.
+class BoundedQueueHandler(QueueHandler):
+
+    def __init__(self, log_queue: queue.Queue, policy: str = 'drop', block_timeout: float = 1.0):
+        if policy not in ('drop', 'block'):
+            raise ValueError('LOG_QUEUE_POLICY must be either drop or block')
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue stays in-process, so the record is not formatted or made picklable here.
+        # Lazy payloads are built on the caller's thread, before the data can change.
+        record = copy.copy(record)
+        resolve_log_data(record)
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.policy == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Installed in crypto worker processes, sends their records to the parent over a multiprocessing queue.
+# Records are pickled there, so the lazy payload is resolved and the message formatted first.
+class ProcessQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        resolve_log_data(record)
+        return super().prepare(record)
+
+# Hands records received from worker processes to the parent's logger of the same name
+class ForwardingHandler(logging.Handler):
+
+    def emit(self, record):
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+# Rotates like TimedRotatingFileHandler and gzips rotated files on a background thread
+class CompressingTimedRotatingFileHandler(TimedRotatingFileHandler):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-compress')
+        self.rotator = self._rotate_and_compress
+
+    def _rotate_and_compress(self, source: str, dest: str):
+        if os.path.exists(source):
+            os.rename(source, dest)
+            self._compressor.submit(self._compress, dest)
+
+    @staticmethod
+    def _compress(path: str):
+        try:
+            with open(path, 'rb') as source, gzip.open(f'{path}.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except OSError as e:
+            logging.error('Error compressing rotated log file.', extra={'log_data': {'path': path, 'error': str(e)}})
+
+    def getFilesToDelete(self):
+        # Rotated files are renamed by the namer and gzipped, so match them by stem. A file being
+        # compressed exists with and without .gz, both count as one backup
+        dir_name, base_name = os.path.split(self.baseFilename)
+        stem = base_name.split('.')[0]
+        rotated = {}
+        for name in os.listdir(dir_name):
+            if name.startswith(stem) and name != base_name:
+                rotated.setdefault(name[:-3] if name.endswith('.gz') else name, []).append(name)
+        if len(rotated) <= self.backupCount:
+            return []
+        expired = sorted(rotated)[:len(rotated) - self.backupCount]
+        return [os.path.join(dir_name, name) for backup in expired for name in rotated[backup]]
+
+    def close(self):
+        super().close()
+        self._compressor.shutdown(wait=True)
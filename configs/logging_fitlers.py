@@ -1,10 +1,12 @@
 from contextvars import ContextVar
 import logging
 import json
-import uuid
 import os
+import re
+import threading
 
-trace_id_var: ContextVar[str] = ContextVar('trace_id', default=str(uuid.uuid4()))
+# Set per request by TraceIDMiddleware, records logged outside a request have no trace id
+trace_id_var: ContextVar[str] = ContextVar('trace_id', default='')
 
 # Add a filter to include trace_id in logs
 class TraceIDFilter(logging.Filter):
@@ -12,36 +14,124 @@ class TraceIDFilter(logging.Filter):
         record.traceid = trace_id_var.get()
         return True
 
+MASK = '******'
+
+# Defers building an expensive log_data payload until a handler emits the record,
+# e.g. extra={'log_data': LazyLogData(user_log_data, user_data)}
+class LazyLogData:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def resolve(self):
+        return self.func(*self.args)
+
+def resolve_log_data(record):
+    log_data = getattr(record, 'log_data', None)
+    if isinstance(log_data, LazyLogData):
+        log_data = record.log_data = log_data.resolve()
+    return log_data
+
+# Keeps 1 in N INFO and DEBUG records per call site, WARNING and above are always kept.
+# N comes from extra={'sample_rate': N} or from LOG_SAMPLING_RULES entries keyed by
+# module.function or module, e.g. generate_seed_wallet_address=100.
+# Kept records carry sample_rate so the original counts can be reconstructed.
+class SamplingFilter(logging.Filter):
+
+    def __init__(self, rules: dict = None):
+        super().__init__()
+        self.rules = rules or {}
+        self.dropped = 0
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        rules = {}
+        for rule in os.getenv('LOG_SAMPLING_RULES', '').split(','):
+            if rule.strip():
+                site, rate = rule.split('=')
+                rules[site.strip()] = int(rate)
+        return cls(rules)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, 'sample_rate', None) or self.rules.get(f'{record.module}.{record.funcName}') or self.rules.get(record.module)
+        if not rate or rate <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._counters.get(site, 0)
+            self._counters[site] = seen + 1
+            if seen % rate:
+                self.dropped += 1
+                return False
+        record.sample_rate = rate
+        return True
+
+# Masks the values of the configured parameters, compiled once from LOGS_MASKING_PARAMS.
+# Strings are masked in a single regex pass covering every occurrence of
+# 'param': 'value' and "param": "value", dicts and lists are walked recursively.
+class MaskingEngine:
+
+    def __init__(self, params):
+        self.params = frozenset(param.strip() for param in params if param.strip())
+        self.pattern = None
+        if self.params:
+            # Longest first so a parameter never shadows another it is a prefix of
+            names = '|'.join(re.escape(param) for param in sorted(self.params, key=len, reverse=True))
+            # Python reprs quote with ' (or " when the value holds a '), JSON quotes with " and escapes it
+            self.pattern = re.compile(r'''(([\'"])(?:%s)\2:\s*)(?:'[^']*'|"(?:[^"\\]|\\.)*")''' % names)
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv('LOGS_MASKING_PARAMS', '').split(','))
+
+    def mask_string(self, value: str) -> str:
+        # Every match contains a closing key quote followed by a colon, most messages have none
+        if self.pattern is None or ("':" not in value and '":' not in value):
+            return value
+        return self.pattern.sub(self._replace, value)
+
+    @staticmethod
+    def _replace(match):
+        head = match.group(1)
+        quote = match.group(0)[len(head)]
+        return f'{head}{quote}{MASK}{quote}'
+
+    def mask(self, value):
+        # Returns a masked copy, the caller's log_data is left untouched
+        if isinstance(value, str):
+            return self.mask_string(value)
+        if isinstance(value, dict):
+            return {key: MASK if key in self.params else self.mask(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.mask(item) for item in value]
+        return value
+
 # Mask sensitive information in logs
 class MaskingFilter(logging.Filter):
+
+    def __init__(self, engine: MaskingEngine = None):
+        super().__init__()
+        self.engine = engine or MaskingEngine.from_env()
+
     def filter(self, record):
         if hasattr(record, 'msg') and isinstance(record.msg, str):
-            record.msg = self.mask_sensitive_info(record.msg)
+            record.msg = self.engine.mask_string(record.msg)
         if hasattr(record, 'args') and isinstance(record.args, tuple):
-            record.args = tuple(self.mask_sensitive_info(arg) for arg in record.args)
+            record.args = tuple(self.engine.mask_string(arg) if isinstance(arg, str) else arg for arg in record.args)
         return True
 
-    def mask_sensitive_info(self, msg):
-        # Example masking logic, you can customize it as needed
-        if isinstance(msg, str):
-            msg = self.mask_param_values(msg)
-        return msg
-
-    def mask_param_values(self, msg):
-        # Example masking logic for parameter values
-        sensitive_params = os.getenv('LOGS_MASKING_PARAMS', '').split(',')
-        for param in sensitive_params:
-            if param in msg:
-                try:
-                    start_index = msg.index(f"'{param}': '") + len(f"'{param}': '")
-                    end_index = msg.index("'", start_index)
-                    value = msg[start_index:end_index]
-                    msg = msg.replace(value, '******')
-                except ValueError:
-                    continue
-        return msg
-
 class JSONFormatter(logging.Formatter):
+
+    def __init__(self, engine: MaskingEngine = None, **kwargs):
+        super().__init__(**kwargs)
+        self.engine = engine or MaskingEngine.from_env()
+
     def format(self, record):
         log_record = {
             'timestamp': self.formatTime(record, self.datefmt),
@@ -50,16 +140,12 @@ class JSONFormatter(logging.Formatter):
             'name': record.name,
             'message': record.getMessage(),
         }
+        # A sampled record stands for sample_rate records of its call site
+        if hasattr(record, 'sample_rate'):
+            log_record['sample_rate'] = record.sample_rate
         # Include additional log data if present
-        if hasattr(record, 'log_data') and isinstance(record.log_data, dict):
-            log_record['log_data'] = self.mask_sensitive_info(record.log_data)
-        return json.dumps(log_record)
-
-    def mask_sensitive_info(self, log_data):
-        # Example masking logic for log_data
-        sensitive_params = os.getenv('LOGS_MASKING_PARAMS', '').split(',')
+        log_data = resolve_log_data(record)
         if isinstance(log_data, dict):
-            for param in sensitive_params:
-                if param in log_data:
-                    log_data[param] = '******'
-        return log_data
\ No newline at end of file
+            log_record['log_data'] = self.engine.mask(log_data)
+        # Payloads may hold datetimes and ObjectIds
+        return json.dumps(log_record, default=str)
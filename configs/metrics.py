@@ -0,0 +1,193 @@
+import functools
+import inspect
+import math
+import time
+from bisect import bisect_left
+from pymongo import monitoring # type: ignore
+
+# In-process metrics rendered in the Prometheus text format by GET /metrics.
+# Bucket counts are preallocated and updated without locks. Updates from driver
+# threads may race with the event loop, an occasional lost increment is accepted.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # The last slot counts observations above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._children = {}
+
+    def labels(self, *labelvalues) -> _HistogramChild:
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children.setdefault(labelvalues, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labelvalues, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class Gauge:
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), collect=None):
+        # collect, when given, returns {labelvalues: value} at scrape time
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        samples = self.collect() if self.collect else {(): self.value}
+        for labelvalues, value in samples.items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+# Monotonic totals kept by other components, read through collect at scrape time
+class Counter(Gauge):
+    metric_type = 'counter'
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by router and route.', ('router', 'method', 'route', 'status')))
+http_requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served.'))
+model_operation_duration = registry.register(Histogram(
+    'mongo_model_operation_duration_seconds', 'Latency of model methods that call MongoDB.', ('model', 'method')))
+mongo_command_duration = registry.register(Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command round trip as measured by the driver.', ('command',)))
+mongo_pool_checkout_wait = registry.register(Histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time spent waiting to check a connection out of the driver pool.'))
+crypto_operation_duration = registry.register(Histogram(
+    'crypto_operation_duration_seconds', 'Key derivation and AES-GCM calls, including executor queueing.', ('function',)))
+
+def instrument_model(cls):
+    # Times every async method of a model class, labelled with the class and method name
+    for name, attribute in list(vars(cls).items()):
+        if isinstance(attribute, staticmethod) and inspect.iscoroutinefunction(attribute.__func__):
+            setattr(cls, name, staticmethod(_timed(cls.__name__, name, attribute.__func__)))
+    return cls
+
+def _timed(model: str, method: str, func):
+    histogram = model_operation_duration.labels(model, method)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started_at)
+    return wrapper
+
+class MongoCommandListener(monitoring.CommandListener):
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+
+    def connection_checked_out(self, event):
+        mongo_pool_checkout_wait.observe(event.duration)
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_wait.observe(event.duration)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
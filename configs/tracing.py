@@ -0,0 +1,63 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring # type: ignore
+
+# Stage timings of one request, shared by everything that runs in its context.
+# Motor copies the context into its executor threads, hence the lock.
+class TraceContext:
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, duration_ms: float):
+        with self._lock:
+            count, total = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (count + 1, total + duration_ms)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def timings(self) -> dict:
+        return {stage: {'count': count, 'duration_ms': round(total, 3)} for stage, (count, total) in self.stages.items()}
+
+    def server_timing(self) -> str:
+        # e.g. jwt;dur=0.041, mongo;dur=3.912;desc="2 calls", total;dur=5.204
+        entries = [
+            f'{stage};dur={total:.3f}' + (f';desc="{count} calls"' if count > 1 else '')
+            for stage, (count, total) in self.stages.items()
+        ]
+        entries.append(f'total;dur={self.elapsed_ms():.3f}')
+        return ', '.join(entries)
+
+trace_context_var: ContextVar[TraceContext] = ContextVar('trace_context', default=None)
+
+def record_stage(stage: str, duration_ms: float):
+    # Outside a request, e.g. in the wallet pool refill, there is nothing to record
+    trace_context = trace_context_var.get()
+    if trace_context is not None:
+        trace_context.add(stage, duration_ms)
+
+@contextmanager
+def span(stage: str):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, (time.perf_counter() - started_at) * 1000)
+
+# Times every MongoDB command with the driver's own round trip measurement
+class MongoTimingListener(monitoring.CommandListener):
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_stage('mongo', event.duration_micros / 1000)
+
+    def failed(self, event):
+        record_stage('mongo', event.duration_micros / 1000)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import tempfile
+import pytest
+from dotenv import load_dotenv
+
+# The suite runs against the memory storage backend, configured before the app is imported
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dev.env'))
+os.environ.update({
+    'APP_ENV': 'test',
+    'STORAGE_BACKEND': 'memory',
+    'LOG_FOLDER': tempfile.mkdtemp(prefix='ribbit-logs-'),
+    'SECRET_KEY': 'test-secret-key-0123456789abcdef',
+    'MASTER_KEY': 'test-master-key-0123456789abcdef',
+    'JWT_SECRET_KEY': 'test-jwt-secret-key',
+    'CRYPTO_EXECUTOR': 'thread',
+    'WALLET_POOL_HIGH_WATER': '5',
+    'WALLET_POOL_LOW_WATER': '2',
+})
+
+@pytest.fixture(scope='session')
+def loop():
+    # One event loop for the session, the app's background tasks and caches outlive a test
+    from app.main import app
+    event_loop = asyncio.new_event_loop()
+    event_loop.run_until_complete(app.router.startup())
+    yield event_loop
+    event_loop.run_until_complete(app.router.shutdown())
+    event_loop.close()
+
+@pytest.fixture(scope='session')
+def client(loop):
+    from app.main import app
+
+    def request(method: str, path: str, body=None, headers: dict = None, query: bytes = b''):
+        # Returns (status, headers, body) of one request sent straight to the ASGI app
+        return loop.run_until_complete(asgi_request(app, method, path, body, headers, query))
+    return request
+
+async def asgi_request(app, method: str, path: str, body=None, headers: dict = None, query: bytes = b''):
+    headers = dict(headers or {})
+    raw = json.dumps(body).encode() if body is not None else b''
+    if body is not None:
+        headers['content-type'] = 'application/json'
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        'server': ('testserver', 80), 'client': ('testclient', 50000)
+    }
+    sent, received = [], []
+
+    async def receive():
+        if received:
+            # Like a server, the second receive waits for a disconnect that never comes
+            await asyncio.Event().wait()
+        received.append(True)
+        return {'type': 'http.request', 'body': raw, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    response_headers = {k.decode(): v.decode() for k, v in sent[0]['headers']}
+    return sent[0]['status'], response_headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+@pytest.fixture
+def sign_up(client):
+    def sign_up_user(body: dict = None):
+        # Returns the Authorization header and the sign-up response of a new user
+        status, _, payload = client('PUT', '/users/signup', body or {'signup_method': 'wallet', 'wallet_name': 'Test Wallet'})
+        assert status == 200, payload
+        response = json.loads(payload)
+        return {'Authorization': f"Bearer {response['access_token']}"}, response
+    return sign_up_user
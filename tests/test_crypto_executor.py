@@ -0,0 +1,31 @@
+import logging
+import time
+from app.core.crypto_executor import CryptoExecutor
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_process_worker_logs_reach_the_parent(loop):
+    handler = RecordingHandler()
+    logging.getLogger().addHandler(handler)
+    executor = CryptoExecutor('process', 1, 4)
+    try:
+        wallet_address, _, _ = loop.run_until_complete(executor.generate_seed_wallet_address())
+        assert executor.kind == 'process'
+        # Worker records arrive through the log queue listener thread
+        deadline = time.monotonic() + 10
+        while not any(record.processName != 'MainProcess' for record in handler.records) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        executor.shutdown()
+        logging.getLogger().removeHandler(handler)
+
+    # The app's own wallet pool logs the same message from the main process
+    (record,) = [record for record in handler.records if record.getMessage() == 'Generated mnemonic phrase' and record.processName != 'MainProcess']
+    assert record.name == 'root' and record.levelno == logging.INFO
+    assert wallet_address.startswith('0x')
@@ -0,0 +1,78 @@
+import os
+import re
+from base64 import b64decode, b64encode
+from types import SimpleNamespace
+from bson import ObjectId
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.core.generate_seed_wallet_address import ENVELOPE_VERSION, decrypt_key, encrypt_key, is_legacy_envelope
+from app.migrations.envelope_v1 import migrate_collection
+from app.storage.memory import apply_update, matches
+
+def legacy_encrypt_key(plaintext: str) -> str:
+    # The format stored before the v1 envelope: base64(str({'ciphertext': ..., 'iv': ...}))
+    iv = os.urandom(12)
+    ciphertext = AESGCM(os.getenv('SECRET_KEY').encode()).encrypt(iv, plaintext.encode(), None)
+    return b64encode(str({'ciphertext': b64encode(ciphertext).decode(), 'iv': b64encode(iv).decode()}).encode()).decode()
+
+class FakeCursor:
+    def __init__(self, documents: list):
+        self.documents = documents
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    async def __aiter__(self):
+        for document in self.documents:
+            yield document
+
+class FakeCollection:
+    # The part of a motor collection the migration uses, over a list of documents
+    def __init__(self, name: str, documents: list):
+        self.name = name
+        self.documents = documents
+
+    def find(self, query: dict, projection: dict):
+        (field, condition), = query.items()
+        pattern = re.compile(condition['$regex'])
+        return FakeCursor([
+            {'_id': document['_id'], field: document[field]}
+            for document in self.documents if pattern.search(document.get(field, ''))
+        ])
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        modified = 0
+        for operation in operations:
+            for document in self.documents:
+                if matches(document, operation._filter):
+                    apply_update(document, operation._doc)
+                    modified += 1
+                    break
+        return SimpleNamespace(modified_count=modified)
+
+def test_legacy_value_decrypts_and_migrates(loop):
+    seed_phrase = 'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about'
+    legacy_value = legacy_encrypt_key(seed_phrase)
+    assert is_legacy_envelope(legacy_value)
+    assert decrypt_key(legacy_value) == seed_phrase
+
+    v1_value = encrypt_key('already migrated')
+    collection = FakeCollection('wallets', [
+        {'_id': ObjectId(), 'seed_phrase': legacy_value},
+        {'_id': ObjectId(), 'seed_phrase': v1_value},
+        {'_id': ObjectId(), 'seed_phrase': ''},
+    ])
+    assert loop.run_until_complete(migrate_collection(collection, 'seed_phrase', batch_size=1)) == 1
+
+    migrated, unchanged, empty = (document['seed_phrase'] for document in collection.documents)
+    assert not is_legacy_envelope(migrated)
+    assert b64decode(migrated)[0] == ENVELOPE_VERSION
+    assert decrypt_key(migrated) == seed_phrase
+    assert (unchanged, empty) == (v1_value, '')
+
+    # A second run finds nothing left to migrate
+    assert loop.run_until_complete(migrate_collection(collection, 'seed_phrase', batch_size=1)) == 0
+
+def test_v1_values_are_not_legacy():
+    # The migration selects documents by prefix, a v1 envelope must never match it
+    for _ in range(100):
+        assert not is_legacy_envelope(encrypt_key(os.urandom(16).hex()))
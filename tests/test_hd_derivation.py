@@ -0,0 +1,30 @@
+import pytest
+from eth_account import Account
+from app.core import hd_derivation
+
+MNEMONICS = [
+    'abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about',
+    hd_derivation.generate_mnemonic(),
+]
+
+# derive_accounts uses eth_account internals, it must keep matching the public API
+@pytest.mark.parametrize('mnemonic_phrase', MNEMONICS)
+def test_derive_accounts_matches_from_mnemonic(mnemonic_phrase):
+    derived = list(hd_derivation.derive_accounts(mnemonic_phrase, count=3))
+
+    assert [index for index, _ in derived] == [0, 1, 2]
+    for index, account in derived:
+        expected = Account.from_mnemonic(mnemonic_phrase, account_path=f"m/44'/60'/0'/0/{index}")
+        assert account.address == expected.address
+        assert account.key == expected.key
+
+def test_derive_accounts_from_start_index():
+    mnemonic_phrase = MNEMONICS[0]
+    (index, account), = hd_derivation.derive_accounts(mnemonic_phrase, count=1, start=2)
+
+    assert index == 2
+    assert account.address == Account.from_mnemonic(mnemonic_phrase, account_path="m/44'/60'/0'/0/2").address
+
+def test_derive_account_is_the_default_path():
+    mnemonic_phrase = MNEMONICS[0]
+    assert hd_derivation.derive_account(mnemonic_phrase).address == Account.from_mnemonic(mnemonic_phrase).address
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import uuid
+from app.core.idempotency import idempotency_store
+from app.storage.repositories import wallet_repository
+from tests.conftest import asgi_request
+
+def keyed(auth: dict, key: str) -> dict:
+    return dict(auth, **{'Idempotency-Key': key})
+
+def test_retry_replays_the_stored_response(client, sign_up):
+    auth, _ = sign_up()
+    key = str(uuid.uuid4())
+    wallets = len(wallet_repository)
+
+    status, headers, first = client('PUT', '/wallet', {'wallet_name': 'Once'}, keyed(auth, key))
+    assert status == 200 and 'idempotent-replayed' not in headers
+    status, headers, retried = client('PUT', '/wallet', {'wallet_name': 'Once'}, keyed(auth, key))
+    assert status == 200 and headers['idempotent-replayed'] == 'true'
+    assert retried == first
+    assert len(wallet_repository) == wallets + 1
+
+    # Another instance, or this one after a cache eviction, reads the response from the collection
+    idempotency_store.cache.clear()
+    status, headers, retried = client('PUT', '/wallet', {'wallet_name': 'Once'}, keyed(auth, key))
+    assert (status, headers['idempotent-replayed'], retried) == (200, 'true', first)
+    assert len(wallet_repository) == wallets + 1
+
+def test_key_reused_with_a_different_body(client, sign_up):
+    auth, _ = sign_up()
+    key = str(uuid.uuid4())
+    assert client('PUT', '/wallet', {'wallet_name': 'First'}, keyed(auth, key))[0] == 200
+    status, _, payload = client('PUT', '/wallet', {'wallet_name': 'Second'}, keyed(auth, key))
+    assert status == 422, payload
+
+def test_keys_are_scoped_to_the_user(client, sign_up):
+    key = str(uuid.uuid4())
+    first, _ = sign_up()
+    second, _ = sign_up()
+    assert client('PUT', '/wallet', {'wallet_name': 'Mine'}, keyed(first, key))[1].get('idempotent-replayed') is None
+    assert client('PUT', '/wallet', {'wallet_name': 'Mine'}, keyed(second, key))[1].get('idempotent-replayed') is None
+
+def test_invalid_key(client, sign_up):
+    auth, _ = sign_up()
+    assert client('PUT', '/wallet', {'wallet_name': 'Short'}, keyed(auth, 'short'))[0] == 400
+
+def test_concurrent_requests_with_the_same_key_run_once(loop, sign_up):
+    from app.main import app
+    auth, _ = sign_up()
+    key = str(uuid.uuid4())
+    wallets, shared = len(wallet_repository), idempotency_store.singleflight.shared
+
+    async def send_concurrently():
+        return await asyncio.gather(*(asgi_request(app, 'PUT', '/wallet', {'wallet_name': 'Concurrent'}, keyed(auth, key)) for _ in range(3)))
+    responses = loop.run_until_complete(send_concurrently())
+
+    assert [status for status, _, _ in responses] == [200] * 3
+    # The retries joined the running request instead of waiting for its stored response
+    assert idempotency_store.singleflight.shared == shared + 2
+    assert len({body for _, _, body in responses}) == 1
+    assert sorted(headers.get('idempotent-replayed', '') for _, headers, _ in responses) == ['', 'true', 'true']
+    assert len(wallet_repository) == wallets + 1
+
+def test_sign_up_retry_returns_the_same_user(client):
+    key = str(uuid.uuid4())
+    body = {'signup_method': 'wallet', 'wallet_name': 'Retried'}
+    first = client('PUT', '/users/signup', body, {'Idempotency-Key': key})
+    retried = client('PUT', '/users/signup', body, {'Idempotency-Key': key})
+    assert first[0] == retried[0] == 200
+    assert json.loads(first[2]) == json.loads(retried[2])
+    assert retried[1]['idempotent-replayed'] == 'true'
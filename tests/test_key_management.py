@@ -0,0 +1,77 @@
+import json
+import uuid
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from eth_account import Account
+from app.core import key_management
+from app.core.crypto_executor import crypto_executor
+from app.core.key_management import key_manager, rotate_master_key, unwrap_data_key
+from app.models.data_keys import DataKeyModel
+from app.storage.repositories import data_keys_repository, key_rotation_jobs_repository, private_keys_repository
+
+def test_sign_up_without_data_key_cache(client, sign_up, loop, monkeypatch):
+    from app.core.generate_seed_wallet_address import encrypt_key
+    # With the cache disabled the uncommitted data key is only reachable through the sign-up itself
+    monkeypatch.setattr(key_manager.cache, 'maxsize', 0)
+    key_manager.cache.clear()
+    private_key = '0x' + uuid.uuid4().hex + uuid.uuid4().hex
+    auth, response = sign_up({'signup_method': 'private_key_import', 'private_key': encrypt_key(private_key)})
+
+    userid = json.loads(client('GET', '/users/me', headers=auth)[2])['userid']
+    assert loop.run_until_complete(data_keys_repository.count({'userid': userid})) == 1
+    stored = loop.run_until_complete(private_keys_repository.find_one({'userid': userid}))
+    data_key = loop.run_until_complete(key_manager.get_data_key(userid))
+    assert loop.run_until_complete(crypto_executor.decrypt_key(stored['private_key'], data_key)) == private_key
+    assert response['wallets'][0]['wallet_address'] == Account.from_key(private_key).address
+
+def test_rotate_master_key_resumes_from_job(sign_up, loop, monkeypatch):
+    for _ in range(3):
+        sign_up()
+    records = loop.run_until_complete(data_keys_repository.find({}))
+    data_keys = {record['userid']: unwrap_data_key(record['wrapped_key']) for record in records}
+
+    # A new master key replaces the current one, which is kept to unwrap until the rotation completes
+    kek_id = key_management.MASTER_KEY_ID
+    master_keys = dict(key_management.get_master_keys())
+    master_keys[kek_id + 1] = AESGCM(b'test-master-key-2-0123456789abcd')
+    monkeypatch.setattr(key_management, '_master_keys', master_keys)
+    monkeypatch.setattr(key_management, 'MASTER_KEY_ID', kek_id + 1)
+    job_id = f'rotate-{uuid.uuid4()}'
+
+    # The first run is interrupted after its first batch
+    bulk_update = DataKeyModel.bulk_update
+    calls = []
+    async def interrupt(operations):
+        calls.append(operations)
+        if len(calls) > 1:
+            raise ConnectionError('connection reset')
+        return await bulk_update(operations)
+    monkeypatch.setattr(DataKeyModel, 'bulk_update', interrupt)
+    try:
+        loop.run_until_complete(rotate_master_key(batch_size=2, job_id=job_id))
+        assert False, 'The rotation was not interrupted'
+    except ConnectionError:
+        pass
+    job = loop.run_until_complete(key_rotation_jobs_repository.find_one({'_id': job_id}))
+    assert (job['status'], job['rewrapped'], job['total']) == ('running', 2, len(records))
+
+    # The second run continues after the last re-wrapped data key
+    monkeypatch.setattr(DataKeyModel, 'bulk_update', bulk_update)
+    get_batch_not_wrapped_with = DataKeyModel.get_batch_not_wrapped_with
+    after_ids = []
+    async def record_batch(kek_id, after_id=None, limit=500):
+        after_ids.append(after_id)
+        return await get_batch_not_wrapped_with(kek_id, after_id, limit)
+    monkeypatch.setattr(DataKeyModel, 'get_batch_not_wrapped_with', record_batch)
+    assert loop.run_until_complete(rotate_master_key(batch_size=2, job_id=job_id)) == len(records)
+    assert after_ids[0] == job['last_id']
+
+    job = loop.run_until_complete(key_rotation_jobs_repository.find_one({'_id': job_id}))
+    assert job['status'] == 'completed'
+    records = loop.run_until_complete(data_keys_repository.find({}))
+    assert {record['kek_id'] for record in records} == {kek_id + 1}
+    # Data keys are only re-wrapped, every user keeps the same data key
+    assert {record['userid']: unwrap_data_key(record['wrapped_key']) for record in records} == data_keys
+
+    # Later tests run with the original master key again
+    monkeypatch.setattr(key_management, 'MASTER_KEY_ID', kek_id)
+    assert loop.run_until_complete(rotate_master_key(job_id=f'rotate-{uuid.uuid4()}')) == len(records)
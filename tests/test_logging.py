@@ -0,0 +1,106 @@
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import pytest
+from configs.log_handlers import BoundedQueueHandler, CompressingTimedRotatingFileHandler
+from configs.logging_fitlers import MASK, LazyLogData, MaskingEngine, resolve_log_data
+
+PROFILE = {'email_address': 'private@example.com', 'first_name': 'Firstname-0001', 'phone_unique_id': 'phone-0001'}
+
+def test_sign_up_logs_no_personal_data(client, sign_up, caplog):
+    social_id = f'social-{uuid.uuid4()}'
+    social = dict(PROFILE, signup_method='social', social_platform='gmail', social_id=social_id)
+    with caplog.at_level(logging.INFO):
+        sign_up(social)
+        sign_up(social)
+        sign_up(dict(PROFILE, signup_method='wallet', wallet_name='Test Wallet'))
+
+    logged = [str(resolve_log_data(record)) for record in caplog.records]
+    assert any('userid' in log_data for log_data in logged)
+    for value in list(PROFILE.values()) + [social_id]:
+        assert not [log_data for log_data in logged if value in log_data], value
+
+def test_masking_params_cover_personal_data():
+    # dev.env is loaded by conftest.py
+    engine = MaskingEngine.from_env()
+    masked = engine.mask({'userid': 'user-1', 'email_address': 'private@example.com', 'social_id': 'social-1', 'phone_unique_id': 'phone-1'})
+    assert masked == {'userid': 'user-1', 'email_address': MASK, 'social_id': MASK, 'phone_unique_id': MASK}
+    assert 'private@example.com' not in engine.mask_string(str({'email_address': 'private@example.com'}))
+
+def make_record(message: str, log_data=None) -> logging.LogRecord:
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, message, None, None)
+    record.log_data = log_data
+    return record
+
+def test_queue_handler_drops_records_when_full():
+    log_queue = queue.Queue(maxsize=1)
+    handler = BoundedQueueHandler(log_queue, 'drop')
+    handler.handle(make_record('kept'))
+    handler.handle(make_record('dropped'))
+
+    assert handler.dropped == 1
+    assert log_queue.get_nowait().getMessage() == 'kept'
+    assert log_queue.empty()
+
+def test_queue_handler_blocks_until_space_or_timeout():
+    log_queue = queue.Queue(maxsize=1)
+    handler = BoundedQueueHandler(log_queue, 'block', block_timeout=0.05)
+    handler.handle(make_record('first'))
+
+    # Nothing is consumed, the record is dropped once the timeout passes
+    started_at = time.monotonic()
+    handler.handle(make_record('timed out'))
+    assert time.monotonic() - started_at >= 0.05
+    assert handler.dropped == 1
+
+    # A consumer frees a slot within the timeout, the record waits for it
+    handler.block_timeout = 5
+    consumer = threading.Timer(0.05, log_queue.get)
+    consumer.start()
+    handler.handle(make_record('second'))
+    consumer.join()
+    assert handler.dropped == 1
+    assert log_queue.get_nowait().getMessage() == 'second'
+
+def test_queue_handler_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(), 'discard')
+
+def test_queue_handler_resolves_lazy_log_data_on_the_caller():
+    log_queue = queue.Queue()
+    user = {'userid': 'user-1'}
+    BoundedQueueHandler(log_queue).handle(make_record('lazy', LazyLogData(dict, user)))
+    user['userid'] = 'changed'
+    assert log_queue.get_nowait().log_data == {'userid': 'user-1'}
+
+def test_rotated_files_are_compressed(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = CompressingTimedRotatingFileHandler(str(path), when='midnight', backupCount=2)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        for day in range(4):
+            handler.handle(make_record(f'day {day}'))
+            # Rotated names are unique per rollover, like the dated names of app.main's namer
+            handler.namer = lambda name, day=day: f'{path}.{day}'
+            handler.doRollover()
+    finally:
+        handler.close()
+
+    # close() waits for the compressor, only the newest backupCount files are kept
+    assert sorted(os.listdir(tmp_path)) == ['app.log', 'app.log.2.gz', 'app.log.3.gz']
+    with gzip.open(tmp_path / 'app.log.3.gz', 'rt') as rotated:
+        assert rotated.read() == 'day 3\n'
+
+def test_file_being_compressed_counts_as_one_backup(tmp_path):
+    path = tmp_path / 'app.log'
+    for name in ('app.log.0.gz', 'app.log.1.gz', 'app.log.2', 'app.log.2.gz'):
+        (tmp_path / name).write_bytes(b'')
+    handler = CompressingTimedRotatingFileHandler(str(path), when='midnight', backupCount=2)
+    try:
+        assert handler.getFilesToDelete() == [str(tmp_path / 'app.log.0.gz')]
+    finally:
+        handler.close()
@@ -0,0 +1,28 @@
+import re
+import uuid
+
+LABELS_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def request_duration_labels(client) -> list:
+    status, _, payload = client('GET', '/metrics')
+    assert status == 200
+    return [
+        dict(LABELS_PATTERN.findall(line[line.index('{') + 1:line.rindex('}')]))
+        for line in payload.decode().splitlines() if line.startswith('http_request_duration_seconds_count{')
+    ]
+
+def test_metrics_are_labelled_with_route_templates(client, sign_up):
+    from app.main import app
+    auth, response = sign_up()
+    wallet_address = response['wallets'][0]['wallet_address']
+    assert client('GET', '/users/me', headers=auth)[0] == 200
+    assert client('PATCH', f'/wallet/{wallet_address}', {'wallet_name': 'Labelled'}, auth)[0] == 200
+    assert client('GET', f'/no-such-route/{uuid.uuid4()}')[0] == 404
+
+    labels = request_duration_labels(client)
+    routes = {label['route'] for label in labels}
+    assert {'/users/me', '/wallet/{wallet_id}', 'unmatched'} <= routes
+    # Paths with ids, addresses or unknown segments never become label values
+    assert routes <= {route.path for route in app.routes} | {'unmatched'}
+    assert {'router': 'users', 'method': 'GET', 'route': '/users/me', 'status': '200'} in labels
+    assert {'router': 'wallet', 'method': 'PATCH', 'route': '/wallet/{wallet_id}', 'status': '200'} in labels
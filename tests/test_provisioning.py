@@ -0,0 +1,68 @@
+import json
+import uuid
+from eth_account import Account
+from app.core.crypto_executor import crypto_executor
+from app.core.key_management import key_manager
+from app.services.provisioning_service import PROVISION_NAMESPACE, provision_users
+from app.storage.repositories import private_keys_repository, wallet_repository
+
+def test_replayed_batch_restores_private_keys(loop, monkeypatch):
+    from app.core.generate_seed_wallet_address import encrypt_key
+    from app.core.hd_derivation import generate_mnemonic
+    job_id = f'job-{uuid.uuid4()}'
+    lines = [
+        {'signup_method': 'wallet', 'wallet_name': 'Provisioned'},
+        {'signup_method': 'seed_import', 'seed_phrase': encrypt_key(generate_mnemonic())},
+        {'signup_method': 'private_key_import', 'private_key': encrypt_key('0x' + uuid.uuid4().hex + uuid.uuid4().hex)},
+    ]
+
+    async def chunks():
+        yield b'\n'.join(json.dumps(line).encode() for line in lines)
+
+    # The first attempt stops after the wallets, before their private keys
+    bulk_write = private_keys_repository.bulk_write
+    async def fail_once(*args, **kwargs):
+        monkeypatch.setattr(private_keys_repository, 'bulk_write', bulk_write)
+        raise ConnectionError('connection reset')
+    monkeypatch.setattr(private_keys_repository, 'bulk_write', fail_once)
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+
+    job = loop.run_until_complete(provision_users(chunks(), job_id))
+    assert job['status'] == 'failed'
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets + 3, private_keys)
+
+    job = loop.run_until_complete(provision_users(chunks(), job_id))
+    assert job['status'] == 'completed' and job['created'] == 3, job
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets + 3, private_keys + 3)
+
+    async def stored_key_address(userid: str):
+        private_key = await private_keys_repository.find_one({'userid': userid})
+        return Account.from_key(await crypto_executor.decrypt_key(private_key['private_key'], await key_manager.get_data_key(userid))).address
+
+    # Every wallet has exactly the private key of its own address
+    for line_number in range(1, len(lines) + 1):
+        userid = str(uuid.uuid5(PROVISION_NAMESPACE, f'{job_id}:{line_number}'))
+        (wallet,) = loop.run_until_complete(wallet_repository.find({'userid': userid}))
+        assert loop.run_until_complete(private_keys_repository.count({'userid': userid})) == 1
+        assert loop.run_until_complete(stored_key_address(userid)) == wallet['wallet_address']
+
+def test_crypto_failures_fail_the_batch_instead_of_rejecting_lines(loop, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+    from app.core.generate_seed_wallet_address import encrypt_key
+    lines = [
+        {'signup_method': 'private_key_import', 'private_key': encrypt_key('0x' + uuid.uuid4().hex + uuid.uuid4().hex)},
+        {'signup_method': 'private_key_import', 'private_key': 'not base64!'},
+    ]
+
+    async def chunks():
+        yield b'\n'.join(json.dumps(line).encode() for line in lines)
+
+    job = loop.run_until_complete(provision_users(chunks(), f'job-{uuid.uuid4()}'))
+    assert (job['status'], job['created'], job['invalid']) == ('completed', 1, 1), job
+
+    async def broken(*args, **kwargs):
+        raise BrokenProcessPool('A child process terminated abruptly')
+    monkeypatch.setattr(crypto_executor, 'run', broken)
+    job = loop.run_until_complete(provision_users(chunks(), f'job-{uuid.uuid4()}'))
+    # The failed job is resumed by a replay, none of its lines are reported as invalid
+    assert (job['status'], job['created'], job['invalid']) == ('failed', 0, 0), job
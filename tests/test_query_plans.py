@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import uuid
+import pytest
+from app.storage.memory import MemoryRepository
+from configs.indexes import INDEXES, MODEL_QUERIES, check_query_plans, ensure_indexes, query_shape
+
+# A MongoDB to run the query plan check against, e.g. mongodb://localhost:27017 in CI
+TEST_MONGO_URI = os.getenv('TEST_MONGO_URI')
+
+@pytest.fixture
+def issued_queries(monkeypatch):
+    # Records (collection, filter shape, sort) of every query the memory engine serves
+    queries = set()
+    candidates, sorted_documents = MemoryRepository._candidates, MemoryRepository._sorted
+
+    def record_candidates(self, query):
+        queries.add((self.name, query_shape(query), None))
+        return candidates(self, query)
+
+    def record_sorted(self, query, sort=None):
+        if sort:
+            queries.add((self.name, query_shape(query), tuple(sort)))
+        return sorted_documents(self, query, sort)
+
+    monkeypatch.setattr(MemoryRepository, '_candidates', record_candidates)
+    monkeypatch.setattr(MemoryRepository, '_sorted', record_sorted)
+    return queries
+
+def exercise_models(client, sign_up, loop):
+    # Sends every request type and runs the jobs, so each model query is issued at least once
+    from app.core.generate_seed_wallet_address import encrypt_key
+    from app.core.hd_derivation import generate_mnemonic
+    from app.core.key_management import rotate_master_key
+    from app.services.provisioning_service import provision_users
+
+    seed_phrase = encrypt_key(generate_mnemonic())
+    private_key = encrypt_key('0x' + uuid.uuid4().hex + uuid.uuid4().hex)
+    social = {'signup_method': 'social', 'social_platform': 'gmail', 'social_id': f'social-{uuid.uuid4()}'}
+    sign_up(social)
+    sign_up(social)
+    sign_up({'signup_method': 'seed_import', 'seed_phrase': seed_phrase})
+    auth, response = sign_up({'signup_method': 'seed_import', 'seed_phrase': seed_phrase})
+    wallet_address = response['wallets'][0]['wallet_address']
+
+    def send(method: str, path: str, body=None, headers: dict = None, query: bytes = b''):
+        status, _, payload = client(method, path, body, headers or auth, query)
+        assert status == 200, (method, path, payload)
+        return payload
+
+    send('PUT', '/wallet', {'wallet_name': 'Second'}, dict(auth, **{'Idempotency-Key': str(uuid.uuid4())}))
+    send('POST', '/wallet/import', {'private_key': private_key, 'network': 'supra'})
+    send('POST', '/wallet/import/batch', {'wallets': [{'private_key': private_key, 'network': 'supra'}, {'seed_phrase': seed_phrase}]})
+    send('PUT', f'/wallet/{wallet_address}/accounts', {'count': 2})
+    page = json.loads(send('GET', '/wallet', query=b'limit=1'))
+    send('GET', '/wallet', query=f"limit=1&cursor={page['next_cursor']}".encode())
+    send('GET', '/wallet/export')
+    send('PATCH', f'/wallet/{wallet_address}', {'wallet_name': 'Renamed'})
+    send('DELETE', f'/wallet/{wallet_address}')
+    send('GET', '/users/me')
+
+    async def chunks():
+        yield json.dumps({'signup_method': 'wallet', 'wallet_name': 'Provisioned'}).encode() + b'\n'
+        yield json.dumps(dict(social, signup_method='social')).encode() + b'\n'
+        yield json.dumps({'signup_method': 'private_key_import', 'private_key': private_key}).encode() + b'\n'
+    job = loop.run_until_complete(provision_users(chunks(), f'job-{uuid.uuid4()}'))
+    assert job['status'] == 'completed' and not job['errors'], job
+    loop.run_until_complete(rotate_master_key())
+
+def test_model_queries_are_registered(client, sign_up, loop, issued_queries):
+    exercise_models(client, sign_up, loop)
+
+    registered = {(collection, query_shape(query), tuple(sort) if sort else None) for collection, query, sort in MODEL_QUERIES}
+    registered_filters = {(collection, shape) for collection, shape, _ in registered}
+    missing = [
+        query for query in issued_queries
+        if (query[2] is None and query[:2] not in registered_filters) or (query[2] is not None and query not in registered)
+    ]
+    assert issued_queries
+    assert not missing, f'Queries missing from configs.indexes.MODEL_QUERIES: {missing}'
+
+def test_model_query_collections_have_indexes():
+    # _id lookups aside, every registered collection needs its own indexes
+    for collection, query, _ in MODEL_QUERIES:
+        assert collection in INDEXES or set(query) <= {'_id', '$or'}, collection
+
+@pytest.mark.skipif(not TEST_MONGO_URI, reason='TEST_MONGO_URI is not set')
+def test_model_queries_use_indexes(loop):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def check():
+        client = AsyncIOMotorClient(TEST_MONGO_URI, serverSelectionTimeoutMS=5000)
+        database = client.get_database(f'ribbit_test_{uuid.uuid4().hex[:8]}')
+        try:
+            await ensure_indexes(database)
+            # Raises RuntimeError listing every query planned as a collection scan
+            await check_query_plans(database)
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+    loop.run_until_complete(asyncio.wait_for(check(), 60))
@@ -0,0 +1,70 @@
+import time
+from datetime import datetime, timedelta
+import jwt
+from app.common import cache
+from app.common.cache import TTLCache
+from app.core import token_cache as token_cache_module
+from app.core.jwt_handler import PRIVATE_KEY
+from app.core.token_cache import TokenCache
+
+def issue_token(userid: str, expires_in: float) -> str:
+    token = jwt.encode({'sub': userid, 'user_type': 'user', 'exp': datetime.utcnow() + timedelta(seconds=expires_in)}, PRIVATE_KEY, algorithm='HS256')
+    # PyJWT 1.x returns bytes
+    return token.decode() if isinstance(token, bytes) else token
+
+def counting_decode(monkeypatch) -> list:
+    decoded = []
+    decode_jwt_token = token_cache_module.decode_jwt_token
+    def decode(token: str):
+        decoded.append(token)
+        return decode_jwt_token(token)
+    monkeypatch.setattr(token_cache_module, 'decode_jwt_token', decode)
+    return decoded
+
+def test_verified_claims_are_cached(monkeypatch):
+    decoded = counting_decode(monkeypatch)
+    token_cache = TokenCache(TTLCache(10, 3600))
+    token = issue_token('cached-user', 600)
+
+    assert token_cache.verify(token)['sub'] == 'cached-user'
+    assert token_cache.verify(token)['sub'] == 'cached-user'
+    assert decoded == [token]
+    assert token_cache.metrics()['hits'] == 1
+    # Invalid tokens are not cached
+    assert token_cache.verify(token + 'x') is None
+    assert token_cache.verify(token + 'x') is None
+    assert len(decoded) == 3
+
+def test_cached_claims_expire_with_the_token(monkeypatch):
+    token_cache = TokenCache(TTLCache(10, 3600))
+    token = issue_token('expiring-user', 60)
+    assert token_cache.verify(token)
+    key = token_cache._digest(token)
+    assert token_cache.cache.get(key)
+
+    # The entry is evicted at the token's exp, not at the cache TTL
+    now = time.monotonic()
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now + 61)
+    assert token_cache.cache.get(key) is None
+
+def test_revoked_token_is_rejected_on_cache_hit():
+    token_cache = TokenCache(TTLCache(10, 3600))
+    token, other = issue_token('revoked-user', 600), issue_token('other-user', 600)
+    claims = token_cache.verify(token)
+    assert token_cache.verify(other)
+
+    token_cache.revoke(token, claims['exp'])
+    assert token_cache.verify(token) is None
+    assert token_cache.verify(other)['sub'] == 'other-user'
+    assert token_cache.metrics()['revoked'] == 1
+
+def test_logout_revokes_the_token(client, sign_up):
+    auth, _ = sign_up()
+    other, _ = sign_up()
+    assert client('GET', '/users/me', headers=auth)[0] == 200
+
+    status, _, payload = client('POST', '/users/logout', headers=auth)
+    assert status == 200, payload
+    assert client('GET', '/users/me', headers=auth)[0] == 401
+    assert client('POST', '/users/logout', headers=auth)[0] == 401
+    assert client('GET', '/users/me', headers=other)[0] == 200
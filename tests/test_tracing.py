@@ -0,0 +1,26 @@
+import re
+import uuid
+from configs.tracing import TraceContext
+
+def test_trace_id_is_reused_or_generated(client):
+    trace_id = f'trace-{uuid.uuid4()}'
+    assert client('GET', '/metrics', headers={'X-Trace-Id': trace_id})[1]['x-trace-id'] == trace_id
+
+    for headers in ({}, {'X-Trace-Id': 'not a "header safe" id'}, {'X-Trace-Id': 'x' * 129}):
+        generated = client('GET', '/metrics', headers=headers)[1]['x-trace-id']
+        assert str(uuid.UUID(generated)) == generated
+
+def test_server_timing_reports_request_stages(client, sign_up):
+    auth, _ = sign_up()
+    status, headers, _ = client('PUT', '/wallet', {'wallet_name': 'Timed'}, auth)
+    assert status == 200
+    stages = dict(entry.split(';dur=', 1) for entry in (entry.split(';desc=')[0] for entry in headers['server-timing'].split(', ')))
+    assert {'jwt', 'encrypt', 'total'} <= set(stages)
+    assert all(float(duration) >= 0 for duration in stages.values())
+
+def test_server_timing_format():
+    trace_context = TraceContext('trace')
+    trace_context.add('mongo', 1.5)
+    trace_context.add('mongo', 2.0)
+    trace_context.add('jwt', 0.25)
+    assert re.fullmatch(r'mongo;dur=3\.500;desc="2 calls", jwt;dur=0\.250, total;dur=\d+\.\d{3}', trace_context.server_timing())
@@ -0,0 +1,79 @@
+import pytest
+from pymongo.errors import PyMongoError
+from app.models import unit_of_work
+from app.models.unit_of_work import UnitOfWork
+from app.storage.memory import MemoryRepository
+
+class FakeSession:
+    # Applies the writes immediately, a transaction is only simulated by the commit calls
+    def __init__(self, commit_errors: list):
+        self.commit_errors = commit_errors
+        self.started = 0
+        self.commits = 0
+        self.aborts = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def start_transaction(self):
+        self.started += 1
+
+    async def commit_transaction(self):
+        self.commits += 1
+        if self.commit_errors:
+            raise self.commit_errors.pop(0)
+
+    async def abort_transaction(self):
+        self.aborts += 1
+
+class FakeClient:
+    def __init__(self, session: FakeSession):
+        self.session = session
+
+    async def start_session(self):
+        return self.session
+
+@pytest.fixture
+def transaction_session(monkeypatch):
+    def use_session(commit_errors: list):
+        session = FakeSession(commit_errors)
+        monkeypatch.setattr(unit_of_work, 'client', FakeClient(session))
+        monkeypatch.setattr(UnitOfWork, 'write_mode', 'transaction')
+        return session
+    return use_session
+
+def counter_unit_of_work(repository: MemoryRepository) -> UnitOfWork:
+    uow = UnitOfWork()
+    uow.update_one(repository, {'_id': 'user'}, {'$inc': {'wallet_count': 1}})
+    return uow
+
+def test_unknown_commit_result_retries_only_the_commit(loop, transaction_session):
+    repository = MemoryRepository('users')
+    loop.run_until_complete(repository.insert_one({'_id': 'user', 'wallet_count': 0}))
+    session = transaction_session([PyMongoError('commit result unknown', error_labels=['UnknownTransactionCommitResult'])])
+
+    loop.run_until_complete(counter_unit_of_work(repository).commit())
+
+    assert (session.started, session.commits) == (1, 2)
+    assert loop.run_until_complete(repository.find_one({'_id': 'user'}))['wallet_count'] == 1
+
+def test_transient_error_runs_the_transaction_again(loop, transaction_session):
+    repository = MemoryRepository('users')
+    loop.run_until_complete(repository.insert_one({'_id': 'user', 'wallet_count': 0}))
+    session = transaction_session([PyMongoError('transaction aborted', error_labels=['TransientTransactionError'])])
+
+    loop.run_until_complete(counter_unit_of_work(repository).commit())
+
+    assert (session.started, session.commits) == (2, 2)
+
+def test_other_errors_are_not_retried(loop, transaction_session):
+    repository = MemoryRepository('users')
+    loop.run_until_complete(repository.insert_one({'_id': 'user', 'wallet_count': 0}))
+    session = transaction_session([PyMongoError('write conflict')])
+
+    with pytest.raises(PyMongoError):
+        loop.run_until_complete(counter_unit_of_work(repository).commit())
+    assert (session.started, session.commits) == (1, 1)
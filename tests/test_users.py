@@ -0,0 +1,21 @@
+import uuid
+from app.models.unit_of_work import UnitOfWork
+from app.storage.repositories import user_repository
+
+def test_returning_social_sign_up_only_sets_client_fields(client, sign_up, monkeypatch):
+    social = {'signup_method': 'social', 'social_platform': 'gmail', 'social_id': f'social-{uuid.uuid4()}'}
+    auth, _ = sign_up(social)
+    assert client('PUT', '/wallet', {'wallet_name': 'Second'}, auth)[0] == 200
+
+    updates = []
+    update_one = UnitOfWork.update_one
+    def record_update(self, repository, query, update):
+        if repository is user_repository:
+            updates.append(update)
+        update_one(self, repository, query, update)
+    monkeypatch.setattr(UnitOfWork, 'update_one', record_update)
+
+    sign_up(dict(social, email_address='returning@example.com'))
+
+    (user_update,) = updates
+    assert set(user_update['$set']) == {'email_address', 'updated_at'}
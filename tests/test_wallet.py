@@ -0,0 +1,192 @@
+import json
+import uuid
+from app.storage.repositories import private_keys_repository, wallet_repository
+
+def wallet_list(client, auth: dict):
+    status, _, payload = client('GET', '/wallet', headers=auth, query=b'limit=100')
+    assert status == 200, payload
+    return json.loads(payload)
+
+def test_add_wallet_accounts_writes_new_accounts_once(client, sign_up):
+    auth, response = sign_up()
+    wallet_address = response['wallets'][0]['wallet_address']
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+
+    status, _, payload = client('PUT', f'/wallet/{wallet_address}/accounts', {'count': 3}, auth)
+    assert status == 200, payload
+    accounts = json.loads(payload)['wallets']
+    # Account 0 is the sign-up wallet itself
+    assert accounts[0]['wallet_address'] == wallet_address
+    assert len({account['wallet_address'] for account in accounts}) == 3
+    assert len(wallet_repository) == wallets + 2
+    assert len(private_keys_repository) == private_keys + 2
+
+    status, _, payload = client('PUT', f'/wallet/{wallet_address}/accounts', {'count': 3}, auth)
+    assert status == 200, payload
+    assert [account['wallet_address'] for account in json.loads(payload)['wallets']] == [account['wallet_address'] for account in accounts]
+    assert len(wallet_repository) == wallets + 2
+
+    page = wallet_list(client, auth)
+    assert page['total_count'] == len(page['wallets']) == 3
+
+def test_add_wallet_accounts_unknown_wallet(client, sign_up):
+    auth, _ = sign_up()
+    status, _, _ = client('PUT', '/wallet/0x0000000000000000000000000000000000000000/accounts', {'count': 2}, auth)
+    assert status == 404
+
+def test_import_wallet_owned_by_another_account(client, sign_up):
+    from app.core.generate_seed_wallet_address import encrypt_key
+    private_key = encrypt_key('0x' + '21' * 32)
+    owner, _ = sign_up()
+    status, _, payload = client('POST', '/wallet/import', {'private_key': private_key, 'network': 'supra'}, owner)
+    assert status == 200, payload
+    wallet_address = json.loads(payload)['wallet']['wallet_address']
+
+    auth, _ = sign_up()
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+    status, _, payload = client('POST', '/wallet/import', {'private_key': private_key, 'network': 'supra'}, auth)
+    assert status == 409, payload
+    assert b'E11000' not in payload
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets, private_keys)
+    assert [wallet['wallet_address'] for wallet in wallet_list(client, owner)['wallets']].count(wallet_address) == 1
+
+def test_import_wallet_race_leaves_no_orphan_key(client, sign_up, loop, monkeypatch):
+    from app.core.generate_seed_wallet_address import encrypt_key
+    from app.models.wallet import WalletModel
+    from app.schemas.wallet import WalletImportPrivateKeyRequest
+    from app.services.wallet_service import import_wallet
+    from fastapi import HTTPException
+    private_key = encrypt_key('0x' + '22' * 32)
+    owner, _ = sign_up()
+    status, _, payload = client('POST', '/wallet/import', {'private_key': private_key, 'network': 'supra'}, owner)
+    assert status == 200, payload
+
+    # The other import commits between this request's lookup and its insert
+    async def lookup_before_race(wallet_address):
+        return None
+    monkeypatch.setattr(WalletModel, 'get_wallet_by_address', lookup_before_race)
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+    try:
+        loop.run_until_complete(import_wallet('racing-user', WalletImportPrivateKeyRequest(private_key=private_key, network='supra')))
+        assert False, 'The duplicate import was accepted'
+    except HTTPException as e:
+        assert e.status_code == 409
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets, private_keys)
+
+def test_wallet_count_of_user_created_before_the_counter(client, sign_up, loop):
+    from app.models.users import user_cache
+    from app.storage.repositories import user_repository
+    auth, _ = sign_up()
+    assert client('PUT', '/wallet', {'wallet_name': 'Second'}, auth)[0] == 200
+    userid = json.loads(client('GET', '/users/me', headers=auth)[2])['userid']
+    # Users created before wallet_count existed have no counter
+    loop.run_until_complete(user_repository.update_one({'userid': userid}, {'$unset': {'wallet_count': ''}}))
+    user_cache.pop(userid)
+
+    assert client('PUT', '/wallet', {'wallet_name': 'Third'}, auth)[0] == 200
+    page = wallet_list(client, auth)
+    assert page['total_count'] == len(page['wallets']) == 3
+
+    assert client('PUT', '/wallet', {'wallet_name': 'Fourth'}, auth)[0] == 200
+    page = wallet_list(client, auth)
+    assert page['total_count'] == len(page['wallets']) == 4
+
+def import_batch(client, auth: dict, items: list):
+    status, _, payload = client('POST', '/wallet/import/batch', {'wallets': items}, auth)
+    assert status == 200, payload
+    return json.loads(payload)['results']
+
+def private_key_items(count: int):
+    from app.core.generate_seed_wallet_address import encrypt_key
+    return [{'private_key': encrypt_key('0x' + uuid.uuid4().hex + uuid.uuid4().hex), 'network': 'supra'} for _ in range(count)]
+
+def test_import_batch_with_wallet_owned_by_another_account(client, sign_up):
+    owned, first, second = private_key_items(3)
+    owner, _ = sign_up()
+    assert import_batch(client, owner, [owned])[0]['status'] == 'imported'
+
+    auth, _ = sign_up()
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+    results = import_batch(client, auth, [first, owned, second, owned])
+
+    assert [result['status'] for result in results] == ['imported', 'conflict', 'imported', 'conflict']
+    assert 'wallet' not in results[1] and results[1]['detail']
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets + 2, private_keys + 2)
+    page = wallet_list(client, auth)
+    assert page['total_count'] == len(page['wallets']) == 3
+    assert wallet_list(client, owner)['total_count'] == 2
+
+def test_import_batch_conflict_after_the_check(client, sign_up, monkeypatch):
+    from app.models.wallet import WalletModel
+    owned, own, first, second = private_key_items(4)
+    owner, _ = sign_up()
+    auth, _ = sign_up()
+    assert import_batch(client, owner, [owned])[0]['status'] == 'imported'
+    assert import_batch(client, auth, [own])[0]['status'] == 'imported'
+
+    # Both addresses are written by other requests between the duplicate check and the commit
+    get_wallets_by_address_list = WalletModel.get_wallets_by_address_list
+    checks = []
+    async def check_before_race(wallet_addresses):
+        checks.append(wallet_addresses)
+        return [] if len(checks) == 1 else await get_wallets_by_address_list(wallet_addresses)
+    monkeypatch.setattr(WalletModel, 'get_wallets_by_address_list', check_before_race)
+    wallets, private_keys = len(wallet_repository), len(private_keys_repository)
+    results = import_batch(client, auth, [first, owned, own, second])
+
+    assert [result['status'] for result in results] == ['imported', 'conflict', 'existing', 'imported']
+    assert (len(wallet_repository), len(private_keys_repository)) == (wallets + 2, private_keys + 2)
+    page = wallet_list(client, auth)
+    assert page['total_count'] == len(page['wallets']) == 4
+
+def test_csv_export_serializes_each_wallet_once(client, sign_up, monkeypatch):
+    import csv
+    from app.common import serializers
+    auth, _ = sign_up()
+    assert client('PUT', '/wallet', {'wallet_name': 'Second'}, auth)[0] == 200
+
+    calls = []
+    wallet_response = serializers.wallet_response
+    def record_wallet_response(wallet):
+        calls.append(wallet['wallet_address'])
+        return wallet_response(wallet)
+    monkeypatch.setattr(serializers, 'wallet_response', record_wallet_response)
+    status, headers, payload = client('GET', '/wallet/export', headers=auth, query=b'format=csv')
+
+    assert status == 200 and headers['content-type'].startswith('text/csv')
+    header, *rows = csv.reader(payload.decode().splitlines())
+    assert tuple(header) == serializers.WALLET_FIELDS
+    assert {row[0] for row in rows} == {'Test Wallet', 'Second'}
+    assert sorted(calls) == sorted(row[1] for row in rows)
+
+def test_import_batch_reports_undecryptable_items_as_invalid(client, sign_up):
+    from base64 import b64encode
+    (item,) = private_key_items(1)
+    auth, _ = sign_up()
+    invalid = [
+        {'private_key': 'not base64!', 'network': 'supra'},
+        {'private_key': b64encode(b'\x01\x00' + bytes(40)).decode(), 'network': 'supra'},
+        {'seed_phrase': item['private_key']},
+    ]
+    results = import_batch(client, auth, [item] + invalid)
+    assert [result['status'] for result in results] == ['imported', 'invalid', 'invalid', 'invalid']
+
+def test_import_batch_fails_when_the_crypto_executor_fails(client, sign_up, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+    from app.core.crypto_executor import crypto_executor
+    auth, _ = sign_up()
+    items = private_key_items(2)
+    wallets = len(wallet_repository)
+
+    run = crypto_executor.run
+    calls = []
+    async def fail_second(func, *args, **kwargs):
+        calls.append(func)
+        if len(calls) == 2:
+            raise BrokenProcessPool('A child process terminated abruptly')
+        return await run(func, *args, **kwargs)
+    monkeypatch.setattr(crypto_executor, 'run', fail_second)
+
+    status, _, payload = client('POST', '/wallet/import/batch', {'wallets': items}, auth)
+    assert status == 500, payload
+    assert len(wallet_repository) == wallets
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from app.common.cache import TTLCache
+from app.core.wallet_list_cache import WalletListCache, wallet_list_cache
+from tests.test_wallet import private_key_items
+
+def seed_phrase():
+    from app.core.generate_seed_wallet_address import encrypt_key
+    from app.core.hd_derivation import generate_mnemonic
+    return encrypt_key(generate_mnemonic())
+
+def test_wallet_list_reflects_every_mutation(client, sign_up):
+    auth, response = sign_up({'signup_method': 'seed_import', 'seed_phrase': seed_phrase()})
+    seed_wallet = response['wallets'][0]['wallet_address']
+
+    def listed():
+        # Listed twice, the second list is served from the cache until the next mutation
+        status, _, first = client('GET', '/wallet', headers=auth, query=b'limit=100')
+        hits = wallet_list_cache.hits
+        status, _, second = client('GET', '/wallet', headers=auth, query=b'limit=100')
+        assert status == 200 and first == second and wallet_list_cache.hits == hits + 1
+        return {wallet['wallet_address']: wallet['wallet_name'] for wallet in json.loads(second)['wallets']}
+
+    def mutate(method: str, path: str, body: dict = None):
+        status, _, payload = client(method, path, body, auth)
+        assert status == 200, payload
+        return json.loads(payload)
+
+    assert list(listed()) == [seed_wallet]
+    created = mutate('PUT', '/wallet', {'wallet_name': 'Created'})['wallet']['wallet_address']
+    assert set(listed()) == {seed_wallet, created}
+
+    single, first, second = private_key_items(3)
+    imported = mutate('POST', '/wallet/import', single)['wallet']['wallet_address']
+    assert imported in listed()
+    batch = [result['wallet']['wallet_address'] for result in mutate('POST', '/wallet/import/batch', {'wallets': [first, second]})['results']]
+    assert set(batch) <= set(listed())
+    accounts = [wallet['wallet_address'] for wallet in mutate('PUT', f'/wallet/{seed_wallet}/accounts', {'count': 2})['wallets']]
+    assert set(accounts) <= set(listed())
+
+    mutate('PATCH', f'/wallet/{created}', {'wallet_name': 'Renamed'})
+    assert listed()[created] == 'Renamed'
+    mutate('DELETE', f'/wallet/{created}')
+    wallets = listed()
+    assert created not in wallets and len(wallets) == 5
+
+def test_concurrent_misses_share_one_fetch(loop):
+    cache = WalletListCache(TTLCache(10, 30), 4)
+    fetches = []
+
+    async def fetch():
+        fetches.append(True)
+        await asyncio.sleep(0.01)
+        return {'wallets': len(fetches)}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_fetch('user', (10, 0, None), fetch) for _ in range(5)))
+    assert loop.run_until_complete(scenario()) == [{'wallets': 1}] * 5
+    assert (len(fetches), cache.singleflight.shared) == (1, 4)
+    assert loop.run_until_complete(cache.get_or_fetch('user', (10, 0, None), fetch)) == {'wallets': 1}
+    assert cache.hits == 1
+
+def test_invalidation_during_a_fetch(loop):
+    cache = WalletListCache(TTLCache(10, 30), 4)
+    fetches = []
+
+    async def fetch():
+        fetches.append(True)
+        version = len(fetches)
+        await asyncio.sleep(0.01)
+        return {'version': version}
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.get_or_fetch('user', (10, 0, None), fetch))
+        await asyncio.sleep(0)
+        # A wallet is written while the first fetch is running
+        cache.invalidate('user')
+        fresh = await cache.get_or_fetch('user', (10, 0, None), fetch)
+        return await stale, fresh
+    stale, fresh = loop.run_until_complete(scenario())
+    assert (stale, fresh) == ({'version': 1}, {'version': 2})
+    # The page read before the invalidation is not cached, the one read after it is
+    assert loop.run_until_complete(cache.get_or_fetch('user', (10, 0, None), fetch)) == {'version': 2}
+    assert len(fetches) == 2
@@ -0,0 +1,39 @@
+import asyncio
+from app.core.wallet_pool import WalletPool
+from app.services import wallet_service
+
+async def wait_for_depth(pool: WalletPool, depth: int):
+    while pool.metrics()['depth'] < depth:
+        await asyncio.sleep(0.01)
+
+def test_pool_hit_miss_and_refill(loop, monkeypatch):
+    pool = WalletPool(high_water=3, low_water=1)
+    monkeypatch.setattr(wallet_service, 'wallet_pool', pool)
+
+    async def scenario():
+        pool.start()
+        try:
+            await asyncio.wait_for(wait_for_depth(pool, 3), 10)
+            pooled = [await wallet_service.generate_new_wallet('Pooled') for _ in range(3)]
+            assert pool.metrics()['depth'] == 0
+            # The empty pool falls back to inline generation
+            inline = await wallet_service.generate_new_wallet('Inline')
+            # Dropping below the low-water mark refills up to the high-water mark
+            await asyncio.wait_for(wait_for_depth(pool, 3), 10)
+            return pooled, inline
+        finally:
+            await pool.stop()
+    pooled, inline = loop.run_until_complete(scenario())
+
+    addresses = {wallet['wallet_address'] for wallet in pooled + [inline]}
+    assert len(addresses) == 4
+    metrics = pool.metrics()
+    assert (metrics['depth'], metrics['hits'], metrics['misses'], metrics['hit_rate']) == (3, 3, 1, 0.75)
+    assert metrics['generated'] == 6
+    assert metrics['refill_rate'] > 0
+
+def test_pool_metrics_are_exported(client):
+    status, _, payload = client('GET', '/metrics')
+    assert status == 200
+    names = {line.split(' ')[2] for line in payload.decode().splitlines() if line.startswith('# TYPE')}
+    assert {'wallet_pool_depth', 'wallet_pool_requests_total', 'wallet_pool_generated_total', 'wallet_pool_refill_rate'} <= names